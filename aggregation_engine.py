@@ -0,0 +1,273 @@
+# Description: This module computes descriptive statistics in a single vectorized pass per batch.
+# Partial states merge across batches and workers, so streamed or partitioned data gives the same report
+# as df.describe(), value_counts() and groupby('date')['amount'].sum() over the full frame. Decimal amounts are
+# summed in exact integer units of their scale (fixed_point), so totals do not depend on batching or order.
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+import pandas as pd
+
+EXACT_QUANTILE_LIMIT = 10000
+SKETCH_CENTROIDS = 1000
+
+
+def as_float64(values):
+    """
+    Widen a numeric column to a float64 NumPy array (NULLs become NaN).
+    :param values: Pandas Series or NumPy array.
+    :return: float64 NumPy array.
+    """
+    if isinstance(values, pd.Series):
+        return values.to_numpy(dtype="float64", na_value=np.nan)
+    return np.asarray(values, dtype="float64")
+
+
+def fixed_point(values, scale):
+    """
+    Convert a decimal column to exact integer units of 10**-scale, e.g. cents for NUMERIC(10, 2) (NULLs become 0).
+    Sums of these units are exact whatever the order or batching, unlike sums of the float values.
+    :param values: Pandas Series or NumPy array.
+    :param scale: Number of decimal places.
+    :return: int64 NumPy array.
+    """
+    return np.round(np.nan_to_num(as_float64(values)) * 10 ** scale).astype("int64")
+
+
+def decimal_sum(values, scale=None, by=None):
+    """
+    Sum a decimal column, exactly in fixed point when its scale is known.
+    :param values: Pandas Series.
+    :param scale: Number of decimal places (None sums the float64 values).
+    :param by: Optional grouping keys aligned with `values`.
+    :return: float scalar, or a float64 Series of group sums when `by` is given.
+    """
+    if scale is None:
+        values = pd.Series(as_float64(values), index=values.index)
+        return values.groupby(by).sum() if by is not None else float(values.sum())
+    units = pd.Series(fixed_point(values, scale), index=values.index)
+    if by is not None:
+        return units.groupby(by).sum() / 10 ** scale
+    return int(units.sum()) / 10 ** scale
+
+
+class ColumnStats:
+    """Mergeable running statistics for one numeric column (Welford/Chan moments plus a quantile sketch)."""
+
+    def __init__(self, exact_limit=EXACT_QUANTILE_LIMIT, centroids=SKETCH_CENTROIDS):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.exact_limit = exact_limit
+        self.centroids = centroids
+        self.exact = True
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+
+    def update(self, values):
+        """
+        Add a batch of values to the running statistics.
+        :param values: 1-D NumPy array (NaNs are ignored).
+        """
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+
+        batch = ColumnStats(self.exact_limit, self.centroids)
+        batch.count = values.size
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean) ** 2).sum())
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        batch.means = values
+        batch.weights = np.ones(values.size)
+        self.merge(batch)
+
+    def merge(self, other):
+        """
+        Merge another partial state into this one (Chan et al. parallel variance update).
+        :param other: ColumnStats computed over a disjoint set of rows.
+        """
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.mean, self.m2 = other.mean, other.m2
+        else:
+            total = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / total
+            self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+        self.means = np.concatenate([self.means, other.means])
+        self.weights = np.concatenate([self.weights, other.weights])
+        self.exact = self.exact and other.exact
+        if self.means.size > self.exact_limit:
+            self.compress()
+
+    def compress(self):
+        """Collapse the retained values into equal-weight centroids; quantiles become approximate."""
+        order = np.argsort(self.means, kind="stable")
+        means, weights = self.means[order], self.weights[order]
+        cumulative = np.cumsum(weights)
+        bins = np.minimum(((cumulative - weights / 2) / cumulative[-1] * self.centroids).astype(int),
+                          self.centroids - 1)
+        bin_weights = np.bincount(bins, weights=weights, minlength=self.centroids)
+        bin_sums = np.bincount(bins, weights=means * weights, minlength=self.centroids)
+        keep = bin_weights > 0
+        self.means = bin_sums[keep] / bin_weights[keep]
+        self.weights = bin_weights[keep]
+        self.exact = False
+
+    @property
+    def std(self):
+        """Sample standard deviation (ddof=1), matching Pandas."""
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else np.nan
+
+    def quantile(self, q):
+        """
+        Return the q-th quantile; exact (linear interpolation) until the sketch is compressed.
+        :param q: Quantile between 0 and 1.
+        :return: Quantile value.
+        """
+        if self.count == 0:
+            return np.nan
+        if self.exact:
+            return float(np.quantile(self.means, q))
+
+        order = np.argsort(self.means)
+        means, weights = self.means[order], self.weights[order]
+        midpoints = np.cumsum(weights) - weights / 2
+        positions = np.concatenate([[0.0], midpoints, [self.count]])
+        values = np.concatenate([[self.min], means, [self.max]])
+        return float(np.interp(q * self.count, positions, values))
+
+
+class DescriptiveAggregator:
+    """Single-pass, mergeable aggregation state for the finance descriptive analysis."""
+
+    def __init__(self, numeric_columns=None, category_column="transaction_type",
+                 date_column="date", value_column="amount", value_scale=None):
+        """
+        :param numeric_columns: Columns to describe (default: the numeric columns of the first batch).
+        :param category_column: Column whose values are counted.
+        :param date_column: Column the trend is grouped by.
+        :param value_column: Column summed per date.
+        :param value_scale: Decimal places of the value column (e.g. 2 for NUMERIC(10, 2)); when set, per-date
+                            sums are kept in exact integer units (see fixed_point).
+        """
+        self.numeric_columns = list(numeric_columns) if numeric_columns else None
+        self.category_column = category_column
+        self.date_column = date_column
+        self.value_column = value_column
+        self.value_scale = value_scale
+        self.rows = 0
+        self.column_stats = {}
+        self.category_counts = pd.Series(dtype="int64")
+        self.date_sums = pd.Series(dtype="float64" if value_scale is None else "int64")
+
+    def update(self, batch):
+        """
+        Fold one DataFrame batch into the running state.
+        :param batch: Pandas DataFrame with transaction rows.
+        """
+        if self.numeric_columns is None:
+            self.numeric_columns = [c for c in batch.select_dtypes("number").columns]
+        self.rows += len(batch)
+
+        for column in self.numeric_columns:
+            if column in batch:
+                stats = self.column_stats.setdefault(column, ColumnStats())
+                stats.update(as_float64(batch[column]))
+
+        if self.category_column in batch:
+            counts = batch[self.category_column].value_counts()
+            self.category_counts = self.category_counts.add(counts, fill_value=0)
+
+        if self.date_column in batch and self.value_column in batch:
+            dates = pd.to_datetime(batch[self.date_column])
+            if self.value_scale is None:
+                values = pd.Series(as_float64(batch[self.value_column]), index=batch.index)
+            else:
+                values = pd.Series(fixed_point(batch[self.value_column], self.value_scale), index=batch.index)
+            sums = values.groupby(dates).sum()
+            self.date_sums = self.date_sums.add(sums, fill_value=0)
+
+    def merge(self, other):
+        """
+        Merge a partial state computed over other batches or by another worker.
+        :param other: DescriptiveAggregator with the same configuration.
+        :return: self, to allow chaining.
+        """
+        if self.numeric_columns is None:
+            self.numeric_columns = other.numeric_columns
+        self.rows += other.rows
+        for column, stats in other.column_stats.items():
+            self.column_stats.setdefault(column, ColumnStats()).merge(stats)
+        self.category_counts = self.category_counts.add(other.category_counts, fill_value=0)
+        self.date_sums = self.date_sums.add(other.date_sums, fill_value=0)
+        return self
+
+    def describe(self):
+        """
+        Return basic statistics laid out like DataFrame.describe().
+        :return: Pandas DataFrame.
+        """
+        rows = {}
+        for column in self.numeric_columns or []:
+            stats = self.column_stats.get(column, ColumnStats())
+            rows[column] = [stats.count, stats.mean if stats.count else np.nan, stats.std,
+                            stats.min if stats.count else np.nan, stats.quantile(0.25), stats.quantile(0.5),
+                            stats.quantile(0.75), stats.max if stats.count else np.nan]
+        return pd.DataFrame(rows, index=["count", "mean", "std", "min", "25%", "50%", "75%", "max"], dtype="float64")
+
+    def transaction_type_counts(self):
+        """
+        Return the per-type transaction counts, like value_counts().
+        :return: Pandas Series.
+        """
+        counts = self.category_counts.astype("int64").sort_values(ascending=False, kind="stable")
+        return counts.rename_axis(self.category_column).rename("count")
+
+    def trend(self):
+        """
+        Return the summed amount per date, like groupby('date')['amount'].sum().
+        :return: Pandas Series indexed by date.
+        """
+        sums = self.date_sums.sort_index()
+        if self.value_scale is not None:
+            sums = sums / 10 ** self.value_scale
+        return sums.rename_axis(self.date_column).rename(self.value_column)
+
+    @staticmethod
+    def from_batches(batches, **kwargs):
+        """
+        Aggregate an iterable of DataFrame batches.
+        :param batches: Iterable of DataFrames (or a single DataFrame).
+        :return: DescriptiveAggregator.
+        """
+        aggregator = DescriptiveAggregator(**kwargs)
+        if isinstance(batches, pd.DataFrame):
+            batches = [batches]
+        for batch in batches:
+            aggregator.update(batch)
+        return aggregator
+
+    @staticmethod
+    def from_partitions(partitions, workers=4, **kwargs):
+        """
+        Aggregate independent partitions in a process pool and merge the partial states.
+        :param partitions: Iterable of DataFrames.
+        :param workers: Number of worker processes.
+        :param kwargs: DescriptiveAggregator options, e.g. value_scale.
+        :return: DescriptiveAggregator.
+        """
+        result = DescriptiveAggregator(**kwargs)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for state in executor.map(partial(DescriptiveAggregator.from_batches, **kwargs), partitions):
+                result.merge(state)
+        return result
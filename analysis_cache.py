@@ -0,0 +1,149 @@
+# Description: This module memoizes analysis results keyed on a cheap fingerprint of the source table.
+# The fingerprint is the row count and max key of the whole table plus an aggregate checksum of its most
+# recent partition (the rows with the highest keys), so it costs a couple of index-friendly queries instead
+# of a full recomputation. Results are stored as JSON files in a cache directory with LRU eviction by
+# entry count and total size.
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+from sqlalchemy import text
+from dashboard_queries import _identifier
+
+DEFAULT_CACHE_DIR = "analysis_cache"
+INDEX_FILE = "_index.json"
+
+
+def _plain(value):
+    # Database values (Decimal, date, ...) as JSON-stable strings
+    return None if value is None else str(value)
+
+
+def table_fingerprint(engine, table_name, key_column="transaction_id", checksum_columns=("amount", "account_id"),
+                      partition_rows=100000):
+    """
+    Fingerprint a table cheaply: row count and max key of the whole table, plus COUNT/SUM checksums of the
+    partition holding the `partition_rows` highest keys (None checksums the whole table).
+    Appends, deletes and changes to recent rows change the fingerprint; an in-place update of an old row that
+    keeps count and max key the same is only caught with partition_rows=None.
+    :param engine: SQLAlchemy engine object.
+    :param table_name: Table to fingerprint.
+    :param key_column: Increasing key column (e.g. the primary key).
+    :param checksum_columns: Numeric columns summed into the partition checksum.
+    :param partition_rows: Size of the checksummed key range.
+    :return: Hex digest string.
+    """
+    table_name = _identifier(table_name)
+    key_column = _identifier(key_column)
+    sums = ", ".join(f"SUM({_identifier(column)})" for column in checksum_columns)
+    with engine.connect() as connection:
+        row_count, min_key, max_key = connection.execute(
+            text(f"SELECT COUNT(*), MIN({key_column}), MAX({key_column}) FROM {table_name}")).one()
+        low = min_key if partition_rows is None or max_key is None else max_key - partition_rows
+        checksum = connection.execute(
+            text(f"SELECT COUNT(*), {sums} FROM {table_name} WHERE {key_column} >= :low"),
+            {"low": low if low is not None else 0}).one()
+    parts = [table_name, row_count, max_key, *checksum]
+    return hashlib.sha256(json.dumps([_plain(part) for part in parts]).encode()).hexdigest()
+
+
+def frame_to_dict(data):
+    """
+    Convert a DataFrame or Series into a JSON-serializable dictionary.
+    :param data: Pandas DataFrame or Series.
+    :return: Dictionary.
+    """
+    if isinstance(data, pd.Series):
+        index = data.index
+        return {"type": "series", "name": data.name, "index_name": index.name,
+                "datetime_index": isinstance(index, pd.DatetimeIndex),
+                "index": [value.isoformat() if hasattr(value, "isoformat") else value for value in index],
+                "data": data.tolist()}
+    return {"type": "frame", "index": data.index.tolist(), "columns": data.columns.tolist(),
+            "data": data.to_numpy().tolist()}
+
+
+def frame_from_dict(data):
+    """
+    Rebuild the DataFrame or Series stored by frame_to_dict.
+    :param data: Dictionary.
+    :return: Pandas DataFrame or Series.
+    """
+    if data["type"] == "series":
+        index = pd.DatetimeIndex(data["index"]) if data["datetime_index"] else pd.Index(data["index"])
+        return pd.Series(data["data"], index=index.rename(data["index_name"]), name=data["name"])
+    return pd.DataFrame(data["data"], index=data["index"], columns=data["columns"])
+
+
+class ResultCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=32, max_bytes=50 * 1024 * 1024):
+        """
+        :param cache_dir: Directory holding one JSON file per entry and the LRU index.
+        :param max_entries: Maximum number of cached results.
+        :param max_bytes: Maximum total size of the cached files.
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+
+    @staticmethod
+    def make_key(*parts):
+        """Build a cache key from a fingerprint and whatever else the result depends on."""
+        return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()[:32]
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path) as file:
+            return json.load(file)
+
+    def _write_index(self, index):
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(index, file, indent=2)
+        os.replace(temp_path, self.index_path)
+
+    def get(self, key):
+        """
+        Return the cached value for a key (and mark it as recently used), or None.
+        :param key: Cache key.
+        :return: Stored value or None.
+        """
+        index = self._read_index()
+        if key not in index or not os.path.exists(self._path(key)):
+            return None
+        with open(self._path(key)) as file:
+            value = json.load(file)
+        index[key]["last_used"] = time.time()
+        self._write_index(index)
+        return value
+
+    def put(self, key, value):
+        """
+        Store a JSON-serializable value and evict least recently used entries over the limits.
+        :param key: Cache key.
+        :param value: Value to store.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{self._path(key)}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(value, file)
+        os.replace(temp_path, self._path(key))
+
+        index = self._read_index()
+        index[key] = {"size": os.path.getsize(self._path(key)), "last_used": time.time()}
+        by_age = sorted(index, key=lambda name: index[name]["last_used"])
+        total_bytes = sum(entry["size"] for entry in index.values())
+        while by_age and (len(index) > self.max_entries or total_bytes > self.max_bytes):
+            oldest = by_age.pop(0)
+            if oldest == key and len(index) == 1:
+                break
+            total_bytes -= index.pop(oldest)["size"]
+            if os.path.exists(self._path(oldest)):
+                os.remove(self._path(oldest))
+        self._write_index(index)
@@ -0,0 +1,297 @@
+# Description: This module extracts API data with asyncio and a pooled aiohttp session. Responses are rate
+# limited, retried with exponential backoff, decoded incrementally from the response stream, and handed to the
+# transform as soon as they arrive. Endpoints known to support page parameters can opt in to pagination
+# (paginate=True), and their pages are then fetched concurrently (bounded); otherwise one request is made.
+import asyncio
+import codecs
+import hashlib
+import json
+import random
+import time
+import aiohttp
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` requests per second with bursts up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class JsonStreamDecoder:
+    """
+    Incremental decoder for a JSON array of records, newline-delimited JSON, or
+    envelope objects such as {"data": [...]} (records under `records_key`).
+    Array elements, including those of the envelope's records array, are decoded one at a time as they
+    complete, so each byte is decoded about once however large the response is.
+    """
+
+    def __init__(self, records_key="data"):
+        self.records_key = records_key
+        self.decoder = json.JSONDecoder()
+        self.text = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        # None at the top level, 'array' inside a records array, 'object' inside an envelope being split up
+        self.mode = None
+        self.nested = False
+        self.envelope = None
+        self.envelope_records = False
+
+    @staticmethod
+    def _skip(buffer, position, characters=" \t\r\n,"):
+        while position < len(buffer) and buffer[position] in characters:
+            position += 1
+        return position
+
+    def _decode(self, buffer, position, final):
+        # A number is complete only once a delimiter follows it ('12' may continue as '12.5' in the next chunk)
+        value, end = self.decoder.raw_decode(buffer, position)
+        if (not final and isinstance(value, (int, float)) and not isinstance(value, bool)
+                and (end == len(buffer) or buffer[end] not in " \t\r\n,]}")):
+            raise json.JSONDecodeError("Number may continue in the next chunk", buffer, position)
+        return value, end
+
+    def _emit(self, value, records):
+        if isinstance(value, dict) and isinstance(value.get(self.records_key), list):
+            records.extend(value[self.records_key])
+        elif isinstance(value, list):
+            records.extend(value)
+        else:
+            records.append(value)
+
+    def feed(self, chunk, final=False):
+        """
+        Decode a chunk of bytes and return the records completed so far.
+        :param chunk: Bytes received from the response stream.
+        :param final: True for the last chunk.
+        :return: List of decoded records.
+        """
+        self.buffer += self.text.decode(chunk, final=final)
+        buffer = self.buffer
+        length = len(buffer)
+        records = []
+        position = 0
+
+        try:
+            while True:
+                position = self._skip(buffer, position)
+                if position >= length:
+                    break
+                character = buffer[position]
+
+                if self.mode == "array":
+                    if character == "]":
+                        position += 1
+                        self.mode = "object" if self.nested else None
+                        self.nested = False
+                        continue
+                    value, position = self._decode(buffer, position, final)
+                    records.append(value)
+
+                elif self.mode == "object":
+                    if character == "}":
+                        position += 1
+                        if not self.envelope_records:
+                            records.append(self.envelope)
+                        self.mode, self.envelope = None, None
+                        continue
+                    # One "key": value member; incomplete members are decoded again with the next chunk
+                    key, end = self.decoder.raw_decode(buffer, position)
+                    colon = self._skip(buffer, end, " \t\r\n")
+                    value_start = self._skip(buffer, colon + 1, " \t\r\n")
+                    if value_start >= length:
+                        break
+                    if buffer[colon] != ":":
+                        raise json.JSONDecodeError("Expecting ':' delimiter", buffer, colon)
+                    if key == self.records_key and buffer[value_start] == "[":
+                        self.envelope_records = True
+                        self.mode, self.nested = "array", True
+                        position = value_start + 1
+                        continue
+                    self.envelope[key], position = self._decode(buffer, value_start, final)
+
+                elif character == "[":
+                    self.mode, self.nested = "array", False
+                    position += 1
+
+                elif character == "{":
+                    # Small objects (NDJSON lines, short envelopes) decode whole; an object still incomplete
+                    # is split into members instead of being decoded again with every chunk
+                    try:
+                        value, position = self.decoder.raw_decode(buffer, position)
+                        self._emit(value, records)
+                    except json.JSONDecodeError:
+                        if final:
+                            raise
+                        self.mode, self.envelope, self.envelope_records = "object", {}, False
+                        position += 1
+
+                else:
+                    value, position = self._decode(buffer, position, final)
+                    self._emit(value, records)
+        except json.JSONDecodeError:
+            if final:
+                raise
+
+        if final and (self.mode is not None or position < length):
+            raise json.JSONDecodeError("Unexpected end of JSON data", buffer, position)
+        self.buffer = buffer[position:]
+        return records
+
+
+class AsyncApiExtractor:
+    def __init__(self, url, params=None, concurrency=8, requests_per_second=None, retries=4, backoff=0.5,
+                 timeout=30, paginate=False, page_param="page", page_size_param="per_page", page_size=1000,
+                 records_key="data", max_pages=None):
+        """
+        :param url: Endpoint returning the records (one page per request when paginated).
+        :param params: Extra query parameters sent with every request.
+        :param concurrency: Maximum pages in flight (also the connection pool size).
+        :param requests_per_second: Optional rate limit across all requests.
+        :param retries: Retries per page for network errors, 429 and 5xx responses.
+        :param backoff: Base delay in seconds for exponential backoff.
+        :param timeout: Total timeout per request in seconds.
+        :param paginate: Request pages 1, 2, ... with the page parameters (only for endpoints known to support
+                         them); by default the endpoint is fetched once, as a single response.
+        :param page_param: Query parameter carrying the page number (pages start at 1).
+        :param page_size_param: Query parameter carrying the page size (None if the API has no such parameter).
+        :param page_size: Records per page; a shorter page marks the end of the data.
+        :param records_key: Key holding the records when pages are JSON objects.
+        :param max_pages: Optional hard limit on the number of pages when paginating.
+        """
+        self.url = url
+        self.params = dict(params or {})
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.paginate = paginate
+        self.page_param = page_param
+        self.page_size_param = page_size_param
+        self.page_size = page_size
+        self.records_key = records_key
+        self.max_pages = max_pages
+
+    async def fetch_page(self, session, page, limiter=None):
+        """
+        Fetch and stream-decode one page, retrying transient failures with exponential backoff.
+        :param session: aiohttp ClientSession.
+        :param page: Page number (ignored unless paginating).
+        :param limiter: Optional RateLimiter.
+        :return: List of records on the page.
+        """
+        params = dict(self.params)
+        if self.paginate:
+            params[self.page_param] = page
+            if self.page_size_param:
+                params[self.page_size_param] = self.page_size
+
+        for attempt in range(self.retries + 1):
+            if limiter is not None:
+                await limiter.acquire()
+            try:
+                async with session.get(self.url, params=params) as response:
+                    if response.status in RETRY_STATUSES and attempt < self.retries:
+                        retry_after = response.headers.get("Retry-After")
+                        delay = float(retry_after) if retry_after and retry_after.isdigit() else None
+                        await self._sleep(attempt, delay)
+                        continue
+                    response.raise_for_status()
+
+                    decoder = JsonStreamDecoder(self.records_key)
+                    records = []
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        records.extend(decoder.feed(chunk))
+                    records.extend(decoder.feed(b"", final=True))
+                    return records
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+                await self._sleep(attempt)
+        return []
+
+    async def _sleep(self, attempt, delay=None):
+        if delay is None:
+            delay = self.backoff * (2 ** attempt) * (1 + random.random() / 2)
+        await asyncio.sleep(delay)
+
+    async def iter_pages(self):
+        """
+        Fetch pages concurrently and yield each page's records as soon as it completes
+        (not necessarily in page order). Stops after the first short or empty page, or at a page repeating
+        one already received (an API that ignores the page parameter). Without pagination, a single
+        request is made.
+        :return: Async iterator of record lists.
+        """
+        limiter = RateLimiter(self.requests_per_second, self.concurrency) if self.requests_per_second else None
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(connector=connector, timeout=self.timeout) as session:
+            next_page = 1
+            last_page = self.max_pages if self.paginate else 1
+            in_flight = {}
+            seen = set()
+
+            def launch():
+                nonlocal next_page
+                while len(in_flight) < self.concurrency and (last_page is None or next_page <= last_page):
+                    task = asyncio.ensure_future(self.fetch_page(session, next_page, limiter))
+                    in_flight[task] = next_page
+                    next_page += 1
+
+            launch()
+            try:
+                while in_flight:
+                    done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        page = in_flight.pop(task)
+                        records = task.result()
+                        repeated = False
+                        if self.paginate:
+                            digest = hashlib.sha256(json.dumps(records, sort_keys=True, default=str).encode()).digest()
+                            repeated = digest in seen
+                            seen.add(digest)
+                        if (repeated or len(records) < self.page_size) and (last_page is None or page < last_page):
+                            last_page = page
+                        if records and not repeated:
+                            yield records
+                    # Cancel pages past the end that were already requested
+                    for task, page in list(in_flight.items()):
+                        if last_page is not None and page > last_page:
+                            task.cancel()
+                            in_flight.pop(task)
+                    launch()
+            finally:
+                for task in in_flight:
+                    task.cancel()
+
+    async def _collect(self, transform):
+        results = []
+        async for records in self.iter_pages():
+            results.append(transform(records) if transform else records)
+        return results
+
+    def extract(self, transform=None):
+        """
+        Run the extraction to completion from synchronous code.
+        :param transform: Optional callable applied to each page's records as it arrives.
+        :return: List with one (transformed) entry per page.
+        """
+        return asyncio.run(self._collect(transform))
@@ -1,11 +1,24 @@
 # Basic Scheduling with Python
-import time
+from etl_scheduler import CronTrigger, Dag, Scheduler, Task
 
-def run_etl_pipeline():
-    # Your ETL steps here
+def extract(context):
+    # Your extract step here (context.scheduled_time is the interval being processed)
     pass
 
-# Run every 24 hours
-while True:
-    run_etl_pipeline()
-    time.sleep(86400)  # Wait for one day before running again
+def transform(context):
+    # Your transform step here (context.results['extract'] holds the extract output)
+    pass
+
+def load(context):
+    # Your load step here
+    pass
+
+etl_dag = Dag("daily_etl", [
+    Task("extract", extract, retries=2),
+    Task("transform", transform, depends_on=["extract"]),
+    Task("load", load, depends_on=["transform"]),
+])
+
+# Run every day at 02:00; missed days are backfilled and overlapping runs are skipped
+scheduler = Scheduler(etl_dag, CronTrigger("0 2 * * *"), overlap="skip", catchup=True)
+scheduler.run_forever()
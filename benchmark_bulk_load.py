@@ -0,0 +1,45 @@
+# Description: This script compares rows/sec of the DataFrame.to_sql load path against the chunked bulk loader.
+# Run it against a local PostgreSQL (COPY FROM STDIN) or, with no URL, against a SQLite stand-in.
+import argparse
+import os
+import tempfile
+import time
+from sqlalchemy import create_engine
+from etlPipeline_with_PostgreSQL_01 import FinanceDataGenerator, ETLPipeline
+
+
+def time_load(engine, csv_file, method, chunk_size):
+    """
+    Time a single load of the CSV file into the finance_transactions table.
+    :param engine: SQLAlchemy engine object.
+    :param csv_file: Path to the CSV file.
+    :param method: 'to_sql' or 'copy'.
+    :param chunk_size: Rows per chunk for the bulk loader.
+    :return: Elapsed seconds.
+    """
+    start = time.perf_counter()
+    ETLPipeline.load_data_to_table(engine, csv_file, method=method, chunk_size=chunk_size)
+    return time.perf_counter() - start
+
+
+# Main script execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark to_sql against the bulk COPY loader.")
+    parser.add_argument("--url", default=None, help="SQLAlchemy URL (default: temporary SQLite database)")
+    parser.add_argument("--rows", type=int, default=200000, help="Number of synthetic rows to load")
+    parser.add_argument("--chunk-size", type=int, default=100000, help="Rows per bulk-load chunk")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_file = os.path.join(tmp_dir, "finance_data.csv")
+        FinanceDataGenerator.generate_csv(csv_file, num_rows=args.rows)
+
+        url = args.url or f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}"
+        engine = create_engine(url)
+
+        print(f"\nBenchmarking {args.rows} rows on '{engine.dialect.name}'")
+        for method in ("to_sql", "copy"):
+            elapsed = time_load(engine, csv_file, method, args.chunk_size)
+            print(f"{method:>7}: {elapsed:8.2f}s  {args.rows / elapsed:12,.0f} rows/sec")
+
+        engine.dispose()
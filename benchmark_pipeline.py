@@ -0,0 +1,330 @@
+# Description: End-to-end benchmark of the extract, load, analysis, chart and dashboard stages.
+# Each stage runs on synthetic datasets of increasing size in a fresh process, so peak RSS and CPU time
+# belong to that stage alone. Throughput and latency percentiles are printed and appended as JSON lines
+# to a history file, where every result is compared with the previous run of the same stage and size.
+# 'charts' times a full render on every run; 'charts_cached' times the re-render that the chart manifest
+# skips because the data is unchanged.
+# Databases default to a local SQLite file; pass --url to benchmark a real PostgreSQL instead.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+STAGES = ["extract_csv", "extract_json", "extract_xml", "load", "analysis", "charts", "charts_cached", "dashboard"]
+DEFAULT_SIZES = "1e4,1e5,1e6"
+DEFAULT_HISTORY = "benchmark_history.jsonl"
+TABLE_NAME = "finance_transactions"
+# Instrumented stage that must count rows on every successful run of a benchmark stage
+STAGE_METRICS = {"load": "etl.load", "analysis": "analysis.aggregate", "charts": "dashboard.charts",
+                 "charts_cached": "dashboard.charts", "dashboard": "dashboard.render"}
+
+
+def parse_sizes(text):
+    """
+    Parse a comma-separated list of row counts, e.g. '1e4,1e5,1e8'.
+    :param text: Size list.
+    :return: List of integers.
+    """
+    return [int(float(value)) for value in text.split(",") if value.strip()]
+
+
+def run_checked(work, metric=None):
+    """
+    Run one unit of work and raise if it failed.
+    The ETL functions catch and print their own errors, so failures are detected from the stage metrics
+    instead: any stage that recorded a new error, or `metric` not counting any rows.
+    :param work: Callable to run.
+    :param metric: Optional stage name (see STAGE_METRICS) that must count rows.
+    :return: Result of work().
+    """
+    from pipeline_metrics import METRICS
+
+    before = METRICS.to_dict()
+    result = work()
+    after = METRICS.to_dict()
+    for name, metrics in after.items():
+        if metrics["errors"] > before.get(name, {}).get("errors", 0):
+            raise RuntimeError(f"Stage '{name}' failed: {metrics['last_error']}")
+    if metric is not None and after.get(metric, {}).get("rows", 0) <= before.get(metric, {}).get("rows", 0):
+        raise RuntimeError(f"Stage '{metric}' did not process any rows")
+    return result
+
+
+def generate_car_data(file_path, rows, seed=0, chunk_size=1000000):
+    """
+    Write synthetic car records (the extractor input format) as CSV, JSON lines or XML.
+    :param file_path: Output path; the format follows the extension.
+    :param rows: Number of records.
+    :param seed: Random seed.
+    :param chunk_size: Records generated and written at a time.
+    """
+    rng = np.random.default_rng(seed)
+    models = np.array(["ritz", "sx4", "ciaz", "wagon r", "swift", "vitara brezza", "s cross", "alto 800"])
+    fuels = np.array(["Petrol", "Diesel", "CNG"])
+    extension = os.path.splitext(file_path)[1]
+
+    with open(file_path, "w", newline="") as file:
+        if extension == ".xml":
+            file.write("<data>\n")
+        for start in range(0, rows, chunk_size):
+            size = min(chunk_size, rows - start)
+            df = pd.DataFrame({
+                "car_model": models[rng.integers(0, len(models), size)],
+                "year_of_manufacture": rng.integers(2005, 2024, size),
+                "price": np.round(rng.uniform(1000.0, 50000.0, size), 2),
+                "fuel": fuels[rng.integers(0, len(fuels), size)],
+            })
+            if extension == ".csv":
+                df.to_csv(file, index=False, header=start == 0)
+            elif extension == ".json":
+                file.write(df.to_json(orient="records", lines=True))
+                file.write("\n")
+            else:
+                file.write("".join(
+                    f"<car><car_model>{model}</car_model><year_of_manufacture>{year}</year_of_manufacture>"
+                    f"<price>{price}</price><fuel>{fuel}</fuel></car>\n"
+                    for model, year, price, fuel in df.itertuples(index=False)))
+        if extension == ".xml":
+            file.write("</data>\n")
+
+
+def prepare_fixtures(work_dir, rows, stages, url=None):
+    """
+    Create the input files and database needed by the selected stages (not timed).
+    :param work_dir: Directory for this dataset size.
+    :param rows: Number of rows.
+    :param stages: Stage names to prepare for.
+    :param url: Optional SQLAlchemy URL (default: SQLite file in work_dir).
+    :return: Dictionary of fixture paths and the database URL.
+    """
+    from sqlalchemy import create_engine
+    from etlPipeline_with_PostgreSQL_01 import FinanceDataGenerator, ETLPipeline
+
+    os.makedirs(work_dir, exist_ok=True)
+    fixtures = {"work_dir": work_dir, "url": url or f"sqlite:///{os.path.join(work_dir, 'benchmark.db')}"}
+
+    for extension in ("csv", "json", "xml"):
+        if f"extract_{extension}" in stages:
+            path = os.path.join(work_dir, f"cars.{extension}")
+            generate_car_data(path, rows)
+            fixtures[f"cars_{extension}"] = path
+
+    if any(stage in stages for stage in ("load", "analysis", "charts", "charts_cached", "dashboard")):
+        finance_csv = os.path.join(work_dir, "finance_data.csv")
+        FinanceDataGenerator.generate_dataset(finance_csv, rows, output="csv", seed=0)
+        fixtures["finance_csv"] = finance_csv
+        if any(stage in stages for stage in ("analysis", "charts", "charts_cached", "dashboard")):
+            engine = create_engine(fixtures["url"])
+            with open(os.devnull, "w") as sink, redirect_stdout(sink):
+                run_checked(lambda: ETLPipeline.load_data_to_table(engine, finance_csv, method="copy"), "etl.load")
+            engine.dispose()
+    return fixtures
+
+
+def run_stage(stage, fixtures, repeat):
+    """
+    Run one stage `repeat` times in the current (fresh) process and measure it.
+    Input that a stage reads before its own work starts (e.g. the DataFrame handed to generate_charts)
+    is loaded before timing, but does count towards peak RSS. 'charts' removes the chart manifest before
+    every run so the charts are drawn each time; 'charts_cached' renders once untimed to fill it.
+    :param stage: Stage name.
+    :param fixtures: Dictionary returned by prepare_fixtures.
+    :param repeat: Number of timed runs.
+    :return: Dictionary with latencies, CPU seconds and peak RSS in MB.
+    """
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    os.chdir(fixtures["work_dir"])
+    from sqlalchemy import create_engine
+
+    engine = create_engine(fixtures["url"])
+    if stage.startswith("extract_"):
+        from extract_from_csv_json_xml import extract_file
+        path = fixtures[f"cars_{stage.split('_')[1]}"]
+        work = lambda: extract_file(path)
+    elif stage == "load":
+        from etlPipeline_with_PostgreSQL_01 import ETLPipeline
+        work = lambda: ETLPipeline.load_data_to_table(engine, fixtures["finance_csv"], method="copy")
+    elif stage == "analysis":
+        from descriptive_analysis import FinanceDataAnalysis
+        work = lambda: FinanceDataAnalysis.perform_descriptive_analysis(
+            FinanceDataAnalysis.load_data(engine, TABLE_NAME, chunk_size=50000))
+    elif stage.startswith("charts"):
+        from chart_renderer import MANIFEST_FILE
+        from graph_dashboard_finance import FinanceDashboard
+        df = pd.read_sql_query(f"SELECT * FROM {TABLE_NAME}", con=engine)
+        manifest = os.path.join(fixtures["work_dir"], MANIFEST_FILE)
+        if os.path.exists(manifest):
+            os.remove(manifest)
+
+        def work():
+            if stage == "charts" and os.path.exists(manifest):
+                os.remove(manifest)
+            FinanceDashboard.generate_charts(df.copy())
+
+        if stage == "charts_cached":
+            with open(os.devnull, "w") as sink, redirect_stdout(sink):
+                run_checked(work, STAGE_METRICS[stage])
+    else:
+        from graph_dashboard_finance import FinanceDashboard
+        df = pd.read_sql_query(f"SELECT * FROM {TABLE_NAME}", con=engine)
+        work = lambda: FinanceDashboard.generate_dashboard(df.copy())
+
+    latencies = []
+    cpu_start = time.process_time()
+    with open(os.devnull, "w") as sink, redirect_stdout(sink):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run_checked(work, STAGE_METRICS.get(stage))
+            latencies.append(time.perf_counter() - start)
+    cpu_seconds = time.process_time() - cpu_start
+    engine.dispose()
+
+    peak_rss_mb = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        peak_rss_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    return {"latencies": latencies, "cpu_seconds": cpu_seconds, "peak_rss_mb": peak_rss_mb}
+
+
+def measure(stage, fixtures, rows, repeat):
+    """
+    Measure one stage in a freshly spawned process and summarize the result.
+    :param stage: Stage name.
+    :param fixtures: Dictionary returned by prepare_fixtures.
+    :param rows: Number of rows in the dataset.
+    :param repeat: Number of timed runs.
+    :return: Result record for the history file.
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        raw = executor.submit(run_stage, stage, fixtures, repeat).result()
+
+    latencies = np.array(raw["latencies"])
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "stage": stage,
+        "rows": rows,
+        "repeat": repeat,
+        "latency_mean": float(latencies.mean()),
+        "latency_p50": float(p50),
+        "latency_p95": float(p95),
+        "latency_p99": float(p99),
+        "throughput_rows_per_sec": rows / float(p50) if p50 > 0 else None,
+        "cpu_seconds": raw["cpu_seconds"] / repeat,
+        "peak_rss_mb": raw["peak_rss_mb"],
+    }
+
+
+def run_metadata(url):
+    """
+    Describe the environment of this benchmark run.
+    :param url: Database URL used for the run.
+    :return: Dictionary of metadata fields.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "database": url.split(":", 1)[0] if url else "sqlite",
+    }
+
+
+def load_history(history_file):
+    """
+    Read previous results from the JSON-lines history file.
+    :param history_file: Path to the history file.
+    :return: List of result records (oldest first).
+    """
+    if not os.path.exists(history_file):
+        return []
+    with open(history_file) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def previous_result(history, record):
+    """Return the latest earlier record for the same stage, size and database, if any."""
+    for old in reversed(history):
+        if (old["stage"], old["rows"], old.get("database")) == (record["stage"], record["rows"], record["database"]):
+            return old
+    return None
+
+
+def format_result(record, previous=None):
+    rss = f"{record['peak_rss_mb']:8.1f} MB" if record["peak_rss_mb"] is not None else "       n/a"
+    line = (f"{record['stage']:>13} {record['rows']:>11,} rows  p50 {record['latency_p50']:9.3f}s  "
+            f"p95 {record['latency_p95']:9.3f}s  {record['throughput_rows_per_sec'] or 0:13,.0f} rows/s  "
+            f"cpu {record['cpu_seconds']:8.2f}s  rss {rss}")
+    if previous is not None and previous.get("latency_p50"):
+        change = (record["latency_p50"] - previous["latency_p50"]) / previous["latency_p50"] * 100
+        line += f"  ({change:+.1f}% p50 vs {previous.get('commit') or previous['timestamp']})"
+    return line
+
+
+def benchmark(sizes, stages, repeat=3, history_file=DEFAULT_HISTORY, url=None, work_dir=None):
+    """
+    Run every selected stage for every dataset size and append the results to the history file.
+    :param sizes: List of row counts.
+    :param stages: List of stage names.
+    :param repeat: Timed runs per stage and size.
+    :param history_file: JSON-lines file the results are appended to.
+    :param url: Optional SQLAlchemy URL (default: SQLite stand-in).
+    :param work_dir: Optional directory for fixtures (default: temporary directory, removed afterwards).
+    :return: List of result records.
+    """
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stages: {unknown} (choose from {STAGES})")
+
+    metadata = run_metadata(url)
+    history = load_history(history_file)
+    results = []
+
+    with tempfile.TemporaryDirectory(dir=work_dir) as base_dir:
+        for rows in sizes:
+            print(f"\nPreparing {rows:,} rows...")
+            with open(os.devnull, "w") as sink, redirect_stdout(sink):
+                fixtures = prepare_fixtures(os.path.join(base_dir, str(rows)), rows, stages, url)
+            for stage in stages:
+                record = dict(metadata, **measure(stage, fixtures, rows, repeat))
+                print(format_result(record, previous_result(history, record)))
+                results.append(record)
+                with open(history_file, "a") as file:
+                    file.write(json.dumps(record) + "\n")
+    return results
+
+
+# Main script execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the ETL stages on synthetic datasets.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated row counts, e.g. 1e4,1e5,1e6,1e7,1e8")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma-separated stages from {STAGES}")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage and size")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON-lines file the results are appended to")
+    parser.add_argument("--url", default=None, help="SQLAlchemy URL (default: SQLite file per dataset size)")
+    parser.add_argument("--work-dir", default=None, help="Directory for the generated fixtures")
+    args = parser.parse_args()
+
+    benchmark(parse_sizes(args.sizes), [stage for stage in args.stages.split(",") if stage], args.repeat,
+              args.history, args.url, args.work_dir)
@@ -0,0 +1,225 @@
+# Description: This module streams CSV files into PostgreSQL with COPY FROM STDIN instead of row-by-row INSERTs.
+# Non-PostgreSQL engines (e.g. SQLite used as a local stand-in) fall back to chunked DataFrame.to_sql appends.
+# Views that depend on a replaced table (e.g. the dashboard's materialized rollup) are dropped before the
+# table and recreated after the load, as PostgreSQL refuses to drop a table that views depend on.
+import io
+from contextlib import contextmanager
+import pandas as pd
+from sqlalchemy import Integer, Numeric, Float, String, Date, DateTime, Boolean, inspect, text
+
+DEFAULT_CHUNK_SIZE = 100000
+# Plain and materialized views built directly on a PostgreSQL table, with their definitions
+DEPENDENT_VIEWS_QUERY = """SELECT DISTINCT quote_ident(namespace.nspname) || '.' || quote_ident(dependent.relname),
+       namespace.nspname, dependent.relname, dependent.relkind, pg_get_viewdef(dependent.oid)
+FROM pg_depend
+JOIN pg_rewrite ON pg_rewrite.oid = pg_depend.objid
+JOIN pg_class dependent ON dependent.oid = pg_rewrite.ev_class
+JOIN pg_namespace namespace ON namespace.oid = dependent.relnamespace
+WHERE pg_depend.classid = 'pg_rewrite'::regclass AND pg_depend.refobjid = to_regclass(:table_name)
+  AND dependent.oid <> pg_depend.refobjid AND dependent.relkind IN ('v', 'm')"""
+
+
+class BulkLoader:
+    @staticmethod
+    def column_dtypes(table):
+        """
+        Map the columns of an SQLAlchemy table (e.g. FinanceTransaction.__table__) to read_csv arguments.
+        :param table: SQLAlchemy Table object.
+        :return: Tuple of (dtype mapping, list of date columns to parse).
+        """
+        dtypes = {}
+        parse_dates = []
+        for column in table.columns:
+            if isinstance(column.type, (Date, DateTime)):
+                parse_dates.append(column.name)
+            elif isinstance(column.type, Integer):
+                dtypes[column.name] = "Int64"
+            elif isinstance(column.type, (Numeric, Float)):
+                dtypes[column.name] = "float64"
+            elif isinstance(column.type, Boolean):
+                dtypes[column.name] = "boolean"
+            elif isinstance(column.type, String):
+                dtypes[column.name] = "string"
+        return dtypes, parse_dates
+
+    @staticmethod
+    def iter_csv_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE, table=None):
+        """
+        Read a CSV file in fixed-size chunks, typed from the table schema when one is given.
+        :param file_path: Path to the CSV file.
+        :param chunk_size: Number of rows per chunk.
+        :param table: Optional SQLAlchemy Table object used for column types.
+        :return: Iterator of Pandas DataFrames.
+        """
+        if table is None:
+            return pd.read_csv(file_path, chunksize=chunk_size)
+
+        dtypes, parse_dates = BulkLoader.column_dtypes(table)
+        return pd.read_csv(file_path, chunksize=chunk_size, dtype=dtypes,
+                           parse_dates=parse_dates or False, usecols=lambda name: name in table.columns)
+
+    @staticmethod
+    @contextmanager
+    def views_detached(engine, table_name):
+        """
+        Drop the PostgreSQL views that depend on a table while the table is replaced, and recreate them (with
+        their indexes) afterwards, so materialized views are rebuilt from the new rows. Other databases, and
+        tables without dependent views, are left alone.
+        :param engine: SQLAlchemy engine object.
+        :param table_name: Table about to be dropped and recreated.
+        """
+        statements = []
+        if engine.dialect.name == "postgresql":
+            with engine.begin() as connection:
+                views = connection.execute(text(DEPENDENT_VIEWS_QUERY), {"table_name": table_name}).all()
+                for qualified, schema, name, kind, definition in views:
+                    definition = definition.strip().rstrip(";")
+                    if kind == "m":
+                        statements.append(f"CREATE MATERIALIZED VIEW {qualified} AS {definition}")
+                        statements.extend(connection.execute(
+                            text("SELECT indexdef FROM pg_indexes WHERE schemaname = :schema AND tablename = :name"),
+                            {"schema": schema, "name": name}).scalars())
+                        connection.execute(text(f"DROP MATERIALIZED VIEW {qualified}"))
+                    else:
+                        statements.append(f"CREATE VIEW {qualified} AS {definition}")
+                        connection.execute(text(f"DROP VIEW {qualified}"))
+            if views:
+                print(f"Dropped {len(views)} dependent view(s) of '{table_name}' until it is reloaded.")
+        try:
+            yield
+        finally:
+            if statements:
+                try:
+                    with engine.begin() as connection:
+                        for statement in statements:
+                            connection.execute(text(statement))
+                    print(f"Recreated the dependent view(s) of '{table_name}'.")
+                except Exception as e:
+                    print(f"Error recreating views on '{table_name}': {str(e)}")
+                    print("Run these statements once the table is loaded:\n" + ";\n".join(statements) + ";")
+
+    @staticmethod
+    def prepare_table(engine, table_name, first_chunk, table=None, if_exists="replace"):
+        """
+        Create (or recreate) the target table before the bulk load.
+        Recreating drops any change-capture triggers on the table; load_frames reinstalls them after the load.
+        Views depending on the table must be detached first (see views_detached).
+        :param engine: SQLAlchemy engine object.
+        :param table_name: Name of the target table.
+        :param first_chunk: First DataFrame chunk, used to infer the schema when no table is given.
+        :param table: Optional SQLAlchemy Table object defining the schema.
+        :param if_exists: 'replace' to recreate the table, 'append' to keep existing rows.
+        """
+        if table is not None:
+            if if_exists == "replace":
+                table.drop(engine, checkfirst=True)
+            table.create(engine, checkfirst=True)
+        else:
+            first_chunk.head(0).to_sql(table_name, con=engine, if_exists=if_exists, index=False)
+
+    @staticmethod
+    def copy_chunks(engine, chunks, table_name, columns):
+        """
+        Stream DataFrame chunks into PostgreSQL using COPY FROM STDIN (CSV format) in a single transaction.
+        :param engine: SQLAlchemy engine object (psycopg2 driver).
+        :param chunks: Iterable of Pandas DataFrames.
+        :param table_name: Name of the target table.
+        :param columns: Column names, in the order they appear in each chunk.
+        :return: Number of rows copied.
+        """
+        column_list = ", ".join(columns)
+        copy_sql = f"COPY {table_name} ({column_list}) FROM STDIN WITH (FORMAT csv)"
+        rows = 0
+
+        raw_connection = engine.raw_connection()
+        try:
+            cursor = raw_connection.cursor()
+            buffer = io.StringIO()
+            for chunk in chunks:
+                buffer.seek(0)
+                buffer.truncate()
+                chunk.to_csv(buffer, index=False, header=False, columns=columns, na_rep="")
+                buffer.seek(0)
+                cursor.copy_expert(copy_sql, buffer)
+                rows += len(chunk)
+            cursor.close()
+            raw_connection.commit()
+        except Exception:
+            raw_connection.rollback()
+            raise
+        finally:
+            raw_connection.close()
+        return rows
+
+    @staticmethod
+    def insert_chunks(engine, chunks, table_name, columns, batch_size=1000):
+        """
+        Fallback for engines without COPY support: append each chunk with batched executemany INSERTs.
+        :param engine: SQLAlchemy engine object.
+        :param chunks: Iterable of Pandas DataFrames.
+        :param table_name: Name of the target table.
+        :param columns: Column names to load.
+        :param batch_size: Rows per executemany batch.
+        :return: Number of rows inserted.
+        """
+        rows = 0
+        with engine.begin() as connection:
+            for chunk in chunks:
+                chunk[columns].to_sql(table_name, con=connection, if_exists="append", index=False,
+                                      chunksize=batch_size)
+                rows += len(chunk)
+        return rows
+
+    @staticmethod
+    def load_frames(engine, chunks, table_name, table=None, if_exists="replace"):
+        """
+        Bulk-load an iterable of DataFrame chunks (e.g. from a streaming preprocess step).
+        :param engine: SQLAlchemy engine object.
+        :param chunks: Iterable of Pandas DataFrames.
+        :param table_name: Name of the target table.
+        :param table: Optional SQLAlchemy Table object defining the schema.
+        :param if_exists: 'replace' to recreate the table, 'append' to keep existing rows.
+        :return: Number of rows loaded.
+        """
+        chunks = iter(chunks)
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
+            return 0
+
+        columns = list(first_chunk.columns)
+
+        def all_chunks():
+            yield first_chunk
+            yield from chunks
+
+        def load():
+            BulkLoader.prepare_table(engine, table_name, first_chunk, table, if_exists)
+            if engine.dialect.name == "postgresql":
+                return BulkLoader.copy_chunks(engine, all_chunks(), table_name, columns)
+            return BulkLoader.insert_chunks(engine, all_chunks(), table_name, columns)
+
+        if if_exists == "replace":
+            with BulkLoader.views_detached(engine, table_name):
+                rows = load()
+        else:
+            rows = load()
+        if if_exists == "replace" and inspect(engine).has_table(f"{table_name}_changes"):
+            # The table was recreated without its capture triggers (imported here: change_feed depends on this module)
+            from change_feed import FinanceChangeFeed
+            FinanceChangeFeed.restore(engine, table_name)
+        return rows
+
+    @staticmethod
+    def load_csv(engine, file_path, table_name, table=None, chunk_size=DEFAULT_CHUNK_SIZE, if_exists="replace"):
+        """
+        Bulk-load a CSV file into a table without holding the whole file in memory.
+        :param engine: SQLAlchemy engine object.
+        :param file_path: Path to the CSV file.
+        :param table_name: Name of the target table.
+        :param table: Optional SQLAlchemy Table object defining column types.
+        :param chunk_size: Number of rows read and sent per chunk.
+        :param if_exists: 'replace' to recreate the table, 'append' to keep existing rows.
+        :return: Number of rows loaded.
+        """
+        chunks = BulkLoader.iter_csv_chunks(file_path, chunk_size, table)
+        return BulkLoader.load_frames(engine, chunks, table_name, table, if_exists)
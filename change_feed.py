@@ -0,0 +1,428 @@
+# Description: This module keeps the finance aggregates up to date from a change-data-capture feed.
+# Triggers on finance_transactions record every insert, update and delete (old and new values) in a change
+# table: PL/pgSQL triggers on PostgreSQL, plain SQL triggers on SQLite as a local stand-in. RunningAggregates
+# holds per-date, per-type counts and amount totals (in integer cents, so deletes subtract exactly), applies
+# each polled batch of changes as one columnar delta and persists its state with the feed position, so a
+# refresh costs time proportional to the changes since the last run, not to the table size. Once the state is
+# saved, the changes it has consumed are pruned from the change table. Loads that drop and recreate the table
+# (if_exists='replace') reinstall the triggers afterwards with FinanceChangeFeed.restore().
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text
+from dashboard_queries import DASHBOARD_KPIS, _identifier
+from pipeline_metrics import METRICS
+
+DEFAULT_STATE_FILE = "finance_aggregates_state.json"
+STATE_VERSION = 1
+AGGREGATE_KEYS = ["date", "transaction_type"]
+SNAPSHOT_RETRIES = 5
+
+# The change table mirrors the columns the aggregates use, before ('old_') and after ('new_') the change
+POSTGRESQL_DDL = [
+    """CREATE TABLE IF NOT EXISTS {changes} (
+        change_id BIGSERIAL PRIMARY KEY,
+        txid BIGINT NOT NULL DEFAULT txid_current(),
+        op CHAR(1) NOT NULL,
+        transaction_id INTEGER,
+        old_date DATE, old_amount NUMERIC(10, 2), old_type VARCHAR(10),
+        new_date DATE, new_amount NUMERIC(10, 2), new_type VARCHAR(10),
+        changed_at TIMESTAMP NOT NULL DEFAULT now())""",
+    "CREATE INDEX IF NOT EXISTS {changes}_txid ON {changes} (txid)",
+    """CREATE OR REPLACE FUNCTION {changes}_capture() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO {changes} (op, transaction_id, new_date, new_amount, new_type)
+            VALUES ('I', NEW.transaction_id, NEW.date, NEW.amount, NEW.transaction_type);
+        ELSIF TG_OP = 'UPDATE' THEN
+            INSERT INTO {changes} (op, transaction_id, old_date, old_amount, old_type, new_date, new_amount, new_type)
+            VALUES ('U', NEW.transaction_id, OLD.date, OLD.amount, OLD.transaction_type,
+                    NEW.date, NEW.amount, NEW.transaction_type);
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO {changes} (op, transaction_id, old_date, old_amount, old_type)
+            VALUES ('D', OLD.transaction_id, OLD.date, OLD.amount, OLD.transaction_type);
+        ELSE
+            INSERT INTO {changes} (op) VALUES ('T');
+        END IF;
+        RETURN NULL;
+    END $$""",
+    "DROP TRIGGER IF EXISTS {changes}_capture ON {table}",
+    """CREATE TRIGGER {changes}_capture AFTER INSERT OR UPDATE OR DELETE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION {changes}_capture()""",
+    "DROP TRIGGER IF EXISTS {changes}_truncate ON {table}",
+    """CREATE TRIGGER {changes}_truncate AFTER TRUNCATE ON {table}
+        FOR EACH STATEMENT EXECUTE FUNCTION {changes}_capture()""",
+]
+
+SQLITE_DDL = [
+    """CREATE TABLE IF NOT EXISTS {changes} (
+        change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        op TEXT NOT NULL,
+        transaction_id INTEGER,
+        old_date DATE, old_amount NUMERIC, old_type TEXT,
+        new_date DATE, new_amount NUMERIC, new_type TEXT,
+        changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)""",
+    """CREATE TRIGGER IF NOT EXISTS {changes}_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO {changes} (op, transaction_id, new_date, new_amount, new_type)
+        VALUES ('I', NEW.transaction_id, NEW.date, NEW.amount, NEW.transaction_type);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS {changes}_update AFTER UPDATE ON {table} BEGIN
+        INSERT INTO {changes} (op, transaction_id, old_date, old_amount, old_type, new_date, new_amount, new_type)
+        VALUES ('U', NEW.transaction_id, OLD.date, OLD.amount, OLD.transaction_type,
+                NEW.date, NEW.amount, NEW.transaction_type);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS {changes}_delete AFTER DELETE ON {table} BEGIN
+        INSERT INTO {changes} (op, transaction_id, old_date, old_amount, old_type)
+        VALUES ('D', OLD.transaction_id, OLD.date, OLD.amount, OLD.transaction_type);
+    END""",
+]
+
+CHANGE_COLUMNS = "op, old_date, old_amount, old_type, new_date, new_amount, new_type"
+
+
+def _cents(values):
+    # NUMERIC(10, 2) amounts as exact integer cents (NULL counts as 0)
+    return np.round(pd.to_numeric(values).fillna(0).to_numpy(dtype="float64") * 100).astype("int64")
+
+
+class FinanceChangeFeed:
+    def __init__(self, engine, table_name="finance_transactions", change_table=None):
+        """
+        :param engine: SQLAlchemy engine object (PostgreSQL, or SQLite as a local stand-in).
+        :param table_name: Captured table.
+        :param change_table: Change table name (default: '<table_name>_changes').
+        """
+        if engine.dialect.name not in ("postgresql", "sqlite"):
+            raise ValueError(f"Change capture is not supported on '{engine.dialect.name}'")
+        self.engine = engine
+        self.table_name = _identifier(table_name)
+        self.change_table = _identifier(change_table or f"{table_name}_changes")
+
+    @property
+    def is_postgresql(self):
+        return self.engine.dialect.name == "postgresql"
+
+    def connect(self):
+        """
+        Open a connection whose reads see one consistent snapshot (REPEATABLE READ on PostgreSQL).
+        :return: SQLAlchemy connection.
+        """
+        connection = self.engine.connect()
+        if self.is_postgresql:
+            connection = connection.execution_options(isolation_level="REPEATABLE READ")
+        return connection
+
+    def install(self):
+        """
+        Create the change table and the capture triggers (idempotent). A reset marker is recorded, so
+        aggregates built before the (re)installation are rebuilt from a snapshot on their next refresh.
+        """
+        statements = POSTGRESQL_DDL if self.is_postgresql else SQLITE_DDL
+        with self.engine.begin() as connection:
+            for statement in statements:
+                connection.execute(text(statement.format(changes=self.change_table, table=self.table_name)))
+            connection.execute(text(f"INSERT INTO {self.change_table} (op) VALUES ('T')"))
+        print(f"Change capture installed on '{self.table_name}' (changes in '{self.change_table}').")
+
+    @staticmethod
+    def restore(engine, table_name):
+        """
+        Reinstall capture on a table that was dropped and recreated (e.g. by a load with if_exists='replace'),
+        which also dropped its triggers. Only tables whose change table exists are touched; the reset marker
+        written by install() makes the running aggregates rebuild from a snapshot on their next refresh.
+        :param engine: SQLAlchemy engine object.
+        :param table_name: Table that was recreated.
+        :return: True if capture was reinstalled.
+        """
+        if engine.dialect.name not in ("postgresql", "sqlite"):
+            return False
+        feed = FinanceChangeFeed(engine, table_name)
+        if not inspect(engine).has_table(feed.change_table) or feed.installed():
+            return False
+        feed.install()
+        return True
+
+    def installed(self):
+        """Return True if the change table and the capture triggers exist."""
+        if not inspect(self.engine).has_table(self.change_table):
+            return False
+        with self.engine.connect() as connection:
+            if self.is_postgresql:
+                query = "SELECT 1 FROM pg_trigger WHERE tgname = :name"
+                name = f"{self.change_table}_capture"
+            else:
+                query = "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :name"
+                name = f"{self.change_table}_insert"
+            return connection.execute(text(query), {"name": name}).first() is not None
+
+    def position(self, connection):
+        """
+        Return the current feed position: the transaction snapshot on PostgreSQL (changes are consumed by
+        commit visibility, so long-running writers are never skipped), the last change_id assigned on SQLite
+        (kept by the AUTOINCREMENT sequence, so it does not go back when consumed changes are pruned).
+        :param connection: Connection from connect(); on PostgreSQL this must be its first statement.
+        :return: Position (string or integer).
+        """
+        if self.is_postgresql:
+            return connection.execute(text("SELECT CAST(txid_current_snapshot() AS TEXT)")).scalar()
+        return connection.execute(text("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = :name"),
+                                  {"name": self.change_table}).scalar()
+
+    def read_changes(self, connection, since, until):
+        """
+        Read the changes committed after position `since` and visible at position `until`.
+        :param connection: Connection from connect() that returned `until`.
+        :param since: Position of the previous read.
+        :param until: Current position.
+        :return: Pandas DataFrame with op, old_date, old_amount, old_type, new_date, new_amount, new_type.
+        """
+        if self.is_postgresql:
+            query = (f"SELECT {CHANGE_COLUMNS} FROM {self.change_table} "
+                     f"WHERE txid >= txid_snapshot_xmin(CAST(:since AS txid_snapshot)) "
+                     f"AND NOT txid_visible_in_snapshot(txid, CAST(:since AS txid_snapshot)) "
+                     f"AND txid_visible_in_snapshot(txid, CAST(:until AS txid_snapshot))")
+        else:
+            query = (f"SELECT {CHANGE_COLUMNS} FROM {self.change_table} "
+                     f"WHERE change_id > :since AND change_id <= :until")
+        return pd.read_sql_query(text(query), con=connection, params={"since": since, "until": until})
+
+    def prune(self, position):
+        """
+        Delete changes that every consumer has read, i.e. those before the oldest position still in use.
+        :param position: Oldest position of all consumers (e.g. RunningAggregates.position).
+        :return: Number of deleted changes.
+        """
+        with self.engine.begin() as connection:
+            if self.is_postgresql:
+                result = connection.execute(text(
+                    f"DELETE FROM {self.change_table} "
+                    f"WHERE txid < txid_snapshot_xmin(CAST(:position AS txid_snapshot))"), {"position": position})
+            else:
+                result = connection.execute(text(f"DELETE FROM {self.change_table} WHERE change_id <= :position"),
+                                            {"position": position})
+        print(f"Pruned {result.rowcount} consumed changes from '{self.change_table}'.")
+        return result.rowcount
+
+
+class RunningAggregates:
+    def __init__(self, table_name="finance_transactions"):
+        """
+        :param table_name: Table the aggregates describe.
+        """
+        self.table_name = table_name
+        self.position = None
+        self.cells = pd.DataFrame({"date": pd.Series(dtype="datetime64[ns]"),
+                                   "transaction_type": pd.Series(dtype="object"),
+                                   "transactions": pd.Series(dtype="int64"),
+                                   "amount_cents": pd.Series(dtype="int64")})
+
+    def _combine(self, delta):
+        # Add per-(date, type) deltas to the cells and drop cells that no longer hold any rows
+        cells = pd.concat([self.cells, delta], ignore_index=True)
+        cells = cells.groupby(AGGREGATE_KEYS, dropna=False, as_index=False, sort=False)[
+            ["transactions", "amount_cents"]].sum()
+        self.cells = cells[cells["transactions"] != 0].reset_index(drop=True)
+
+    @staticmethod
+    def _delta(dates, types, amounts, sign):
+        return pd.DataFrame({"date": pd.to_datetime(dates, format="ISO8601"), "transaction_type": types,
+                             "transactions": np.full(len(dates), sign, dtype="int64"),
+                             "amount_cents": sign * _cents(amounts)})
+
+    def snapshot(self, feed):
+        """
+        Rebuild the aggregates from the table (one GROUP BY) and record the matching feed position.
+        :param feed: FinanceChangeFeed.
+        """
+        query = (f"SELECT date, transaction_type, COUNT(*) AS transactions, "
+                 f"SUM(CAST(ROUND(amount * 100) AS BIGINT)) AS amount_cents "
+                 f"FROM {feed.table_name} GROUP BY date, transaction_type")
+        with METRICS.stage("cdc.snapshot") as stage:
+            for _ in range(SNAPSHOT_RETRIES):
+                with feed.connect() as connection:
+                    position = feed.position(connection)
+                    cells = pd.read_sql_query(text(query), con=connection)
+                    # SQLite has no snapshot to pin: retry if changes were committed during the scan
+                    if feed.is_postgresql or feed.position(connection) == position:
+                        break
+            else:
+                raise RuntimeError(f"'{feed.table_name}' kept changing during the snapshot")
+            self.cells = pd.DataFrame({"date": pd.to_datetime(cells["date"], format="ISO8601"),
+                                       "transaction_type": cells["transaction_type"],
+                                       "transactions": cells["transactions"].astype("int64"),
+                                       "amount_cents": pd.to_numeric(cells["amount_cents"]).fillna(0).astype("int64")})
+            self.position = position
+            stage.add(len(self.cells))
+        print(f"Aggregates rebuilt from '{feed.table_name}' ({len(self.cells)} date/type cells).")
+
+    def apply(self, changes):
+        """
+        Apply a batch of changes: deletes and the old side of updates are subtracted, inserts and the new side
+        of updates are added, as one grouped delta per (date, transaction_type).
+        :param changes: DataFrame from FinanceChangeFeed.read_changes().
+        """
+        removed = changes[changes["op"].isin(["U", "D"])]
+        added = changes[changes["op"].isin(["I", "U"])]
+        self._combine(pd.concat([
+            self._delta(removed["old_date"], removed["old_type"], removed["old_amount"], -1),
+            self._delta(added["new_date"], added["new_type"], added["new_amount"], 1),
+        ], ignore_index=True))
+
+    def refresh(self, feed):
+        """
+        Bring the aggregates up to date with the changes since the last refresh (a snapshot on first use or
+        after a truncate or reinstallation of the feed).
+        :param feed: FinanceChangeFeed.
+        :return: Number of changes applied.
+        """
+        if self.position is None:
+            self.snapshot(feed)
+            return 0
+        with METRICS.stage("cdc.refresh") as stage:
+            with feed.connect() as connection:
+                position = feed.position(connection)
+                changes = feed.read_changes(connection, self.position, position)
+            stage.add(len(changes))
+        if (changes["op"] == "T").any():
+            self.snapshot(feed)
+            return len(changes)
+        with METRICS.stage("cdc.apply") as stage:
+            self.apply(changes)
+            self.position = position
+            stage.add(len(changes))
+        return len(changes)
+
+    def kpis(self, kpis=DASHBOARD_KPIS):
+        """
+        Compute scalar KPIs from the aggregates; supports counts and amount sums filtered on date or type.
+        :param kpis: List of metric declarations (see dashboard_queries).
+        :return: Dictionary of metric name to value.
+        """
+        results = {}
+        for metric in kpis:
+            cells = self.cells
+            for column, value in metric.get("where", {}).items():
+                if column not in AGGREGATE_KEYS:
+                    raise ValueError(f"Metric '{metric['name']}' filters on '{column}', which is not aggregated")
+                cells = cells[cells[column] == (pd.Timestamp(value) if column == "date" else value)]
+            if metric["agg"] == "count":
+                results[metric["name"]] = int(cells["transactions"].sum())
+            elif metric["agg"] == "sum" and metric.get("column") == "amount":
+                results[metric["name"]] = int(cells["amount_cents"].sum()) / 100
+            else:
+                raise ValueError(f"Metric '{metric['name']}' cannot be computed from the running aggregates")
+        return results
+
+    def transaction_type_counts(self):
+        """
+        Return the per-type transaction counts, like value_counts().
+        :return: Pandas Series.
+        """
+        counts = self.cells.groupby("transaction_type")["transactions"].sum()
+        return counts.sort_values(ascending=False, kind="stable").rename("count")
+
+    def trend(self):
+        """
+        Return the summed amount per date, like groupby('date')['amount'].sum().
+        :return: Pandas Series indexed by date.
+        """
+        sums = self.cells.groupby("date")["amount_cents"].sum() / 100
+        return sums.sort_index().rename("amount")
+
+    def save(self, file_path=DEFAULT_STATE_FILE):
+        """
+        Persist the aggregates and their feed position (atomic replace of the JSON file).
+        :param file_path: State file.
+        """
+        state = {"version": STATE_VERSION, "table": self.table_name, "position": self.position,
+                 "saved_at": time.time(),
+                 "cells": {"date": [None if pd.isna(value) else value.isoformat() for value in self.cells["date"]],
+                           "transaction_type": self.cells["transaction_type"].tolist(),
+                           "transactions": self.cells["transactions"].tolist(),
+                           "amount_cents": self.cells["amount_cents"].tolist()}}
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(state, file)
+        os.replace(temp_path, file_path)
+
+    @staticmethod
+    def load(file_path, table_name="finance_transactions"):
+        """
+        Load aggregates saved by save().
+        :param file_path: State file.
+        :param table_name: Expected table; a state for another table or version is ignored.
+        :return: RunningAggregates, or None if there is no usable state.
+        """
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path) as file:
+            state = json.load(file)
+        if state.get("version") != STATE_VERSION or state.get("table") != table_name:
+            return None
+        aggregates = RunningAggregates(table_name)
+        cells = state["cells"]
+        aggregates.cells = pd.DataFrame({"date": pd.to_datetime(pd.Series(cells["date"], dtype="object"),
+                                                                format="ISO8601"),
+                                         "transaction_type": pd.Series(cells["transaction_type"], dtype="object"),
+                                         "transactions": pd.Series(cells["transactions"], dtype="int64"),
+                                         "amount_cents": pd.Series(cells["amount_cents"], dtype="int64")})
+        aggregates.position = state["position"]
+        return aggregates
+
+    @staticmethod
+    def open(feed, state_file=DEFAULT_STATE_FILE, prune=True):
+        """
+        Load the saved aggregates (or snapshot the table the first time), apply the pending changes and save.
+        Once saved, the consumed changes are pruned from the change table.
+        :param feed: FinanceChangeFeed.
+        :param state_file: State file (None to keep nothing between runs, and nothing is pruned).
+        :param prune: Delete the consumed changes after the save (False when other consumers read the feed).
+        :return: Up-to-date RunningAggregates.
+        """
+        aggregates = RunningAggregates.load(state_file, feed.table_name) if state_file else None
+        aggregates = aggregates or RunningAggregates(feed.table_name)
+        applied = aggregates.refresh(feed)
+        print(f"Aggregates of '{feed.table_name}' are up to date ({applied} changes applied).")
+        if state_file:
+            aggregates.save(state_file)
+            if prune:
+                feed.prune(aggregates.position)
+        return aggregates
+
+    @staticmethod
+    def open_if_installed(engine, table_name="finance_transactions", state_file=DEFAULT_STATE_FILE, prune=True):
+        """
+        Bring the running aggregates up to date from the change feed, if change capture is installed.
+        :param engine: SQLAlchemy engine object.
+        :param table_name: Name of the captured table.
+        :param state_file: File the aggregates are kept in between runs.
+        :param prune: Delete the consumed changes once the state is saved (see open()).
+        :return: RunningAggregates, or None if change capture is not installed or the refresh failed.
+        """
+        try:
+            if engine.dialect.name not in ("postgresql", "sqlite"):
+                return None
+            feed = FinanceChangeFeed(engine, table_name)
+            if not feed.installed():
+                return None
+            return RunningAggregates.open(feed, state_file, prune)
+        except Exception as e:
+            print(f"Error refreshing aggregates: {str(e)}")
+            return None
+
+
+# Main script execution
+if __name__ == "__main__":
+    from engine_registry import EngineRegistry
+
+    try:
+        # Install change capture on the transactions table and build the initial aggregates
+        feed = FinanceChangeFeed(EngineRegistry.get_engine())
+        if not feed.installed():
+            feed.install()
+        aggregates = RunningAggregates.open(feed)
+        print(aggregates.kpis())
+    except Exception as e:
+        print(f"Error setting up change capture: {str(e)}")
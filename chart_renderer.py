@@ -0,0 +1,138 @@
+# Description: Headless, parallel rendering of report charts.
+# A chart is a small, picklable spec (kind, aggregated data, labels, output file). Specs are drawn on
+# standalone Agg figures (no pyplot, no display, nothing blocks), independent figures are rendered in a
+# process pool, and a manifest of data hashes lets unchanged charts be skipped on the next run.
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+MANIFEST_FILE = "_chart_manifest.json"
+# Starting a process pool costs more than drawing a few charts: unless workers are given, smaller sets render in-process
+PARALLEL_MIN_CHARTS = 4
+
+
+def chart_hash(spec):
+    """
+    Hash everything that affects a chart's pixels: its data and its drawing options.
+    :param spec: Chart spec dictionary.
+    :return: Hex digest string.
+    """
+    digest = hashlib.sha256()
+    data = spec["data"]
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    if isinstance(data, pd.DataFrame):
+        digest.update(repr(list(data.columns)).encode())
+    options = {key: value for key, value in spec.items() if key != "data"}
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def draw_chart(spec, figure=None):
+    """
+    Draw one chart spec and save it.
+    :param spec: Dictionary with 'kind' ('bar', 'line' or 'heatmap'), 'data' (Series or DataFrame), 'file',
+                 and optional 'title', 'xlabel', 'ylabel', 'color', 'figsize'.
+    :param figure: Optional existing figure (e.g. from pyplot for interactive display); by default a standalone
+                   Agg figure is used, so no display or GUI backend is involved.
+    :return: Path of the saved image.
+    """
+    if figure is None:
+        from matplotlib.figure import Figure
+        figure = Figure(figsize=spec.get("figsize", (8, 5)))
+    ax = figure.subplots()
+
+    kind = spec["kind"]
+    if kind == "bar":
+        spec["data"].plot(kind="bar", color=spec.get("color"), ax=ax)
+        ax.tick_params(axis="x", labelrotation=0)
+    elif kind == "line":
+        spec["data"].plot(kind="line", color=spec.get("color"), ax=ax)
+    elif kind == "heatmap":
+        import seaborn as sns
+        sns.heatmap(spec["data"], annot=True, cmap=spec.get("cmap", "coolwarm"), fmt=".2f", ax=ax)
+    else:
+        raise ValueError(f"Unsupported chart kind: '{kind}'")
+
+    ax.set_title(spec.get("title", ""))
+    if "xlabel" in spec:
+        ax.set_xlabel(spec["xlabel"])
+    if "ylabel" in spec:
+        ax.set_ylabel(spec["ylabel"])
+    figure.tight_layout()
+    figure.savefig(spec["file"])
+    return spec["file"]
+
+
+class ChartRenderer:
+    def __init__(self, output_dir=".", workers=None, skip_unchanged=True):
+        """
+        :param output_dir: Directory the images (and the hash manifest) are written to.
+        :param workers: Worker processes (default: in-process below PARALLEL_MIN_CHARTS charts, otherwise one per CPU
+                        capped by the number of charts; 1 renders in-process).
+        :param skip_unchanged: Skip charts whose data and options hash matches the last render.
+        """
+        self.output_dir = output_dir
+        self.workers = workers
+        self.skip_unchanged = skip_unchanged
+        self.manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path) as file:
+            return json.load(file)
+
+    def _write_manifest(self, manifest):
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(manifest, file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+    def render(self, specs, show=False):
+        """
+        Render chart specs, in parallel when there are enough to draw to pay for the process pool.
+        :param specs: List of chart spec dictionaries ('file' is relative to the output directory).
+        :param show: Draw in this process with pyplot and display the figures at the end (interactive use).
+        :return: Dictionary of file path to 'rendered' or 'skipped'.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest = self._read_manifest()
+        status = {}
+        pending = []
+        for spec in specs:
+            spec = dict(spec, file=os.path.join(self.output_dir, spec["file"]))
+            key = os.path.relpath(spec["file"], self.output_dir)
+            digest = chart_hash(spec)
+            if self.skip_unchanged and not show and manifest.get(key) == digest and os.path.exists(spec["file"]):
+                status[spec["file"]] = "skipped"
+                continue
+            pending.append((spec, key, digest))
+
+        if show:
+            import matplotlib.pyplot as plt
+            for spec, _, _ in pending:
+                draw_chart(spec, plt.figure(figsize=spec.get("figsize", (8, 5))))
+            plt.show()
+        else:
+            if self.workers is None and len(pending) < PARALLEL_MIN_CHARTS:
+                workers = 1
+            else:
+                workers = min(self.workers or os.cpu_count() or 1, len(pending))
+            if workers > 1:
+                chunksize = max(1, len(pending) // (workers * 4))
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    list(executor.map(draw_chart, [spec for spec, _, _ in pending], chunksize=chunksize))
+            else:
+                for spec, _, _ in pending:
+                    draw_chart(spec)
+
+        for spec, key, digest in pending:
+            manifest[key] = digest
+            status[spec["file"]] = "rendered"
+        self._write_manifest(manifest)
+
+        rendered = sum(1 for value in status.values() if value == "rendered")
+        print(f"Charts rendered: {rendered}, unchanged and skipped: {len(status) - rendered}")
+        return status
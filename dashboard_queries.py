@@ -0,0 +1,250 @@
+# Description: This module computes the finance dashboard KPIs and trend inside the database.
+# Metrics are declared as aggregates, e.g.
+#     {"name": "total_credit", "agg": "sum", "column": "amount", "where": {"transaction_type": "credit"}}
+# and planned into a single SELECT (SUM(...) FILTER (WHERE ...) on PostgreSQL, CASE WHEN elsewhere) or a
+# GROUP BY query, so only a handful of aggregated rows leave the database. An optional daily rollup
+# (a materialized view on PostgreSQL, a summary table elsewhere) makes refreshes cheaper still.
+# Metrics the database cannot compute are evaluated with Pandas on just the columns they need; sums of NUMERIC
+# columns are then taken in exact fixed point at the column's scale.
+import re
+import pandas as pd
+from sqlalchemy import text
+from pipeline_metrics import METRICS
+from aggregation_engine import decimal_sum
+from finance_schema import FinanceFrameSchema
+
+DASHBOARD_KPIS = [
+    {"name": "total_transactions", "agg": "count"},
+    {"name": "total_credit", "agg": "sum", "column": "amount", "where": {"transaction_type": "credit"}},
+    {"name": "total_debit", "agg": "sum", "column": "amount", "where": {"transaction_type": "debit"}},
+]
+DASHBOARD_TREND = {"name": "amount", "by": "date", "agg": "sum", "column": "amount"}
+
+# Aggregates the database computes; anything else is evaluated with Pandas
+SQL_AGGREGATES = {"count": "COUNT", "sum": "SUM", "min": "MIN", "max": "MAX", "mean": "AVG"}
+
+ROLLUP_NAME = "finance_daily_summary"
+ROLLUP_KEYS = ("date", "transaction_type")
+ROLLUP_VALUE = "amount"
+# How each aggregate of the value column is re-aggregated from the rollup columns
+ROLLUP_AGGREGATES = {"count": ("SUM", "transactions"), "sum": ("SUM", "amount_sum"),
+                     "min": ("MIN", "amount_min"), "max": ("MAX", "amount_max")}
+
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _identifier(name):
+    if not IDENTIFIER.match(name):
+        raise ValueError(f"Invalid column name: '{name}'")
+    return name
+
+
+class FinanceQueryPlanner:
+    def __init__(self, engine=None, table_name="finance_transactions", rollup=None, scales=None):
+        """
+        :param engine: SQLAlchemy engine object (None to compute everything with Pandas).
+        :param table_name: Transactions table.
+        :param rollup: Optional name of a daily rollup created by create_rollup(); used for the metrics it can answer.
+        :param scales: Decimal places of the NUMERIC columns summed with Pandas (default: from FinanceTransaction).
+        """
+        self.engine = engine
+        self.table_name = _identifier(table_name)
+        self.rollup = _identifier(rollup) if rollup else None
+        self.scales = scales if scales is not None else {ROLLUP_VALUE: FinanceFrameSchema.scale(ROLLUP_VALUE)}
+
+    def pushable(self, metric):
+        """Return True if the database can compute the metric."""
+        return self.engine is not None and metric.get("agg") in SQL_AGGREGATES
+
+    def use_rollup(self, metrics, by=None):
+        """Return True if every metric (and the grouping column) can be answered from the rollup."""
+        if not self.rollup or (by is not None and by not in ROLLUP_KEYS):
+            return False
+        for metric in metrics:
+            if metric["agg"] not in ROLLUP_AGGREGATES:
+                return False
+            if metric["agg"] != "count" and metric.get("column") != ROLLUP_VALUE:
+                return False
+            if any(column not in ROLLUP_KEYS for column in metric.get("where", {})):
+                return False
+        return True
+
+    def expression(self, metric, params, from_rollup=False):
+        """
+        Build the SQL aggregate expression for one metric, adding its filter values to `params`.
+        :param metric: Metric declaration.
+        :param params: Dictionary of bind parameters (updated in place).
+        :param from_rollup: Re-aggregate the rollup columns instead of the raw rows.
+        :return: SQL expression string.
+        """
+        conditions = []
+        for column, value in metric.get("where", {}).items():
+            key = f"p{len(params)}"
+            params[key] = value
+            conditions.append(f"{_identifier(column)} = :{key}")
+        condition = " AND ".join(conditions)
+
+        if from_rollup:
+            function, argument = ROLLUP_AGGREGATES[metric["agg"]]
+        else:
+            function = SQL_AGGREGATES[metric["agg"]]
+            argument = _identifier(metric["column"]) if metric.get("column") else "*"
+
+        if not condition:
+            return f"{function}({argument})"
+        if self.engine.dialect.name == "postgresql":
+            return f"{function}({argument}) FILTER (WHERE {condition})"
+        argument = "1" if argument == "*" else argument
+        return f"{function}(CASE WHEN {condition} THEN {argument} END)"
+
+    def pandas_metric(self, df, metric):
+        """
+        Evaluate one metric with Pandas.
+        :param df: Pandas DataFrame.
+        :param metric: Metric declaration; 'agg' may be any Pandas aggregation name or a callable.
+        :return: Scalar value.
+        """
+        for column, value in metric.get("where", {}).items():
+            df = df[df[column] == value]
+        if metric["agg"] == "count" and not metric.get("column"):
+            return len(df)
+        values = df[metric["column"]]
+        if metric["agg"] == "sum":
+            return decimal_sum(values, self.scales.get(metric["column"]))
+        return values.agg(metric["agg"])
+
+    def local_frame(self, df, metrics):
+        # Rows for the metrics computed locally: the given DataFrame, or only the needed columns
+        if df is not None:
+            return df
+        columns = sorted({column for metric in metrics for column in [metric.get("column"), *metric.get("where", {})]
+                          if column})
+        column_list = ", ".join(_identifier(column) for column in columns) or "*"
+        return pd.read_sql_query(f"SELECT {column_list} FROM {self.table_name}", con=self.engine)
+
+    def kpis(self, kpis=DASHBOARD_KPIS, df=None):
+        """
+        Compute scalar KPIs, pushing down every aggregate the database supports into one query.
+        :param kpis: List of metric declarations.
+        :param df: Optional DataFrame used when there is no engine, for metrics that cannot be pushed down,
+                   or if the query fails.
+        :return: Dictionary of metric name to value.
+        """
+        pushed = [metric for metric in kpis if self.pushable(metric)]
+        local = [metric for metric in kpis if not self.pushable(metric)]
+        results = {}
+
+        if pushed:
+            try:
+                with METRICS.stage("dashboard.query") as stage:
+                    from_rollup = self.use_rollup(pushed)
+                    params = {}
+                    select = ", ".join(f"{self.expression(metric, params, from_rollup)} AS {_identifier(metric['name'])}"
+                                       for metric in pushed)
+                    source = self.rollup if from_rollup else self.table_name
+                    with self.engine.connect() as connection:
+                        row = connection.execute(text(f"SELECT {select} FROM {source}"), params).mappings().one()
+                    stage.add(1)
+                for metric in pushed:
+                    value = row[metric["name"]]
+                    if value is None and metric["agg"] in ("count", "sum"):
+                        value = 0
+                    results[metric["name"]] = float(value) if value is not None and metric["agg"] != "count" else value
+            except Exception as e:
+                if df is None:
+                    raise
+                print(f"Aggregate query failed, computing KPIs with Pandas: {str(e)}")
+                local = kpis
+
+        if local:
+            frame = self.local_frame(df, local)
+            for metric in local:
+                results[metric["name"]] = self.pandas_metric(frame, metric)
+        return {metric["name"]: results[metric["name"]] for metric in kpis}
+
+    def trend(self, spec=DASHBOARD_TREND, df=None):
+        """
+        Compute a time series (one aggregate per value of spec['by']) with GROUP BY in the database.
+        :param spec: Metric declaration with a 'by' column.
+        :param df: Optional DataFrame used when there is no engine, the aggregate cannot be pushed down,
+                   or the query fails.
+        :return: Pandas Series indexed by spec['by'] and named spec['name'], sorted by index.
+        """
+        by = _identifier(spec["by"])
+        if self.pushable(spec):
+            try:
+                with METRICS.stage("dashboard.query") as stage:
+                    from_rollup = self.use_rollup([spec], by)
+                    params = {}
+                    expression = self.expression(spec, params, from_rollup)
+                    source = self.rollup if from_rollup else self.table_name
+                    query = f"SELECT {by}, {expression} AS value FROM {source} GROUP BY {by} ORDER BY {by}"
+                    result = pd.read_sql_query(text(query), con=self.engine, params=params)
+                    stage.add(len(result))
+                index = pd.to_datetime(result[by], format="ISO8601") if by == "date" else result[by]
+                values = pd.to_numeric(result["value"]).fillna(0) if spec["agg"] in ("count", "sum") \
+                    else pd.to_numeric(result["value"])
+                return pd.Series(values.to_numpy(), index=pd.Index(index, name=by), name=spec["name"])
+            except Exception as e:
+                if df is None:
+                    raise
+                print(f"Trend query failed, computing it with Pandas: {str(e)}")
+
+        frame = self.local_frame(df, [spec, {"column": spec["by"], "agg": "count"}])
+        for column, value in spec.get("where", {}).items():
+            frame = frame[frame[column] == value]
+        if spec["agg"] == "count" and not spec.get("column"):
+            series = frame.groupby(spec["by"]).size()
+        else:
+            values = frame[spec["column"]]
+            if spec["agg"] == "sum":
+                series = decimal_sum(values, self.scales.get(spec["column"]), by=frame[spec["by"]])
+            else:
+                series = values.groupby(frame[spec["by"]]).agg(spec["agg"])
+        if by == "date":
+            series.index = pd.to_datetime(series.index, format="ISO8601")
+        return series.sort_index().rename(spec["name"])
+
+    def create_rollup(self, name=ROLLUP_NAME, materialized=True):
+        """
+        Create the daily rollup (one row per date and transaction type) if it does not exist.
+        On PostgreSQL this is a materialized view with a unique index, so it can be refreshed concurrently;
+        other databases get a summary table that refresh_rollup() rebuilds. Loads that replace the
+        transactions table drop and recreate the materialized view around the replace (BulkLoader.views_detached).
+        :param name: Rollup name.
+        :param materialized: Use a materialized view on PostgreSQL (False for a plain summary table).
+        :return: Rollup name, for FinanceQueryPlanner(rollup=...).
+        """
+        name = _identifier(name)
+        select = (f"SELECT date, transaction_type, COUNT(*) AS transactions, SUM(amount) AS amount_sum, "
+                  f"MIN(amount) AS amount_min, MAX(amount) AS amount_max "
+                  f"FROM {self.table_name} GROUP BY date, transaction_type")
+        with self.engine.begin() as connection:
+            if materialized and self.engine.dialect.name == "postgresql":
+                connection.execute(text(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {name} AS {select}"))
+            else:
+                connection.execute(text(f"CREATE TABLE IF NOT EXISTS {name} AS {select}"))
+            connection.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {name}_key ON {name} (date, transaction_type)"))
+        self.rollup = name
+        print(f"Rollup '{name}' is available.")
+        return name
+
+    def refresh_rollup(self, name=None):
+        """
+        Bring the rollup up to date with the transactions table.
+        :param name: Rollup name (default: the planner's rollup).
+        """
+        name = _identifier(name or self.rollup or ROLLUP_NAME)
+        with METRICS.stage("dashboard.refresh_rollup"):
+            with self.engine.begin() as connection:
+                is_view = self.engine.dialect.name == "postgresql" and connection.execute(
+                    text("SELECT 1 FROM pg_matviews WHERE matviewname = :name"), {"name": name}).first() is not None
+                if is_view:
+                    connection.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}"))
+                else:
+                    connection.execute(text(f"DELETE FROM {name}"))
+                    connection.execute(text(
+                        f"INSERT INTO {name} (date, transaction_type, transactions, amount_sum, amount_min, amount_max) "
+                        f"SELECT date, transaction_type, COUNT(*), SUM(amount), MIN(amount), MAX(amount) "
+                        f"FROM {self.table_name} GROUP BY date, transaction_type"))
+        print(f"Rollup '{name}' refreshed.")
@@ -10,4 +10,4 @@ datasource = glueContext.create_dynamic_frame.from_catalog(
 resolved = ResolveChoice.apply(datasource, choice="MATCH_CATALOG")
 
 # Partition data by location and date
-partitioned = datasource.repartition(100).toDF().write.partitionBy("factory_location", "production_date").parquet("s3://output-bucket/partitioned-data/")
+partitioned = resolved.repartition(100).toDF().write.partitionBy("factory_location", "production_date").parquet("s3://output-bucket/partitioned-data/")
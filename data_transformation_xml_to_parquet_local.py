@@ -0,0 +1,164 @@
+# Description: Standalone (non-Glue) version of data_transformation_xml_to_parquet.py.
+# It reads production-log XML/CSV files, resolves schema drift against a declared catalog schema
+# (the local equivalent of ResolveChoice MATCH_CATALOG) and writes Hive-partitioned Parquet
+# by factory_location/production_date with pyarrow, so the job can run on-prem and be tested offline.
+import glob
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from extract_from_csv_json_xml import iter_xml_chunks
+
+# Declared catalog schema for production_logs.xml_data
+CATALOG_SCHEMA = pa.schema([
+    ("record_id", pa.int64()),
+    ("factory_location", pa.string()),
+    ("production_date", pa.date32()),
+    ("product_code", pa.string()),
+    ("units_produced", pa.int64()),
+    ("defect_rate", pa.float64()),
+])
+PARTITION_COLUMNS = ["factory_location", "production_date"]
+
+
+class XmlToParquetJob:
+    @staticmethod
+    def resolve_column(values, field):
+        """
+        Cast one column to its catalog type; values that cannot be converted become null.
+        :param values: Pandas Series read from the source.
+        :param field: pyarrow Field from the catalog schema.
+        :return: pyarrow Array of the catalog type.
+        """
+        array = pa.array(values, from_pandas=True)
+        try:
+            return pc.cast(array, field.type)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+
+        # Choice types (e.g. "12" and "n/a" in a numeric column): coerce value by value
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            coerced = pd.to_numeric(values, errors="coerce")
+            if pa.types.is_integer(field.type):
+                coerced = coerced.where(coerced == coerced.round()).astype("Int64")
+            return pa.array(coerced, type=field.type, from_pandas=True)
+        if pa.types.is_date(field.type) or pa.types.is_timestamp(field.type):
+            coerced = pd.to_datetime(values, errors="coerce")
+            if pa.types.is_date(field.type):
+                coerced = coerced.dt.date
+            return pa.array(coerced, type=field.type, from_pandas=True)
+        return pc.cast(array.cast(pa.string()), field.type)
+
+    @staticmethod
+    def resolve_schema(df, schema=CATALOG_SCHEMA):
+        """
+        Match a source chunk to the catalog: cast known columns, add missing ones as nulls, drop extras.
+        :param df: Pandas DataFrame chunk.
+        :param schema: Catalog pyarrow schema.
+        :return: pyarrow RecordBatch with exactly the catalog schema.
+        """
+        arrays = []
+        for field in schema:
+            if field.name in df:
+                arrays.append(XmlToParquetJob.resolve_column(df[field.name], field))
+            else:
+                arrays.append(pa.nulls(len(df), type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    @staticmethod
+    def read_source(file, chunk_size=100000):
+        """
+        Read one source file in chunks with every field as text; typing happens in resolve_schema.
+        :param file: Path to an .xml or .csv file.
+        :param chunk_size: Rows per chunk.
+        :return: Iterator of Pandas DataFrames.
+        """
+        if file.endswith(".xml"):
+            text_schema = {field.name: "object" for field in CATALOG_SCHEMA}
+            return iter_xml_chunks(file, text_schema, chunk_size)
+        return pd.read_csv(file, dtype=str, chunksize=chunk_size)
+
+    @staticmethod
+    def iter_batches(files, schema=CATALOG_SCHEMA, chunk_size=100000):
+        """
+        Read and resolve every source file.
+        :param files: List of source file paths.
+        :param schema: Catalog pyarrow schema.
+        :param chunk_size: Rows per chunk.
+        :return: Iterator of pyarrow RecordBatches.
+        """
+        for file in files:
+            for chunk in XmlToParquetJob.read_source(file, chunk_size):
+                yield XmlToParquetJob.resolve_schema(chunk, schema)
+
+    @staticmethod
+    def write_partitioned(batches, output_dir, schema=CATALOG_SCHEMA, partition_columns=PARTITION_COLUMNS,
+                          compression="snappy", use_dictionary=True, max_rows_per_group=128 * 1024,
+                          max_rows_per_file=1024 * 1024, max_open_files=64):
+        """
+        Write Hive-partitioned Parquet (e.g. factory_location=Sofia/production_date=2024-01-31/part-0.parquet).
+        Partitions are written by pyarrow's thread pool; max_open_files bounds the open handles.
+        The dataset is written to a temporary sibling directory and swapped in once complete, so a rerun with
+        fewer or different partitions leaves no stale part files and readers never see a half-written dataset.
+        :param batches: Iterable of pyarrow RecordBatches with the catalog schema.
+        :param output_dir: Local directory; its previous contents are replaced.
+        :param schema: Catalog pyarrow schema.
+        :param partition_columns: Columns used for the directory layout.
+        :param compression: Parquet compression codec ('snappy', 'zstd', 'gzip', ...).
+        :param use_dictionary: Dictionary-encode columns (True, False or a list of column names).
+        :param max_rows_per_group: Upper bound on rows per Parquet row group.
+        :param max_rows_per_file: Upper bound on rows per output file.
+        :param max_open_files: Maximum files kept open at once across partitions.
+        """
+        file_options = ds.ParquetFileFormat().make_write_options(
+            compression=compression, use_dictionary=use_dictionary)
+        output_dir = os.path.normpath(output_dir)
+        temp_dir = f"{output_dir}.tmp-{os.getpid()}"
+        old_dir = f"{output_dir}.old-{os.getpid()}"
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        try:
+            ds.write_dataset(
+                batches,
+                temp_dir,
+                schema=schema,
+                format="parquet",
+                file_options=file_options,
+                partitioning=partition_columns,
+                partitioning_flavor="hive",
+                max_open_files=max_open_files,
+                max_rows_per_file=max_rows_per_file,
+                min_rows_per_group=min(max_rows_per_group, 16 * 1024),
+                max_rows_per_group=max_rows_per_group,
+                use_threads=True,
+                existing_data_behavior="error",
+            )
+        except BaseException:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+
+        # Swap the new dataset in: the previous one is moved aside first and removed afterwards
+        if os.path.exists(output_dir):
+            os.replace(output_dir, old_dir)
+        os.replace(temp_dir, output_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @staticmethod
+    def run(input_pattern, output_dir, **write_options):
+        """
+        Run the whole job: read, resolve against the catalog, write partitioned Parquet.
+        :param input_pattern: Glob for source files (e.g. 'data/production_logs/*.xml').
+        :param output_dir: Output directory for the partitioned dataset.
+        """
+        files = sorted(glob.glob(input_pattern))
+        if not files:
+            print(f"No source files match '{input_pattern}'")
+            return
+        XmlToParquetJob.write_partitioned(XmlToParquetJob.iter_batches(files), output_dir, **write_options)
+        print(f"Wrote {len(files)} source files to partitioned Parquet at {output_dir}")
+
+
+# Main script execution
+if __name__ == "__main__":
+    XmlToParquetJob.run(os.path.join("data", "production_logs", "*.xml"), "partitioned-data")
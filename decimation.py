@@ -0,0 +1,84 @@
+# Description: This module caps the number of points plotted per series so chart rendering time and
+# output size stay bounded however long the history is. A series is optionally resampled into time
+# buckets first, then reduced with Largest-Triangle-Three-Buckets (LTTB), which keeps the points that
+# carry the visual shape (peaks, troughs, turns) instead of every n-th point.
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_POINTS = 2000
+
+
+def lttb(x, y, threshold):
+    """
+    Select the indices of `threshold` points that best preserve the shape of the line (x, y).
+    :param x: 1-D array of increasing x values (numeric).
+    :param y: 1-D array of y values.
+    :param threshold: Number of points to keep (the first and last point are always kept).
+    :return: Sorted NumPy array of selected indices.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    # Bucket i (of threshold - 2 inner buckets) covers [edges[i], edges[i + 1])
+    edges = (np.floor(np.arange(threshold - 1) * (n - 2) / (threshold - 2)) + 1).astype(np.int64)
+    edges[-1] = n - 1
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # The third vertex is the average of the next bucket (or the last point for the final bucket)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        # Twice the triangle area for every candidate in the bucket; keep the largest
+        areas = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+
+def time_bucket(series, bucket, agg="sum"):
+    """
+    Resample a time-indexed series into fixed buckets.
+    :param series: Pandas Series with a DatetimeIndex.
+    :param bucket: Pandas offset alias, e.g. 'h', 'D', 'W', 'MS'.
+    :param agg: Aggregation per bucket ('sum', 'mean', 'max', ...).
+    :return: Resampled Series (empty buckets dropped).
+    """
+    # Empty buckets sum and count to 0 rather than NaN, so they are dropped by their row count
+    resampled = series.resample(bucket)
+    return resampled.agg(agg)[resampled.count() > 0]
+
+
+def decimate(series, max_points=DEFAULT_MAX_POINTS, bucket=None, agg="sum"):
+    """
+    Reduce a series to at most `max_points` points: time buckets first (if set), then LTTB.
+    :param series: Pandas Series indexed by date/time or by any numeric x value.
+    :param max_points: Maximum number of points to return (None or 0 to keep every point).
+    :param bucket: Optional Pandas offset alias to resample to before LTTB (time-indexed series only).
+    :param agg: Aggregation used by the time buckets.
+    :return: Pandas Series.
+    """
+    series = series.dropna().sort_index()
+    if bucket:
+        series = time_bucket(series, bucket, agg)
+    if not max_points or len(series) <= max_points:
+        return series
+
+    index = series.index
+    if isinstance(index, pd.DatetimeIndex):
+        x = index.asi8
+    else:
+        x = pd.to_numeric(pd.Series(index), errors="coerce").to_numpy(dtype="float64")
+        if np.isnan(x).any():
+            x = np.arange(len(series))
+    return series.iloc[lttb(x, series.to_numpy(dtype="float64"), max_points)]
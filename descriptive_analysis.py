@@ -1,22 +1,22 @@
 import pandas as pd
-from sqlalchemy import create_engine
-import matplotlib.pyplot as plt
+from engine_registry import EngineRegistry
+from streaming_reader import StreamingReader
+from aggregation_engine import DescriptiveAggregator
+from etlPipeline_with_PostgreSQL_01 import FinanceTransaction
+from finance_schema import FinanceFrameSchema
+from pipeline_metrics import METRICS
+from chart_renderer import ChartRenderer
+from change_feed import RunningAggregates
 
 class FinanceDataAnalysis:
     @staticmethod
     def connect_to_database():
         """
-        Create a connection to the PostgreSQL database using SQLAlchemy.
+        Get the shared, pooled connection to the PostgreSQL database (configured in engine_registry).
         :return: SQLAlchemy engine object.
         """
-        user = "postgres"
-        password = "admin"
-        host = "localhost"
-        port = "5432"
-        database = "etl_pipeline"
-        
         try:
-            engine = create_engine(f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}")
+            engine = EngineRegistry.get_engine()
             print("Connected to the database successfully.")
             return engine
         except Exception as e:
@@ -24,44 +24,102 @@ class FinanceDataAnalysis:
             return None
 
     @staticmethod
-    def load_data(engine, table_name):
+    def load_data(engine, table_name, columns=None, chunk_size=None, cache_dir=None, compact=True):
         """
         Load data from the specified SQL table into a Pandas DataFrame.
         :param engine: SQLAlchemy engine object.
         :param table_name: Name of the table to query.
-        :return: Pandas DataFrame containing the table data.
+        :param columns: Optional list of columns to fetch when streaming.
+        :param chunk_size: If set, stream the table through a server-side cursor in batches of this size.
+        :param cache_dir: If set, refresh and read a local Parquet cache of the table instead of querying it in full.
+        :param compact: Convert finance_transactions frames to the compact dtypes of FinanceFrameSchema
+                        (categorical transaction_type, int32 ids, float64 amounts, datetime64 dates).
+        :return: Pandas DataFrame containing the table data, or an iterator of DataFrame batches.
         """
+        compact = compact and table_name == FinanceTransaction.__tablename__
+
+        if cache_dir:
+            from parquet_cache import FinanceParquetCache
+            return FinanceParquetCache.load(engine, table_name, columns, cache_dir, compact, stage="analysis.load_data")
+
+        if chunk_size:
+            table = FinanceTransaction.__table__ if table_name == FinanceTransaction.__tablename__ else None
+            print(f"Streaming data from '{table_name}' table in batches of {chunk_size} rows.")
+            batches = StreamingReader.iter_batches(engine, table_name, columns, chunk_size, table)
+            if compact:
+                batches = FinanceFrameSchema.iter_compact(batches)
+            return METRICS.track_batches("analysis.load_data", batches)
+
         try:
-            query = f"SELECT * FROM {table_name};"
-            df = pd.read_sql_query(query, con=engine)
+            with METRICS.stage("analysis.load_data") as stage:
+                query = f"SELECT * FROM {table_name};"
+                df = pd.read_sql_query(query, con=engine)
+                if compact:
+                    df = FinanceFrameSchema.compact(df)
+                stage.add_frame(df)
             print(f"Data loaded successfully from '{table_name}' table.")
             return df
         except Exception as e:
             print(f"Error loading data: {str(e)}")
             return None
 
+    @staticmethod
+    def perform_incremental_analysis(aggregates):
+        """
+        Report the totals, transaction type distribution and trend kept up to date by the change feed,
+        without reading the table (basic statistics need the full data, see perform_descriptive_analysis).
+        :param aggregates: RunningAggregates from RunningAggregates.open_if_installed().
+        """
+        try:
+            print("\n--- Descriptive Analysis (incremental) ---")
+
+            # Totals
+            print("\nTotals:")
+            for name, value in aggregates.kpis().items():
+                print(f"{name}: {value}")
+
+            # Transaction type distribution
+            print("\nTransaction Type Distribution:")
+            transaction_type_counts = aggregates.transaction_type_counts()
+            print(transaction_type_counts)
+
+            # Trend analysis (amount over time)
+            print("\nTrend Analysis (Amount Over Time):")
+            trend_data = aggregates.trend()
+            print(trend_data)
+
+            # Visualization
+            FinanceDataAnalysis.visualize_data(transaction_type_counts, trend_data)
+
+        except Exception as e:
+            print(f"Error during incremental analysis: {str(e)}")
+
     @staticmethod
     def perform_descriptive_analysis(df):
         """
         Perform descriptive analysis on the DataFrame.
-        :param df: Pandas DataFrame containing transaction data.
+        :param df: Pandas DataFrame containing transaction data, or an iterable of DataFrame batches.
         """
         try:
             print("\n--- Descriptive Analysis ---")
+
+            # Single pass over the data (or over each streamed batch)
+            with METRICS.stage("analysis.aggregate") as stage:
+                aggregator = DescriptiveAggregator.from_batches(df, value_scale=FinanceFrameSchema.scale("amount"))
+                stage.add(aggregator.rows)
             
             # Basic statistics
             print("\nBasic Statistics:")
-            print(df.describe())
+            print(aggregator.describe())
             
             # Transaction type distribution
             print("\nTransaction Type Distribution:")
-            transaction_type_counts = df['transaction_type'].value_counts()
+            transaction_type_counts = aggregator.transaction_type_counts()
             print(transaction_type_counts)
             
             # Trend analysis (amount over time)
             print("\nTrend Analysis (Amount Over Time):")
-            df['date'] = pd.to_datetime(df['date'])  # Convert date column to datetime
-            trend_data = df.groupby('date')['amount'].sum()
+            trend_data = aggregator.trend()
             print(trend_data)
 
             # Visualization
@@ -71,38 +129,31 @@ class FinanceDataAnalysis:
             print(f"Error during descriptive analysis: {str(e)}")
 
     @staticmethod
-    def visualize_data(transaction_type_counts, trend_data):
+    def visualize_data(transaction_type_counts, trend_data, output_dir=".", workers=None, show=False):
         """
         Visualize transaction type distribution and trends over time.
+        Both charts are rendered headless (Agg, no blocking show) in this process, skipping unchanged ones.
         :param transaction_type_counts: Series containing transaction type counts.
         :param trend_data: Series containing amount trends over time.
+        :param output_dir: Directory for the images.
+        :param workers: Rendering processes (default: in-process, as two charts do not pay for a process pool).
+        :param show: Display the figures interactively instead of batch rendering.
         """
         
         try:
-            # Transaction type distribution (bar chart)
-            plt.figure(figsize=(8, 5))
-            transaction_type_counts.plot(kind='bar', color=['blue', 'orange'])
-            plt.title("Transaction Type Distribution")
-            plt.xlabel("Transaction Type")
-            plt.ylabel("Count")
-            plt.xticks(rotation=0)
-            plt.tight_layout()
-            
-            # Save and show plot
-            plt.savefig("transaction_type_distribution.png")
-            plt.show()
-
-            # Trend analysis (line chart)
-            plt.figure(figsize=(10, 6))
-            trend_data.plot(kind='line', color='green')
-            plt.title("Transaction Amount Trend Over Time")
-            plt.xlabel("Date")
-            plt.ylabel("Total Amount ($)")
-            
-            # Save and show plot
-            plt.savefig("trend_analysis.png")
-            plt.show()
-        
+            with METRICS.stage("analysis.visualize"):
+                specs = [
+                    # Transaction type distribution (bar chart)
+                    {"kind": "bar", "data": transaction_type_counts, "file": "transaction_type_distribution.png",
+                     "title": "Transaction Type Distribution", "xlabel": "Transaction Type", "ylabel": "Count",
+                     "color": ['blue', 'orange'], "figsize": (8, 5)},
+                    # Trend analysis (line chart)
+                    {"kind": "line", "data": trend_data, "file": "trend_analysis.png",
+                     "title": "Transaction Amount Trend Over Time", "xlabel": "Date", "ylabel": "Total Amount ($)",
+                     "color": "green", "figsize": (10, 6)},
+                ]
+                ChartRenderer(output_dir, workers).render(specs, show=show)
+
         except Exception as e:
             print(f"Error during visualization: {str(e)}")
 
@@ -114,9 +165,15 @@ if __name__ == "__main__":
     engine = FinanceDataAnalysis.connect_to_database()
     
     if engine is not None:
-        # Step 2: Load data from the table
-        data = FinanceDataAnalysis.load_data(engine, table_name)
-        
-        if data is not None:
-            # Step 3: Perform descriptive analysis
-            FinanceDataAnalysis.perform_descriptive_analysis(data)
+        # Step 2: Refresh from the change feed when change capture is installed
+        aggregates = RunningAggregates.open_if_installed(engine, table_name)
+
+        if aggregates is not None:
+            FinanceDataAnalysis.perform_incremental_analysis(aggregates)
+        else:
+            # Step 3: Load data from the table
+            data = FinanceDataAnalysis.load_data(engine, table_name, chunk_size=50000)
+
+            if data is not None:
+                # Step 4: Perform descriptive analysis
+                FinanceDataAnalysis.perform_descriptive_analysis(data)
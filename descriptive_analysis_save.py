@@ -1,22 +1,28 @@
+import hashlib
+import json
 import pandas as pd
-from sqlalchemy import create_engine
+from engine_registry import EngineRegistry
+from change_feed import RunningAggregates
+from streaming_reader import StreamingReader
+from aggregation_engine import DescriptiveAggregator
+from etlPipeline_with_PostgreSQL_01 import FinanceTransaction
+from finance_schema import FinanceFrameSchema
+from pipeline_metrics import METRICS
+from analysis_cache import ResultCache, DEFAULT_CACHE_DIR, table_fingerprint, frame_to_dict, frame_from_dict
 from datetime import datetime
 
+# Bump when the computed results change, so older cache entries are not served
+ANALYSIS_VERSION = 2
+
 class FinanceDataAnalysis:
     @staticmethod
     def connect_to_database():
         """
-        Create a connection to the PostgreSQL database using SQLAlchemy.
+        Get the shared, pooled connection to the PostgreSQL database (configured in engine_registry).
         :return: SQLAlchemy engine object.
         """
-        user = "postgres"
-        password = "admin"
-        host = "localhost"
-        port = "5432"
-        database = "etl_pipeline"
-        
         try:
-            engine = create_engine(f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}")
+            engine = EngineRegistry.get_engine()
             print("Connected to the database successfully.")
             return engine
         except Exception as e:
@@ -24,64 +30,194 @@ class FinanceDataAnalysis:
             return None
 
     @staticmethod
-    def load_data(engine, table_name):
+    def load_data(engine, table_name, columns=None, chunk_size=None, cache_dir=None, compact=True):
         """
         Load data from the specified SQL table into a Pandas DataFrame.
         :param engine: SQLAlchemy engine object.
         :param table_name: Name of the table to query.
-        :return: Pandas DataFrame containing the table data.
+        :param columns: Optional list of columns to fetch when streaming.
+        :param chunk_size: If set, stream the table through a server-side cursor in batches of this size.
+        :param cache_dir: If set, refresh and read a local Parquet cache of the table instead of querying it in full.
+        :param compact: Convert finance_transactions frames to the compact dtypes of FinanceFrameSchema
+                        (categorical transaction_type, int32 ids, float64 amounts, datetime64 dates).
+        :return: Pandas DataFrame containing the table data, or an iterator of DataFrame batches.
         """
+        compact = compact and table_name == FinanceTransaction.__tablename__
+
+        if cache_dir:
+            from parquet_cache import FinanceParquetCache
+            return FinanceParquetCache.load(engine, table_name, columns, cache_dir, compact, stage="analysis.load_data")
+
+        if chunk_size:
+            table = FinanceTransaction.__table__ if table_name == FinanceTransaction.__tablename__ else None
+            print(f"Streaming data from '{table_name}' table in batches of {chunk_size} rows.")
+            batches = StreamingReader.iter_batches(engine, table_name, columns, chunk_size, table)
+            if compact:
+                batches = FinanceFrameSchema.iter_compact(batches)
+            return METRICS.track_batches("analysis.load_data", batches)
+
         try:
-            query = f"SELECT * FROM {table_name};"
-            df = pd.read_sql_query(query, con=engine)
+            with METRICS.stage("analysis.load_data") as stage:
+                query = f"SELECT * FROM {table_name};"
+                df = pd.read_sql_query(query, con=engine)
+                if compact:
+                    df = FinanceFrameSchema.compact(df)
+                stage.add_frame(df)
             print(f"Data loaded successfully from '{table_name}' table.")
             return df
         except Exception as e:
             print(f"Error loading data: {str(e)}")
             return None
 
+    @staticmethod
+    def compute_results(df):
+        """
+        Compute the descriptive statistics in a structured, JSON-serializable form.
+        :param df: Pandas DataFrame containing transaction data, or an iterable of DataFrame batches.
+        :return: Dictionary of result sections.
+        """
+        # Single pass over the data (or over each streamed batch)
+        with METRICS.stage("analysis.aggregate") as stage:
+            aggregator = DescriptiveAggregator.from_batches(df, value_scale=FinanceFrameSchema.scale("amount"))
+            stage.add(aggregator.rows)
+
+        return {
+            "rows": aggregator.rows,
+            "basic_statistics": frame_to_dict(aggregator.describe()),
+            "transaction_type_distribution": frame_to_dict(aggregator.transaction_type_counts()),
+            "trend": frame_to_dict(aggregator.trend()),
+        }
+
+    @staticmethod
+    def compute_incremental_results(aggregates):
+        """
+        Compute the totals, transaction type distribution and trend from the running aggregates kept up to date
+        by the change feed, without reading the table (basic statistics need the full data, see analyze).
+        :param aggregates: RunningAggregates from RunningAggregates.open_if_installed().
+        :return: Dictionary of result sections; the fingerprint is a hash of the results.
+        """
+        with METRICS.stage("analysis.aggregate") as stage:
+            totals = aggregates.kpis()
+            transaction_type_counts = aggregates.transaction_type_counts()
+            results = {
+                "rows": int(transaction_type_counts.sum()),
+                "totals": totals,
+                "transaction_type_distribution": frame_to_dict(transaction_type_counts),
+                "trend": frame_to_dict(aggregates.trend()),
+            }
+            stage.add(len(aggregates.cells))
+        results["fingerprint"] = hashlib.sha256(json.dumps(results, sort_keys=True).encode()).hexdigest()
+        return results
+
+    @staticmethod
+    def analyze(engine, table_name, cache_dir=DEFAULT_CACHE_DIR, chunk_size=50000):
+        """
+        Return the structured analysis results, served from the result cache while the table fingerprint
+        (row count, max id and a checksum of the newest rows) is unchanged.
+        :param engine: SQLAlchemy engine object.
+        :param table_name: Name of the table to analyze.
+        :param cache_dir: Result cache directory (None to always recompute).
+        :param chunk_size: Batch size for streaming the table on a cache miss.
+        :return: Dictionary of result sections, or None on error.
+        """
+        try:
+            with METRICS.stage("analysis.fingerprint"):
+                fingerprint = table_fingerprint(engine, table_name)
+            cache = ResultCache(cache_dir) if cache_dir else None
+            key = ResultCache.make_key(table_name, fingerprint, ANALYSIS_VERSION)
+
+            results = cache.get(key) if cache else None
+            if results is not None:
+                print(f"Analysis results for '{table_name}' served from cache (table unchanged).")
+                return results
+
+            data = FinanceDataAnalysis.load_data(engine, table_name, chunk_size=chunk_size)
+            if data is None:
+                return None
+            results = FinanceDataAnalysis.compute_results(data)
+            results["fingerprint"] = fingerprint
+            if cache:
+                cache.put(key, results)
+            return results
+
+        except Exception as e:
+            print(f"Error during descriptive analysis: {str(e)}")
+            return None
+
+    @staticmethod
+    def render_text(results):
+        """
+        Render structured results as the plain-text report.
+        :param results: Dictionary returned by compute_results, compute_incremental_results or analyze.
+        :return: String containing descriptive analysis results.
+        """
+        sections = []
+
+        # Basic statistics (full scans) or totals (running aggregates)
+        if "basic_statistics" in results:
+            sections.append("\n--- Basic Statistics ---\n")
+            sections.append(str(frame_from_dict(results["basic_statistics"])))
+        if "totals" in results:
+            sections.append("\n--- Totals ---\n")
+            sections.append("\n".join(f"{name}: {value}" for name, value in results["totals"].items()))
+
+        # Transaction type distribution
+        sections.append("\n--- Transaction Type Distribution ---\n")
+        sections.append(str(frame_from_dict(results["transaction_type_distribution"])))
+
+        # Trend analysis (amount over time)
+        sections.append("\n--- Trend Analysis (Amount Over Time) ---\n")
+        sections.append(str(frame_from_dict(results["trend"])))
+
+        return "\n".join(sections)
+
+    @staticmethod
+    def render_html(results):
+        """
+        Render structured results as an HTML report.
+        :param results: Dictionary returned by compute_results, compute_incremental_results or analyze.
+        :return: HTML string.
+        """
+        if "basic_statistics" in results:
+            summary = ("Basic Statistics", frame_from_dict(results["basic_statistics"]))
+        else:
+            summary = ("Totals", pd.Series(results["totals"], name="value").to_frame())
+        sections = [
+            summary,
+            ("Transaction Type Distribution", frame_from_dict(results["transaction_type_distribution"]).to_frame()),
+            ("Trend Analysis (Amount Over Time)", frame_from_dict(results["trend"]).to_frame()),
+        ]
+        body = "\n".join(f"<h2>{title}</h2>\n{table.to_html(float_format=lambda value: f'{value:,.2f}')}"
+                         for title, table in sections)
+        return (f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Descriptive Analysis</title></head>\n"
+                f"<body>\n<h1>Descriptive Analysis</h1>\n<p>{results['rows']} rows analyzed.</p>\n{body}\n</body></html>\n")
+
     @staticmethod
     def perform_descriptive_analysis(df):
         """
         Perform descriptive analysis on the DataFrame and return results as a string.
-        :param df: Pandas DataFrame containing transaction data.
+        :param df: Pandas DataFrame containing transaction data, or an iterable of DataFrame batches.
         :return: String containing descriptive analysis results.
         """
         try:
-            results = []
-            
-            # Basic statistics
-            results.append("\n--- Basic Statistics ---\n")
-            results.append(str(df.describe()))
-            
-            # Transaction type distribution
-            results.append("\n--- Transaction Type Distribution ---\n")
-            transaction_type_counts = df['transaction_type'].value_counts()
-            results.append(str(transaction_type_counts))
-            
-            # Trend analysis (amount over time)
-            df['date'] = pd.to_datetime(df['date'])  # Convert date column to datetime
-            trend_data = df.groupby('date')['amount'].sum()
-            
-            results.append("\n--- Trend Analysis (Amount Over Time) ---\n")
-            results.append(str(trend_data))
-            
-            return "\n".join(results)
+            return FinanceDataAnalysis.render_text(FinanceDataAnalysis.compute_results(df))
         
         except Exception as e:
             print(f"Error during descriptive analysis: {str(e)}")
             return None
 
     @staticmethod
-    def save_results_to_file(results):
+    def save_results_to_file(results, filename=None):
         """
-        Save descriptive analysis results to a file with a timestamped filename.
-        :param results: String containing descriptive analysis results.
+        Save descriptive analysis results to a file.
+        :param results: String containing descriptive analysis results (text or HTML).
+        :param filename: Output file (default: a timestamped descriptive_analysis_*.txt).
         """
         try:
             # Generate timestamped filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"descriptive_analysis_{timestamp}.txt"
+            if filename is None:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                filename = f"descriptive_analysis_{timestamp}.txt"
             
             # Save results to file
             with open(filename, "w") as file:
@@ -100,13 +236,17 @@ if __name__ == "__main__":
     engine = FinanceDataAnalysis.connect_to_database()
     
     if engine is not None:
-        # Step 2: Load data from the table
-        data = FinanceDataAnalysis.load_data(engine, table_name)
+        # Step 2: Refresh from the change feed when change capture is installed; otherwise analyze the table
+        # (served from the result cache while the table is unchanged)
+        aggregates = RunningAggregates.open_if_installed(engine, table_name)
+        if aggregates is not None:
+            analysis_results = FinanceDataAnalysis.compute_incremental_results(aggregates)
+        else:
+            analysis_results = FinanceDataAnalysis.analyze(engine, table_name, chunk_size=50000)
         
-        if data is not None:
-            # Step 3: Perform descriptive analysis
-            analysis_results = FinanceDataAnalysis.perform_descriptive_analysis(data)
-            
-            if analysis_results is not None:
-                # Step 4: Save results to a timestamped file
-                FinanceDataAnalysis.save_results_to_file(analysis_results)
+        if analysis_results is not None:
+            # Step 3: Render the text and HTML reports from the structured results; the file name follows
+            # the table fingerprint, so an unchanged table does not produce a new report file
+            report_name = f"descriptive_analysis_{analysis_results['fingerprint'][:12]}"
+            FinanceDataAnalysis.save_results_to_file(FinanceDataAnalysis.render_text(analysis_results), f"{report_name}.txt")
+            FinanceDataAnalysis.save_results_to_file(FinanceDataAnalysis.render_html(analysis_results), f"{report_name}.html")
@@ -0,0 +1,119 @@
+# Description: This module is the single place the ETL scripts get their database engines from.
+# Connections are configured by name (environment variables or an optional JSON file) instead of
+# credentials hard-coded in every script. Each engine is created once per process with a tuned
+# connection pool and pre-ping, then reused by every stage that asks for the same name.
+#
+# Resolution order for a connection name (e.g. 'default', 'target'):
+#   1. ETL_DB_URL (for 'default') or ETL_DB_<NAME>_URL
+#   2. the entry for the name in the JSON file at $ETL_DB_CONFIG (default: etl_databases.json), e.g.
+#          {"default": {"url": "postgresql+psycopg2://...", "pool_size": 10}}
+#   3. the default URL given by the calling script
+#   4. for 'default' only: ETL_DB_USER and ETL_DB_PASSWORD (required), ETL_DB_HOST, ETL_DB_PORT, ETL_DB_NAME
+# There are no built-in credentials: a name that none of these configure raises a ValueError.
+import atexit
+import json
+import os
+import threading
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL
+
+DEFAULT_CONFIG_FILE = "etl_databases.json"
+
+# Small, warm pools suit both long pipelines and short scheduled jobs: LIFO reuse keeps few
+# connections busy, pre-ping drops stale ones, and recycling avoids server-side idle timeouts
+POOL_DEFAULTS = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+    "pool_recycle": 1800,
+    "pool_pre_ping": True,
+    "pool_use_lifo": True,
+}
+
+# Non-secret connection settings for 'default'; the credentials must always be provided
+DEFAULT_SETTINGS = {
+    "ETL_DB_HOST": "localhost",
+    "ETL_DB_PORT": "5432",
+    "ETL_DB_NAME": "etl_pipeline",
+}
+REQUIRED_SETTINGS = ("ETL_DB_USER", "ETL_DB_PASSWORD")
+
+class EngineRegistry:
+    _engines = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def load_config(file_path=None):
+        """
+        Read the optional JSON connection file.
+        :param file_path: Path to the file (default: $ETL_DB_CONFIG or etl_databases.json).
+        :return: Dictionary of connection name to settings (empty if the file does not exist).
+        """
+        file_path = file_path or os.environ.get("ETL_DB_CONFIG", DEFAULT_CONFIG_FILE)
+        if not os.path.exists(file_path):
+            return {}
+        with open(file_path) as file:
+            return json.load(file)
+
+    @staticmethod
+    def resolve(name="default", default_url=None):
+        """
+        Work out the URL and engine options for a connection name.
+        :param name: Connection name.
+        :param default_url: URL to use when neither the environment nor the config file define one.
+        :return: Tuple of (url, options dictionary).
+        """
+        settings = dict(EngineRegistry.load_config().get(name, {}))
+        env_key = "ETL_DB_URL" if name == "default" else f"ETL_DB_{name.upper()}_URL"
+        url = os.environ.get(env_key) or settings.pop("url", None) or default_url
+        settings.pop("url", None)
+
+        if url is None:
+            if name != "default":
+                raise ValueError(f"No database configured for '{name}' (set {env_key} or add it to the config file)")
+            missing = [key for key in REQUIRED_SETTINGS if not os.environ.get(key)]
+            if missing:
+                raise ValueError(f"No database configured for 'default' (set {env_key}, add it to the config file, "
+                                 f"or set {' and '.join(missing)})")
+            values = {key: os.environ.get(key, value) for key, value in DEFAULT_SETTINGS.items()}
+            url = URL.create("postgresql+psycopg2", username=os.environ["ETL_DB_USER"],
+                             password=os.environ["ETL_DB_PASSWORD"], host=values["ETL_DB_HOST"],
+                             port=int(values["ETL_DB_PORT"]), database=values["ETL_DB_NAME"])
+            url = url.render_as_string(hide_password=False)
+
+        if url.startswith("sqlite"):
+            # SQLite picks its own pool class (not all accept sizing options); only pre-ping applies to all
+            return url, dict({"pool_pre_ping": True}, **settings)
+        return url, dict(POOL_DEFAULTS, **settings)
+
+    @staticmethod
+    def get_engine(name="default", default_url=None, **options):
+        """
+        Return the shared engine for a connection name, creating it on first use.
+        Engines are kept per process, so a forked worker never reuses its parent's pooled connections.
+        :param name: Connection name.
+        :param default_url: URL to use when the connection is not configured.
+        :param options: Extra create_engine options (override the configured ones).
+        :return: SQLAlchemy engine object.
+        """
+        key = (name, os.getpid())
+        with EngineRegistry._lock:
+            engine = EngineRegistry._engines.get(key)
+            if engine is None:
+                url, settings = EngineRegistry.resolve(name, default_url)
+                settings.update(options)
+                engine = create_engine(url, **settings)
+                EngineRegistry._engines[key] = engine
+            return engine
+
+    @staticmethod
+    def dispose_all():
+        """Close the pooled connections of every engine created by this process."""
+        with EngineRegistry._lock:
+            for (name, pid), engine in list(EngineRegistry._engines.items()):
+                if pid == os.getpid():
+                    engine.dispose()
+                    del EngineRegistry._engines[(name, pid)]
+
+
+atexit.register(EngineRegistry.dispose_all)
@@ -1,33 +1,66 @@
 import csv
+import os
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import inspect
+from engine_registry import EngineRegistry
+from bulk_loader import BulkLoader
+from incremental_loader import IncrementalLoader
+from pipeline_metrics import METRICS
+from transform_engine import TransformEngine
+
+# Replace missing ages with -1
+PREPROCESS = TransformEngine.compile([{'op': 'fillna', 'column': 'age', 'value': -1}])
 
 class ETLPipeline:
     @staticmethod
-    def preprocess_csv(file_path):
-        """Preprocess CSV to handle missing values."""
-        df = pd.read_csv(file_path)
-        df['age'] = df['age'].fillna(-1)  # Replace missing values with -1
-        df.to_csv(file_path, index=False)
+    def preprocess_csv(file_path, chunk_size=100000):
+        """Stream the CSV in chunks with missing values handled; the source file is left untouched."""
+        for chunk in pd.read_csv(file_path, chunksize=chunk_size):
+            yield PREPROCESS.apply(chunk)
         print("CSV file preprocessed successfully.")
 
     @staticmethod
     def get_engine():
-        """Create an SQLAlchemy engine."""
-        user = "postgres"
-        password = "admin"  # Replace with your PostgreSQL password
-        host = "localhost"
-        port = "5432"
-        database = "etl_pipeline"
-        return create_engine(f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}")
+        """Return the shared, pooled SQLAlchemy engine (configured in engine_registry)."""
+        return EngineRegistry.get_engine()
 
     @staticmethod
-    def load_data_to_table(engine, file_path, table_name):
-        """Load data from a CSV file into PostgreSQL."""
+    def load_data_to_table(engine, source=None, table_name=None, method="to_sql", chunk_size=100000,
+                           key_columns=("email",), file_path=None):
+        """
+        Load data into PostgreSQL ('to_sql', chunked 'copy', or 'incremental' upsert on key_columns).
+        `source` is a CSV path or an iterable of DataFrame chunks (e.g. from preprocess_csv);
+        `file_path` is its former name, still accepted from keyword callers.
+        """
+        source = source if source is not None else file_path
         try:
-            df = pd.read_csv(file_path)
-            df.to_sql(table_name, con=engine, if_exists='replace', index=False)
-            print(f"Data loaded successfully into '{table_name}' table.")
+            with METRICS.stage("etl.load") as stage:
+                if isinstance(source, str):
+                    stage.add(nbytes=os.path.getsize(source))
+                chunks = pd.read_csv(source, chunksize=chunk_size) if isinstance(source, str) else source
+
+                if method == "incremental":
+                    rows = IncrementalLoader.load_frames(engine, chunks, table_name, list(key_columns))
+                    stage.add(rows)
+                    print(f"{rows} rows upserted into '{table_name}' table.")
+                    return
+
+                if method == "copy":
+                    rows = BulkLoader.load_frames(engine, chunks, table_name)
+                    stage.add(rows)
+                    print(f"{rows} rows bulk loaded into '{table_name}' table.")
+                    return
+
+                with BulkLoader.views_detached(engine, table_name), engine.begin() as connection:
+                    for position, chunk in enumerate(chunks):
+                        chunk.to_sql(table_name, con=connection, if_exists='replace' if position == 0 else 'append', index=False)
+                        stage.add(len(chunk))
+                # Replacing the table dropped any change-capture triggers on it (change_feed and the finance
+                # modules it depends on are imported only for captured tables)
+                if inspect(engine).has_table(f"{table_name}_changes"):
+                    from change_feed import FinanceChangeFeed
+                    FinanceChangeFeed.restore(engine, table_name)
+                print(f"Data loaded successfully into '{table_name}' table.")
         except Exception as e:
             print(f"Error loading data: {str(e)}")
 
@@ -35,7 +68,9 @@ class ETLPipeline:
     def extract_data(engine, query):
         """Extract data from PostgreSQL using Pandas."""
         try:
-            df = pd.read_sql_query(query, con=engine)
+            with METRICS.stage("etl.extract") as stage:
+                df = pd.read_sql_query(query, con=engine)
+                stage.add_frame(df)
             print("Data extracted successfully.")
             return df
         except Exception as e:
@@ -46,8 +81,8 @@ class ETLPipeline:
 if __name__ == "__main__":
     csv_file = "sample_data.csv"
     
-    # Step 1: Preprocess CSV file
-    ETLPipeline.preprocess_csv(csv_file)
+    # Step 1: Preprocess CSV rows as they are streamed (the source file is not rewritten)
+    preprocessed_chunks = ETLPipeline.preprocess_csv(csv_file)
 
     # Step 2: Create database connection and load data
     engine = ETLPipeline.get_engine()
@@ -55,7 +90,7 @@ if __name__ == "__main__":
     table_name = "etl_data"
     
     # Load preprocessed data into PostgreSQL table
-    ETLPipeline.load_data_to_table(engine, csv_file, table_name)
+    ETLPipeline.load_data_to_table(engine, preprocessed_chunks, table_name, method="copy")
 
     # Step 3: Extract data from PostgreSQL for verification (optional)
     query = f"SELECT * FROM {table_name};"
@@ -1,8 +1,15 @@
-import csv
-import random
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine, Column, Integer, Date, Numeric, String
+from sqlalchemy import Column, Integer, Date, Numeric, String
 from sqlalchemy.ext.declarative import declarative_base
+from bulk_loader import BulkLoader
+from engine_registry import EngineRegistry
+from incremental_loader import IncrementalLoader
+from pipeline_metrics import METRICS
 
 Base = declarative_base()
 
@@ -16,43 +23,146 @@ class FinanceTransaction(Base):
     transaction_type = Column(String(10))
 
 class FinanceDataGenerator:
+    COLUMNS = ["transaction_id", "date", "account_id", "amount", "transaction_type"]
+    TRANSACTION_TYPES = np.array(["credit", "debit"])
+
     @staticmethod
-    def generate_csv(file_path, num_rows=100):
+    def generate_chunk(start_id, num_rows, seed, year=2023, hot_accounts=0, hot_share=0.0, month_weights=None):
         """
-        Generate a sample finance dataset and save it as a CSV file.
-        :param file_path: Path to save the CSV file.
+        Generate one chunk of synthetic transactions with vectorized NumPy draws.
+        :param start_id: First transaction_id of the chunk.
         :param num_rows: Number of rows to generate.
+        :param seed: Seed (int or numpy SeedSequence) for this chunk.
+        :param year: Year of the generated dates (days 1-28 of each month, as before).
+        :param hot_accounts: Number of "hot" accounts that receive a disproportionate share of transactions.
+        :param hot_share: Fraction of transactions (0-1) assigned to the hot accounts.
+        :param month_weights: Optional 12 relative weights for seasonal dates (default: uniform months).
+        :return: Pandas DataFrame.
         """
-        headers = ["transaction_id", "date", "account_id", "amount", "transaction_type"]
-        transaction_types = ["credit", "debit"]
+        rng = np.random.default_rng(seed)
+
+        if month_weights is None:
+            months = rng.integers(0, 12, num_rows)
+        else:
+            weights = np.asarray(month_weights, dtype="float64")
+            months = rng.choice(12, size=num_rows, p=weights / weights.sum())
+        days = rng.integers(0, 28, num_rows)
+        dates = (np.datetime64(f"{year}-01", "M") + months).astype("datetime64[D]") + days
+
+        account_ids = rng.integers(1000, 10000, num_rows)
+        if hot_accounts and hot_share > 0:
+            # Hot accounts are derived from a fixed seed so every chunk shares the same set
+            hot_ids = np.random.default_rng(0).choice(np.arange(1000, 10000), size=hot_accounts, replace=False)
+            is_hot = rng.random(num_rows) < hot_share
+            account_ids[is_hot] = hot_ids[rng.integers(0, hot_accounts, int(is_hot.sum()))]
+
+        return pd.DataFrame({
+            "transaction_id": np.arange(start_id, start_id + num_rows),
+            "date": dates,
+            "account_id": account_ids,
+            "amount": np.round(rng.uniform(10.0, 1000.0, num_rows), 2),
+            "transaction_type": FinanceDataGenerator.TRANSACTION_TYPES[rng.integers(0, 2, num_rows)],
+        }, columns=FinanceDataGenerator.COLUMNS)
 
-        with open(file_path, mode="w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(headers)
+    @staticmethod
+    def generate_shard(shard, options):
+        """
+        Worker entry point: build shard `shard` and, for CSV output, pre-format it as text.
+        :param shard: Tuple of (start_id, num_rows, SeedSequence).
+        :param options: Dictionary with 'output' and generate_chunk keyword arguments.
+        :return: CSV text or a DataFrame.
+        """
+        start_id, num_rows, seed = shard
+        options = dict(options)
+        output = options.pop("output")
+        df = FinanceDataGenerator.generate_chunk(start_id, num_rows, seed, **options)
+        if output == "csv":
+            return df.to_csv(index=False, header=False)
+        return df
 
-            for i in range(1, num_rows + 1):
-                transaction_id = i
-                date = f"2023-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
-                account_id = random.randint(1000, 9999)
-                amount = round(random.uniform(10.0, 1000.0), 2)
-                transaction_type = random.choice(transaction_types)
-                writer.writerow([transaction_id, date, account_id, amount, transaction_type])
+    @staticmethod
+    def generate_dataset(destination, num_rows, output="csv", seed=None, chunk_size=1000000, workers=1, **options):
+        """
+        Generate a large, reproducible dataset in chunks, optionally across processes.
+        Each chunk gets its own child seed of `seed`, so the output is identical for any number of workers.
+        :param destination: File path for 'csv'/'parquet', or an SQLAlchemy engine for 'db'.
+        :param num_rows: Total number of rows.
+        :param output: 'csv', 'parquet' or 'db' (bulk load into the finance_transactions table).
+        :param seed: Root seed (None for a random dataset).
+        :param chunk_size: Rows per chunk (the unit of work per process).
+        :param workers: Number of worker processes (1 generates in-process); at most 2 * workers chunks are
+                        generated ahead of the writer.
+        :param options: Skew options passed to generate_chunk (year, hot_accounts, hot_share, month_weights).
+        :return: Number of rows generated.
+        """
+        starts = list(range(1, num_rows + 1, chunk_size))
+        seeds = np.random.SeedSequence(seed).spawn(len(starts))
+        shards = [(start, min(chunk_size, num_rows - start + 1), child) for start, child in zip(starts, seeds)]
+        options = dict(options, output=output)
 
+        def chunks():
+            if workers > 1:
+                # At most two shards per worker are in flight, so memory stays bounded when the writer is slower
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    pending = iter(shards)
+                    in_flight = deque(executor.submit(FinanceDataGenerator.generate_shard, shard, options)
+                                      for shard in islice(pending, 2 * workers))
+                    while in_flight:
+                        chunk = in_flight.popleft().result()
+                        shard = next(pending, None)
+                        if shard is not None:
+                            in_flight.append(executor.submit(FinanceDataGenerator.generate_shard, shard, options))
+                        yield chunk
+            else:
+                for shard in shards:
+                    yield FinanceDataGenerator.generate_shard(shard, options)
+
+        if output == "csv":
+            with open(destination, mode="w", newline="") as file:
+                file.write(",".join(FinanceDataGenerator.COLUMNS) + "\n")
+                for text in chunks():
+                    file.write(text)
+        elif output == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            writer = None
+            try:
+                for df in chunks():
+                    table = pa.Table.from_pandas(df, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(destination, table.schema)
+                    writer.write_table(table)
+            finally:
+                if writer is not None:
+                    writer.close()
+        elif output == "db":
+            BulkLoader.load_frames(destination, chunks(), FinanceTransaction.__tablename__,
+                                   table=FinanceTransaction.__table__)
+        else:
+            raise ValueError(f"Unsupported output: '{output}'")
+
+        print(f"Generated {num_rows} rows of finance data ({output})")
+        return num_rows
+
+    @staticmethod
+    def generate_csv(file_path, num_rows=100, seed=None):
+        """
+        Generate a sample finance dataset and save it as a CSV file.
+        :param file_path: Path to save the CSV file.
+        :param num_rows: Number of rows to generate.
+        :param seed: Optional seed for a reproducible file.
+        """
+        FinanceDataGenerator.generate_dataset(file_path, num_rows, output="csv", seed=seed)
         print(f"Sample finance data CSV file created at {file_path}")
 
 class PostgreSQLLoader:
     @staticmethod
     def get_engine():
         """
-        Create an SQLAlchemy engine for PostgreSQL.
+        Return the shared, pooled SQLAlchemy engine for PostgreSQL (configured in engine_registry).
         :return: SQLAlchemy engine object.
         """
-        user = "postgres"
-        password = "admin"  # Replace with your PostgreSQL password
-        host = "localhost"
-        port = "5432"
-        database = "etl_pipeline"
-        return create_engine(f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}")
+        return EngineRegistry.get_engine()
 
     @staticmethod
     def create_table(engine):
@@ -65,16 +175,42 @@ class PostgreSQLLoader:
 
 class ETLPipeline:
     @staticmethod
-    def load_data_to_table(engine, file_path):
+    def load_data_to_table(engine, file_path, method="to_sql", chunk_size=100000):
         """
         Load data from a CSV file into the PostgreSQL table.
         :param engine: SQLAlchemy engine object.
         :param file_path: Path to the CSV file.
+        :param method: 'to_sql' to load through Pandas, 'copy' to stream chunks with COPY FROM STDIN,
+                       'incremental' to upsert only rows above the stored transaction_id watermark.
+        :param chunk_size: Number of rows per chunk when method is 'copy' or 'incremental'.
         """
         try:
-            df = pd.read_csv(file_path)
-            df.to_sql(FinanceTransaction.__tablename__, con=engine, if_exists='replace', index=False)
-            print(f"Data loaded successfully into '{FinanceTransaction.__tablename__}' table.")
+            with METRICS.stage("etl.load") as stage:
+                stage.add(nbytes=os.path.getsize(file_path))
+                if method == "incremental":
+                    rows = IncrementalLoader.load_csv(engine, file_path, FinanceTransaction.__tablename__,
+                                                      key_columns=["transaction_id"], watermark_column="transaction_id",
+                                                      table=FinanceTransaction.__table__, chunk_size=chunk_size)
+                    stage.add(rows)
+                    print(f"{rows} new rows upserted into '{FinanceTransaction.__tablename__}' table.")
+                    return
+
+                if method == "copy":
+                    rows = BulkLoader.load_csv(engine, file_path, FinanceTransaction.__tablename__,
+                                               table=FinanceTransaction.__table__, chunk_size=chunk_size)
+                    stage.add(rows)
+                    print(f"{rows} rows bulk loaded into '{FinanceTransaction.__tablename__}' table.")
+                    return
+
+                df = pd.read_csv(file_path)
+                # The dashboard rollup depends on the table, so it is recreated around the replace
+                with BulkLoader.views_detached(engine, FinanceTransaction.__tablename__):
+                    df.to_sql(FinanceTransaction.__tablename__, con=engine, if_exists='replace', index=False)
+                # Replacing the table dropped any change-capture triggers on it
+                from change_feed import FinanceChangeFeed
+                FinanceChangeFeed.restore(engine, FinanceTransaction.__tablename__)
+                stage.add(len(df))
+                print(f"Data loaded successfully into '{FinanceTransaction.__tablename__}' table.")
         except Exception as e:
             print(f"Error loading data: {str(e)}")
 
@@ -89,4 +225,4 @@ if __name__ == "__main__":
     PostgreSQLLoader.create_table(engine)
 
     # Step 3: Load Data into PostgreSQL Table
-    ETLPipeline.load_data_to_table(engine, csv_file)
+    ETLPipeline.load_data_to_table(engine, csv_file, method="copy")
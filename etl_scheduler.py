@@ -0,0 +1,321 @@
+# Description: A small in-process scheduler for ETL pipelines.
+# Pipelines are DAGs of tasks; independent tasks run in parallel on a worker pool, cron triggers are
+# computed from the schedule (no drift), overlapping runs are skipped or queued, missed intervals are
+# backfilled, and run state is persisted to a local JSON file so restarts pick up where they left off.
+# Intervals stay 'pending' in the state until their run succeeds: a failed run is queued again as soon as
+# it finishes, and runs that were interrupted are queued again when the scheduler restarts.
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+
+
+class CronTrigger:
+    """Five-field cron expression: minute hour day-of-month month day-of-week (0 or 7 = Sunday)."""
+
+    RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: '{expression}'")
+        self.expression = expression
+        parsed = [self.parse_field(field, low, high) for field, (low, high) in zip(fields, self.RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def parse_field(field, low, high):
+        """
+        Expand one cron field ('*', '5', '1-5', '*/15', '1,15,30') into a set of values.
+        :param field: Field text.
+        :param low: Smallest allowed value.
+        :param high: Largest allowed value.
+        :return: Set of integers.
+        """
+        values = set()
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step_text = part.split("/")
+                step = int(step_text)
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start, end = (int(value) for value in part.split("-"))
+            else:
+                start = end = int(part)
+            if start < low or end > high or step < 1:
+                raise ValueError(f"Cron field '{field}' is out of range {low}-{high}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def day_matches(self, moment):
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day:
+            return weekday_ok
+        if self.any_weekday:
+            return day_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment):
+        """
+        Return the first scheduled time strictly after `moment`.
+        :param moment: datetime.
+        :return: datetime (seconds and microseconds are zero).
+        """
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                year, month = (candidate.year + 1, 1) if candidate.month == 12 else (candidate.year, candidate.month + 1)
+                candidate = candidate.replace(year=year, month=month, day=1, hour=0, minute=0)
+            elif not self.day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+            elif candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression '{self.expression}' never fires")
+
+
+class Task:
+    def __init__(self, name, func, depends_on=(), retries=0, retry_delay=60):
+        """
+        :param name: Unique task name within the DAG.
+        :param func: Callable receiving a RunContext; its return value is stored in context.results[name].
+        :param depends_on: Names of upstream tasks.
+        :param retries: Extra attempts after a failure.
+        :param retry_delay: Seconds to wait between attempts.
+        """
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+
+class RunContext:
+    def __init__(self, scheduled_time):
+        self.scheduled_time = scheduled_time
+        self.results = {}
+
+
+class Dag:
+    def __init__(self, name, tasks):
+        self.name = name
+        self.tasks = {task.name: task for task in tasks}
+        for task in tasks:
+            missing = [dep for dep in task.depends_on if dep not in self.tasks]
+            if missing:
+                raise ValueError(f"Task '{task.name}' depends on unknown tasks: {missing}")
+        self.check_acyclic()
+
+    def check_acyclic(self):
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle detected in DAG '{self.name}' at task '{name}'")
+            visiting.add(name)
+            for dep in self.tasks[name].depends_on:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.tasks:
+            visit(name)
+
+    def run(self, scheduled_time, max_workers=4):
+        """
+        Execute the DAG once: each task starts as soon as all its upstream tasks have succeeded.
+        :param scheduled_time: Interval this run belongs to.
+        :param max_workers: Maximum tasks running in parallel.
+        :return: Dictionary of task name to status ('success', 'failed', 'upstream_failed').
+        """
+        context = RunContext(scheduled_time)
+        status = {}
+        pending = dict(self.tasks)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                for name, task in list(pending.items()):
+                    if any(status.get(dep) in ("failed", "upstream_failed") for dep in task.depends_on):
+                        status[name] = "upstream_failed"
+                        del pending[name]
+                    elif all(status.get(dep) == "success" for dep in task.depends_on):
+                        running[executor.submit(self.run_task, task, context)] = name
+                        del pending[name]
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    status[name] = "success" if future.result() else "failed"
+        return status
+
+    @staticmethod
+    def run_task(task, context):
+        for attempt in range(task.retries + 1):
+            try:
+                context.results[task.name] = task.func(context)
+                return True
+            except Exception:
+                print(f"Task '{task.name}' failed (attempt {attempt + 1}/{task.retries + 1}):")
+                traceback.print_exc()
+                if attempt < task.retries:
+                    time.sleep(task.retry_delay)
+        return False
+
+
+class Scheduler:
+    def __init__(self, dag, trigger, state_file=None, overlap="skip", catchup=True, max_catchup=100,
+                 start_date=None, max_workers=4, history=50):
+        """
+        :param dag: Dag to run.
+        :param trigger: CronTrigger (or any object with next_after(datetime)).
+        :param state_file: JSON file for run state (default: '<dag name>_schedule_state.json').
+        :param overlap: 'skip' to drop intervals that come due while a run is active, 'queue' to run them afterwards.
+        :param catchup: Backfill intervals missed while the scheduler was down.
+        :param max_catchup: Maximum number of missed intervals to backfill.
+        :param start_date: First interval to consider when there is no saved state (default: now).
+        :param max_workers: Parallel tasks within one run.
+        :param history: Number of past runs kept in the state file.
+        """
+        if overlap not in ("skip", "queue"):
+            raise ValueError("overlap must be 'skip' or 'queue'")
+        self.dag = dag
+        self.trigger = trigger
+        self.state_file = state_file or f"{dag.name}_schedule_state.json"
+        self.overlap = overlap
+        self.catchup = catchup
+        self.max_catchup = max_catchup
+        self.max_workers = max_workers
+        self.history = history
+        self.lock = threading.Lock()
+        self.run_executor = ThreadPoolExecutor(max_workers=1)
+        self.active = None
+        self.state = self.load_state()
+        self.state.setdefault("pending", [])
+        # Intervals whose run failed, or never finished before a restart, waiting to run again
+        self.requeue = [datetime.fromisoformat(value) for value in sorted(self.state["pending"])]
+        if self.state.get("last_scheduled") is None:
+            self.state["last_scheduled"] = (start_date or datetime.now()).isoformat()
+            self.save_state()
+
+    def load_state(self):
+        if not os.path.exists(self.state_file):
+            return {"last_scheduled": None, "pending": [], "runs": []}
+        with open(self.state_file) as file:
+            return json.load(file)
+
+    def save_state(self):
+        with self.lock:
+            temp_path = f"{self.state_file}.tmp"
+            with open(temp_path, "w") as file:
+                json.dump(self.state, file, indent=2)
+            os.replace(temp_path, self.state_file)
+
+    def record_run(self, scheduled_time, status, tasks=None, started=None, finished=None):
+        with self.lock:
+            self.state["runs"].append({
+                "scheduled": scheduled_time.isoformat(),
+                "status": status,
+                "tasks": tasks or {},
+                "started": started.isoformat() if started else None,
+                "finished": finished.isoformat() if finished else None,
+            })
+            self.state["runs"] = self.state["runs"][-self.history:]
+        self.save_state()
+
+    def due_intervals(self, now):
+        """
+        List the scheduled times that have come due since the last recorded one.
+        :param now: Current datetime.
+        :return: List of datetimes (all of them with catch-up, otherwise only the latest).
+        """
+        last = datetime.fromisoformat(self.state["last_scheduled"])
+        due = []
+        moment = self.trigger.next_after(last)
+        while moment <= now:
+            due.append(moment)
+            moment = self.trigger.next_after(moment)
+        if not self.catchup:
+            return due[-1:]
+        return due[-self.max_catchup:]
+
+    def execute(self, scheduled_time):
+        started = datetime.now()
+        print(f"Running '{self.dag.name}' for {scheduled_time.isoformat()}")
+        tasks = self.dag.run(scheduled_time, self.max_workers)
+        status = "success" if all(value == "success" for value in tasks.values()) else "failed"
+        finished = datetime.now()
+        with self.lock:
+            if status == "success":
+                self.state["pending"] = [value for value in self.state["pending"] if value != scheduled_time.isoformat()]
+            else:
+                # Still pending: run it again at the next check instead of waiting for a restart
+                self.requeue.append(scheduled_time)
+        self.record_run(scheduled_time, status, tasks, started, finished)
+        print(f"Run for {scheduled_time.isoformat()} finished with status '{status}' in "
+              f"{(finished - started).total_seconds():.1f}s")
+
+    def run_pending(self, now=None):
+        """
+        Start (or queue/skip) every interval that is due, after any interval re-queued from an earlier
+        failed or interrupted run.
+        :param now: Current datetime (default: datetime.now()).
+        :return: List of intervals submitted for execution.
+        """
+        # Re-queued and backfilled intervals found together form one backlog that runs in order; 'skip' only
+        # drops intervals that come due while a run from an earlier check is still active
+        busy = self.active is not None and not self.active.done()
+        with self.lock:
+            requeue, self.requeue = sorted(set(self.requeue)), []
+
+        submitted = []
+        for scheduled_time in requeue:
+            print(f"Re-running {scheduled_time.isoformat()}: its last run failed or did not finish")
+            self.active = self.run_executor.submit(self.execute, scheduled_time)
+            submitted.append(scheduled_time)
+
+        for scheduled_time in self.due_intervals(now or datetime.now()):
+            if busy and self.overlap == "skip":
+                print(f"Skipping {scheduled_time.isoformat()}: previous run still active")
+                with self.lock:
+                    self.state["last_scheduled"] = scheduled_time.isoformat()
+                self.record_run(scheduled_time, "skipped")
+            else:
+                # The interval stays pending until its run succeeds; saved before the run can start
+                with self.lock:
+                    self.state["pending"].append(scheduled_time.isoformat())
+                    self.state["last_scheduled"] = scheduled_time.isoformat()
+                self.save_state()
+                self.active = self.run_executor.submit(self.execute, scheduled_time)
+                submitted.append(scheduled_time)
+        return submitted
+
+    def run_forever(self, poll_interval=60):
+        """
+        Run until interrupted, sleeping until the next scheduled time (at most poll_interval seconds at once).
+        :param poll_interval: Maximum seconds between checks.
+        """
+        try:
+            while True:
+                self.run_pending()
+                next_time = self.trigger.next_after(datetime.fromisoformat(self.state["last_scheduled"]))
+                delay = (next_time - datetime.now()).total_seconds()
+                time.sleep(min(max(delay, 0.0), poll_interval))
+        finally:
+            self.run_executor.shutdown(wait=True)
@@ -1,17 +1,61 @@
 # Description: This script extracts data from a CSV file, transforms it, and loads it into a MongoDB database.
+# The CSV is streamed in chunks, transformed with vectorized NumPy expressions, and inserted in bounded,
+# unordered batches by a few concurrent workers, so memory stays flat for large files.
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
 import pandas as pd
 from pymongo import MongoClient
+from transform_engine import TransformEngine
 
-# Extract
-data = pd.read_csv('source_file.csv')
+CHUNK_SIZE = 50000
+BATCH_SIZE = 5000
+WORKERS = 4
 
-# Transform
-data['price'] = data['price'].apply(lambda x: round(x * 1.1))  # Example transformation
+# Example transformation: price.apply(lambda x: round(x * 1.1)), compiled into one fused pass
+TRANSFORM = TransformEngine.compile([
+    {'op': 'multiply', 'column': 'price', 'by': 1.1},
+    {'op': 'round', 'column': 'price'},
+])
 
-# Load
-client = MongoClient('mongodb://localhost:27017/')
-db = client['etl_database']
-collection = db['transformed_data']
+def transform_chunk(chunk):
+    # np.round rounds half to even like round(); keep integer prices unless the chunk has missing values
+    chunk = TRANSFORM.apply(chunk)
+    price = chunk['price'].to_numpy()
+    if not np.isnan(price).any():
+        chunk['price'] = price.astype('int64')
+    return chunk
 
-collection.insert_many(data.to_dict('records'))
-print("Data loaded into MongoDB")
+def iter_documents(chunk, batch_size=BATCH_SIZE):
+    # Build documents one bounded batch at a time instead of one list for the whole file
+    for start in range(0, len(chunk), batch_size):
+        yield chunk.iloc[start:start + batch_size].to_dict('records')
+
+def insert_batch(collection, documents):
+    collection.insert_many(documents, ordered=False)
+    return len(documents)
+
+def load_csv_to_mongo(file_path, collection, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE, workers=WORKERS):
+    # Extract, transform and load in chunks; at most 2 * workers batches are in flight at once
+    start = time.perf_counter()
+    loaded = 0
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for chunk in pd.read_csv(file_path, chunksize=chunk_size):
+            for documents in iter_documents(transform_chunk(chunk), batch_size):
+                if len(in_flight) >= workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    loaded += sum(future.result() for future in done)
+                in_flight.add(executor.submit(insert_batch, collection, documents))
+        loaded += sum(future.result() for future in in_flight)
+
+    elapsed = time.perf_counter() - start
+    print(f"Data loaded into MongoDB: {loaded} documents in {elapsed:.2f}s ({loaded / max(elapsed, 1e-9):,.0f} docs/sec)")
+    return loaded
+
+if __name__ == "__main__":
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['etl_database']
+    collection = db['transformed_data']
+
+    load_csv_to_mongo('source_file.csv', collection)
@@ -1,43 +1,163 @@
 # Description: This script extracts data from CSV, JSON, and XML files, transforms it into a DataFrame, and saves it as a CSV file.
 import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 import xml.etree.ElementTree as ET
 
+COLUMNS = ['car_model', 'year_of_manufacture', 'price', 'fuel']
+
+# Declared schema for XML records: field tag -> column dtype
+XML_SCHEMA = {
+    "car_model": "object",
+    "year_of_manufacture": "int64",
+    "price": "float64",
+    "fuel": "object",
+}
+XML_CHUNK_SIZE = 50000
+
 def extract_from_csv(file):
     return pd.read_csv(file)
 
 def extract_from_json(file):
     return pd.read_json(file, lines=True)
 
-def extract_from_xml(file):
-    tree = ET.parse(file)
-    root = tree.getroot()
-    
-    rows = []
-    for record in root:
-        row = {
-            "car_model": record.find("car_model").text,
-            "year_of_manufacture": int(record.find("year_of_manufacture").text),
-            "price": float(record.find("price").text),
-            "fuel": record.find("fuel").text,
-        }
-        rows.append(row)
-    
-    return pd.DataFrame(rows)
-
-def extract():
-    extracted_data = pd.DataFrame(columns=['car_model', 'year_of_manufacture', 'price', 'fuel'])
-    
-    for file in glob.glob("data/*.csv"):
-        extracted_data = extracted_data.append(extract_from_csv(file), ignore_index=True)
-    
-    for file in glob.glob("data/*.json"):
-        extracted_data = extracted_data.append(extract_from_json(file), ignore_index=True)
-    
-    for file in glob.glob("data/*.xml"):
-        extracted_data = extracted_data.append(extract_from_xml(file), ignore_index=True)
-    
-    return extracted_data
-
-extracted_data = extract()
-extracted_data.to_csv("transformed_data.csv", index=False)
+def compile_schema(schema):
+    # Resolve each field once: column position, NumPy dtype and text converter
+    compiled = {}
+    for position, (tag, dtype) in enumerate(schema.items()):
+        dtype = np.dtype(dtype)
+        if dtype.kind in "iu":
+            convert = int
+        elif dtype.kind == "f":
+            convert = float
+        else:
+            convert = None
+        compiled[tag] = (position, dtype, convert)
+    return compiled
+
+def build_chunk(compiled, buffers, present, rows):
+    # Turn the filled column arrays into a DataFrame, marking fields missing from a record as NA
+    data = {}
+    for tag, (position, dtype, convert) in compiled.items():
+        values = buffers[position][:rows]
+        mask = present[position][:rows]
+        if not mask.all():
+            if dtype.kind in "iu":
+                values = pd.arrays.IntegerArray(values, ~mask)
+            elif dtype.kind == "f":
+                values[~mask] = np.nan
+            else:
+                values[~mask] = None
+        data[tag] = values
+    return pd.DataFrame(data, columns=list(compiled))
+
+def iter_xml_chunks(file, schema=XML_SCHEMA, chunk_size=XML_CHUNK_SIZE):
+    # Stream <root><record><field/>...</record>...</root> with iterparse, clearing each record after use
+    compiled = compile_schema(schema)
+    buffers = [np.empty(chunk_size, dtype) for _, dtype, _ in compiled.values()]
+    present = np.zeros((len(compiled), chunk_size), dtype=bool)
+    rows = 0
+    depth = 0
+    root = None
+
+    for event, elem in ET.iterparse(file, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if depth == 1:
+                root = elem
+            continue
+
+        depth -= 1
+        if depth == 2:
+            # End of a field element
+            field = compiled.get(elem.tag)
+            if field is not None:
+                position, _, convert = field
+                text = elem.text
+                buffers[position][rows] = convert(text) if convert and text is not None else text
+                present[position][rows] = text is not None or convert is None
+        elif depth == 1:
+            # End of a record: advance the row and drop the parsed element tree
+            rows += 1
+            root.clear()
+            if rows == chunk_size:
+                yield build_chunk(compiled, buffers, present, rows)
+                buffers = [np.empty(chunk_size, dtype) for _, dtype, _ in compiled.values()]
+                present[:] = False
+                rows = 0
+
+    if rows:
+        yield build_chunk(compiled, buffers, present, rows)
+
+def extract_from_xml(file, schema=XML_SCHEMA, chunk_size=XML_CHUNK_SIZE):
+    chunks = list(iter_xml_chunks(file, schema, chunk_size))
+    if not chunks:
+        return pd.DataFrame(columns=list(schema))
+    return pd.concat(chunks, ignore_index=True)
+
+def extract_file(file):
+    # Runs in a worker process: parse one file and time it
+    start = time.perf_counter()
+    if file.endswith(".csv"):
+        df = extract_from_csv(file)
+    elif file.endswith(".json"):
+        df = extract_from_json(file)
+    elif file.endswith(".xml"):
+        df = extract_from_xml(file)
+    else:
+        raise ValueError(f"Unsupported file type: {file}")
+    return file, df, time.perf_counter() - start
+
+def extract_files(files, max_workers=None):
+    # Parse files across a process pool, yielding (file, frame, seconds) in input order
+    max_workers = max_workers or os.cpu_count()
+    chunksize = max(1, len(files) // (max_workers * 4))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(extract_file, files, chunksize=chunksize)
+
+def write_to_sink(df, sink, writer=None):
+    # Append one frame to a CSV or Parquet sink; pass the returned writer back in for the next frame
+    df = df.reindex(columns=COLUMNS)
+    if sink.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table.cast(writer.schema))
+        return writer
+    df.to_csv(sink, mode="w" if writer is None else "a", header=writer is None, index=False)
+    return sink
+
+def extract(data_dir="data", max_workers=None, sink=None):
+    files = []
+    for pattern in ("*.csv", "*.json", "*.xml"):
+        files.extend(sorted(glob.glob(os.path.join(data_dir, pattern))))
+
+    frames = []
+    writer = None
+    start = time.perf_counter()
+    for file, df, elapsed in extract_files(files, max_workers):
+        print(f"Extracted {file}: {len(df)} rows in {elapsed:.3f}s")
+        if sink:
+            writer = write_to_sink(df, sink, writer)
+        else:
+            frames.append(df)
+    print(f"Extracted {len(files)} files in {time.perf_counter() - start:.2f}s")
+
+    if sink:
+        if hasattr(writer, "close"):
+            writer.close()
+        return None
+
+    # Concatenate once instead of growing the frame with append in a loop
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+if __name__ == "__main__":
+    extracted_data = extract()
+    extracted_data.to_csv("transformed_data.csv", index=False)
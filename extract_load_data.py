@@ -1,39 +1,296 @@
 # This script extracts and loads data from multiple databases into a centralized warehouse. 
 # It supports automation and scalability for enterprise-level workflows
-import mysql.connector
-import pyodbc
-import fdb
+import hashlib
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pipeline_metrics import METRICS
 
-def etl(query, source_cnx, target_cnx):
-    # Extract data from source database
-    source_cursor = source_cnx.cursor()
-    source_cursor.execute(query.extract_query)
-    data = source_cursor.fetchall()
-    source_cursor.close()
-    
-    # Load data into target database
-    if data:
-        target_cursor = target_cnx.cursor()
-        target_cursor.executemany(query.load_query, data)
-        print('Data loaded to warehouse')
-        target_cursor.close()
-    else:
-        print('No data found')
+BATCH_SIZE = 5000
+QUEUE_SIZE = 8
+MIN_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 100000
+# Adaptive batches aim for one executemany per this many seconds; commits happen every COMMIT_ROWS rows
+TARGET_BATCH_SECONDS = 0.5
+COMMIT_ROWS = 50000
 
-def etl_process(queries, target_cnx, source_db_config, db_platform):
-    # Connect to source database
+def connect_source(source_db_config, db_platform):
+    # Driver imports are deferred so only the platforms actually used need to be installed
     if db_platform == 'mysql':
-        source_cnx = mysql.connector.connect(**source_db_config)
+        import mysql.connector
+        return mysql.connector.connect(**source_db_config)
     elif db_platform == 'sqlserver':
-        source_cnx = pyodbc.connect(**source_db_config)
+        import pyodbc
+        return pyodbc.connect(**source_db_config)
     elif db_platform == 'firebird':
-        source_cnx = fdb.connect(**source_db_config)
+        import fdb
+        return fdb.connect(**source_db_config)
+    elif db_platform == 'sqlite':
+        # Local stand-in for any of the platforms above (testing)
+        import sqlite3
+        return sqlite3.connect(**source_db_config, check_same_thread=False)
     else:
         raise ValueError('Unsupported database platform')
+
+class AdaptiveBatchSize:
+    """Batch size steered towards a target write latency (multiplicative, bounded steps)."""
+
+    def __init__(self, size=BATCH_SIZE, target_seconds=TARGET_BATCH_SECONDS, min_size=MIN_BATCH_SIZE,
+                 max_size=MAX_BATCH_SIZE):
+        """
+        :param size: Initial rows per batch.
+        :param target_seconds: Desired duration of one executemany.
+        :param min_size: Smallest batch size.
+        :param max_size: Largest batch size.
+        """
+        self.size = size
+        self.target_seconds = target_seconds
+        self.min_size = min_size
+        self.max_size = max_size
+
+    def observe(self, rows, seconds):
+        """
+        Adjust the batch size after a batch of `rows` took `seconds` to write (at most 2x up or down per step).
+        :return: New batch size.
+        """
+        if rows and seconds > 0:
+            factor = min(max(self.target_seconds / seconds, 0.5), 2.0)
+            self.size = int(min(max(rows * factor, self.min_size), self.max_size))
+        return self.size
+
+def checkpoint_key(query):
+    # Queries are identified by an explicit 'name' attribute, else by their SQL text
+    name = getattr(query, 'name', None)
+    if name:
+        return f"etl:{name}"
+    return "etl:" + hashlib.sha256(f"{query.extract_query}|{query.load_query}".encode()).hexdigest()[:16]
+
+def etl(query, source_cnx, target_cnx, batch_size=BATCH_SIZE, queue_size=QUEUE_SIZE, commit_rows=COMMIT_ROWS,
+        target_seconds=TARGET_BATCH_SECONDS, checkpoint_file=None):
+    """
+    Copy the rows of one query from the source to the target with extract and load overlapped: a reader
+    thread streams fetchmany() batches into a bounded queue while this thread writes them with executemany()
+    and commits every `commit_rows` rows.
+    With a checkpoint file, the number of committed rows is recorded after every commit, and a failed run
+    resumes after the last committed batch (the extract query needs a stable ORDER BY for this).
+    :param query: Object with 'extract_query', 'load_query' and optional 'name' (checkpoint key).
+    :param source_cnx: DB-API connection to the source (read only from the reader thread).
+    :param target_cnx: DB-API connection to the warehouse.
+    :param batch_size: Initial rows per batch; adjusted so one executemany takes about `target_seconds`.
+    :param queue_size: Maximum batches buffered between reader and writer (backpressure).
+    :param commit_rows: Commit (and checkpoint) after at least this many rows.
+    :param target_seconds: Target duration of one executemany (None keeps the batch size fixed).
+    :param checkpoint_file: JSON file for resume checkpoints (None disables checkpointing).
+    :return: Number of rows loaded by this run.
+    """
+    checkpoints = None
+    skip = 0
+    if checkpoint_file:
+        from incremental_loader import WatermarkStore
+        checkpoints = WatermarkStore(checkpoint_file)
+        skip = int(checkpoints.get(checkpoint_key(query)) or 0)
+        if skip:
+            print(f"Resuming after {skip} committed rows")
+
+    sizer = AdaptiveBatchSize(batch_size, target_seconds) if target_seconds else None
+    batches = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        # Block while the queue is full, but give up if the writer has failed
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read():
+        # Extract data from source database, one batch at a time
+        try:
+            with METRICS.stage('warehouse.extract') as stage:
+                source_cursor = source_cnx.cursor()
+                try:
+                    source_cursor.execute(query.extract_query)
+                    remaining_skip = skip
+                    while remaining_skip:
+                        rows = source_cursor.fetchmany(min(remaining_skip, MAX_BATCH_SIZE))
+                        if not rows:
+                            break
+                        remaining_skip -= len(rows)
+                    while True:
+                        rows = source_cursor.fetchmany(sizer.size if sizer else batch_size)
+                        if not rows:
+                            break
+                        stage.add(len(rows))
+                        if not put(rows):
+                            return
+                finally:
+                    source_cursor.close()
+        except Exception as e:
+            put(e)
+        finally:
+            put(done)
+
+    reader = threading.Thread(target=read, name='etl-reader', daemon=True)
+    reader.start()
+
+    # Load data into target database as batches arrive
+    loaded = 0
+    uncommitted = 0
+    target_cursor = target_cnx.cursor()
+    try:
+        with METRICS.stage('warehouse.load') as stage:
+            while True:
+                item = batches.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                start = time.perf_counter()
+                target_cursor.executemany(query.load_query, item)
+                if sizer:
+                    sizer.observe(len(item), time.perf_counter() - start)
+                loaded += len(item)
+                uncommitted += len(item)
+                stage.add(len(item))
+                if uncommitted >= commit_rows:
+                    target_cnx.commit()
+                    uncommitted = 0
+                    if checkpoints:
+                        checkpoints.set(checkpoint_key(query), skip + loaded)
+            target_cnx.commit()
+    except BaseException:
+        stop.set()
+        # Drop the uncommitted tail so the target matches the checkpoint
+        target_cnx.rollback()
+        raise
+    finally:
+        target_cursor.close()
+        reader.join()
+
+    # A completed run starts from the beginning next time
+    if checkpoints:
+        checkpoints.set(checkpoint_key(query), 0)
+    if loaded or skip:
+        print(f'Data loaded to warehouse: {loaded} rows' + (f' (resumed after {skip})' if skip else ''))
+    else:
+        print('No data found')
+    return loaded
+
+def etl_process(queries, target_cnx, source_db_config, db_platform, checkpoint_file=None):
+    # Connect to source database
+    source_cnx = connect_source(source_db_config, db_platform)
     
     # Loop through queries and perform ETL
     for query in queries:
-        etl(query, source_cnx, target_cnx)
+        etl(query, source_cnx, target_cnx, checkpoint_file=checkpoint_file)
     
     # Close connection
     source_cnx.close()
+
+def extract_batches(query, source_cnx, batch_size=BATCH_SIZE):
+    # Stream the result set with fetchmany instead of materializing it with fetchall
+    source_cursor = source_cnx.cursor()
+    try:
+        source_cursor.execute(query.extract_query)
+        while True:
+            rows = source_cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        source_cursor.close()
+
+def parallel_etl_process(sources, target_cnx, max_workers=4, batch_size=BATCH_SIZE, queue_size=QUEUE_SIZE):
+    """
+    Run the queries of several sources concurrently and stream their rows into the target.
+    :param sources: List of dicts with 'name', 'db_platform', 'config', 'queries' and optional
+                    'max_connections' (per-source concurrency limit, default 1).
+    :param target_cnx: DB-API connection to the warehouse (written only from the calling thread).
+    :param max_workers: Total number of extraction threads across all sources.
+    :param batch_size: Rows per fetchmany/executemany batch.
+    :param queue_size: Maximum batches buffered between extractors and the loader (backpressure).
+    :return: Dictionary of source name to number of rows loaded.
+    """
+    batches = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    done = object()
+    # Each source gets up to 'max_connections' runners that take its queries in turn, so a thread never sits
+    # waiting for another source's connection limit; runners are submitted round-robin across sources
+    pending = {source['name']: queue.SimpleQueue() for source in sources}
+    for source in sources:
+        for query in source['queries']:
+            pending[source['name']].put(query)
+    limits = {source['name']: min(source.get('max_connections', 1), len(source['queries'])) for source in sources}
+    runners = [source for slot in range(max(limits.values(), default=0))
+               for source in sources if slot < limits[source['name']]]
+
+    def put(item):
+        # Block while the queue is full, but give up if the loader has failed
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def extract_job(source, query):
+        with METRICS.stage('warehouse.extract') as stage:
+            source_cnx = connect_source(source['config'], source['db_platform'])
+            try:
+                start = time.perf_counter()
+                for rows in extract_batches(query, source_cnx, batch_size):
+                    stage.add(len(rows))
+                    if not put((source['name'], query, rows)):
+                        return
+                print(f"Extracted '{source['name']}' query in {time.perf_counter() - start:.2f}s")
+            finally:
+                source_cnx.close()
+
+    def run_source(source):
+        # Extract this source's queries one after another until none are left
+        try:
+            while not stop.is_set():
+                try:
+                    query = pending[source['name']].get_nowait()
+                except queue.Empty:
+                    return
+                extract_job(source, query)
+        except Exception as e:
+            put(e)
+        finally:
+            put(done)
+
+    loaded = {source['name']: 0 for source in sources}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for source in runners:
+            executor.submit(run_source, source)
+
+        remaining = len(runners)
+        target_cursor = target_cnx.cursor()
+        try:
+            with METRICS.stage('warehouse.load') as stage:
+                while remaining:
+                    item = batches.get()
+                    if item is done:
+                        remaining -= 1
+                        continue
+                    if isinstance(item, Exception):
+                        raise item
+                    name, query, rows = item
+                    target_cursor.executemany(query.load_query, rows)
+                    loaded[name] += len(rows)
+                    stage.add(len(rows))
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            target_cursor.close()
+
+    print(f"Data loaded to warehouse: {loaded}")
+    return loaded
@@ -0,0 +1,107 @@
+# Description: This module builds compact Pandas frames for finance transactions from the ORM model.
+# Column dtypes are derived from FinanceTransaction instead of Pandas defaults: INTEGER columns become int32
+# (the PostgreSQL INTEGER range), short strings become categoricals and dates become native datetime64.
+# NUMERIC amounts stay float64: float32 only holds 7 significant digits, so NUMERIC(10, 2) cents would be lost
+# above about 167,772. Sums of amounts are computed exactly in integer units of the column's scale
+# (aggregation_engine.fixed_point), see scale(). Conversions always return a new frame, so callers' data is
+# never modified in place, and memory_report() shows what each column costs.
+import pandas as pd
+from sqlalchemy import BigInteger, Integer, SmallInteger, Numeric, Float, String, Date, DateTime
+from etlPipeline_with_PostgreSQL_01 import FinanceTransaction
+
+# Strings up to this declared length are stored as categoricals (codes plus one copy of each value)
+CATEGORY_MAX_LENGTH = 32
+
+
+class FinanceFrameSchema:
+    @staticmethod
+    def dtypes(table=FinanceTransaction.__table__):
+        """
+        Derive compact Pandas dtypes from an SQLAlchemy table.
+        :param table: SQLAlchemy Table object (default: FinanceTransaction.__table__).
+        :return: Dictionary of column name to dtype.
+        """
+        dtypes = {}
+        for column in table.columns:
+            if isinstance(column.type, (Date, DateTime)):
+                dtypes[column.name] = "datetime64[ns]"
+            elif isinstance(column.type, BigInteger):
+                dtypes[column.name] = "int64"
+            elif isinstance(column.type, SmallInteger):
+                dtypes[column.name] = "int16"
+            elif isinstance(column.type, Integer):
+                dtypes[column.name] = "int32"
+            elif isinstance(column.type, (Numeric, Float)):
+                dtypes[column.name] = "float64"
+            elif isinstance(column.type, String) and (column.type.length or 0) <= CATEGORY_MAX_LENGTH:
+                dtypes[column.name] = "category"
+            else:
+                dtypes[column.name] = "string"
+        return dtypes
+
+    @staticmethod
+    def compact(df, table=FinanceTransaction.__table__):
+        """
+        Return a copy of the frame with compact dtypes; the input frame is left unchanged.
+        Integer columns holding NULLs fall back to the nullable Pandas integer dtype of the same width.
+        :param df: Pandas DataFrame with (a subset of) the table's columns.
+        :param table: SQLAlchemy Table object describing the columns.
+        :return: New Pandas DataFrame.
+        """
+        dtypes = FinanceFrameSchema.dtypes(table)
+        columns = {}
+        for name in df.columns:
+            values = df[name]
+            dtype = dtypes.get(name)
+            if dtype is None or str(values.dtype) == dtype:
+                columns[name] = values
+            elif dtype.startswith("datetime64"):
+                columns[name] = pd.to_datetime(values, format="ISO8601").astype(dtype)
+            elif dtype.startswith("int") and values.isna().any():
+                columns[name] = values.astype(dtype.capitalize())
+            else:
+                columns[name] = values.astype(dtype)
+        return pd.DataFrame(columns, index=df.index)
+
+    @staticmethod
+    def iter_compact(batches, table=FinanceTransaction.__table__):
+        """
+        Compact each DataFrame batch of a stream.
+        :param batches: Iterable of DataFrames.
+        :return: Generator of compact DataFrames.
+        """
+        for batch in batches:
+            yield FinanceFrameSchema.compact(batch, table)
+
+    @staticmethod
+    def scale(column, table=FinanceTransaction.__table__):
+        """
+        Return the number of decimal places of a NUMERIC column, e.g. 2 for NUMERIC(10, 2).
+        :param column: Column name.
+        :param table: SQLAlchemy Table object describing the column.
+        :return: Scale, or None if the column is not a NUMERIC with a declared scale.
+        """
+        if column not in table.columns:
+            return None
+        column_type = table.columns[column].type
+        if isinstance(column_type, Numeric) and not isinstance(column_type, Float):
+            return column_type.scale
+        return None
+
+    @staticmethod
+    def memory_report(df):
+        """
+        Report the memory used by each column (including string contents).
+        :param df: Pandas DataFrame.
+        :return: Pandas DataFrame with dtype, bytes, bytes per row and share per column, plus a total row.
+        """
+        usage = df.memory_usage(index=False, deep=True)
+        rows = max(len(df), 1)
+        report = pd.DataFrame({
+            "dtype": [str(df[name].dtype) for name in usage.index],
+            "bytes": usage.to_numpy(),
+            "bytes_per_row": usage.to_numpy() / rows,
+            "share": usage.to_numpy() / max(usage.sum(), 1),
+        }, index=usage.index)
+        report.loc["total"] = ["", usage.sum(), usage.sum() / rows, 1.0]
+        return report
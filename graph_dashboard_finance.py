@@ -1,24 +1,33 @@
 import pandas as pd
-from sqlalchemy import create_engine
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.graph_objects as go
+from engine_registry import EngineRegistry
+from streaming_reader import StreamingReader
+from dashboard_queries import FinanceQueryPlanner, DASHBOARD_KPIS, DASHBOARD_TREND, _identifier
+from etlPipeline_with_PostgreSQL_01 import FinanceTransaction
+from finance_schema import FinanceFrameSchema
+from pipeline_metrics import METRICS
+from decimation import decimate
+from aggregation_engine import decimal_sum
+from chart_renderer import ChartRenderer
+from change_feed import RunningAggregates
+
+# Point budget per chart: 'max_points' caps the plotted points (LTTB), 'bucket' optionally resamples
+# first (Pandas offset alias such as 'W' or 'MS') using 'agg' per bucket
+CHART_DECIMATION = {
+    "trend_analysis": {"max_points": 2000, "bucket": None, "agg": "sum"},
+    "dashboard_trend": {"max_points": 5000, "bucket": None, "agg": "sum"},
+}
+# Columns read by chart_specs (the dashboard itself is aggregated in the database)
+CHART_COLUMNS = ["transaction_id", "date", "account_id", "amount", "transaction_type"]
 
 class FinanceDashboard:
     @staticmethod
     def connect_to_database():
         """
-        Create a connection to the PostgreSQL database using SQLAlchemy.
+        Get the shared, pooled connection to the PostgreSQL database (configured in engine_registry).
         :return: SQLAlchemy engine object.
         """
-        user = "postgres"
-        password = "admin"
-        host = "localhost"
-        port = "5432"
-        database = "etl_pipeline"
-        
         try:
-            engine = create_engine(f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}")
+            engine = EngineRegistry.get_engine()
             print("Connected to the database successfully.")
             return engine
         except Exception as e:
@@ -26,16 +35,40 @@ class FinanceDashboard:
             return None
 
     @staticmethod
-    def load_data(engine, table_name):
+    def load_data(engine, table_name, columns=None, chunk_size=None, cache_dir=None, compact=True):
         """
         Load data from the specified SQL table into a Pandas DataFrame.
         :param engine: SQLAlchemy engine object.
         :param table_name: Name of the table to query.
-        :return: Pandas DataFrame containing the table data.
+        :param columns: Optional list of columns to fetch (default: all).
+        :param chunk_size: If set, stream the table through a server-side cursor in batches of this size.
+        :param cache_dir: If set, refresh and read a local Parquet cache of the table instead of querying it in full.
+        :param compact: Convert finance_transactions frames to the compact dtypes of FinanceFrameSchema
+                        (categorical transaction_type, int32 ids, float64 amounts, datetime64 dates).
+        :return: Pandas DataFrame containing the table data, or an iterator of DataFrame batches.
         """
+        compact = compact and table_name == FinanceTransaction.__tablename__
+
+        if cache_dir:
+            from parquet_cache import FinanceParquetCache
+            return FinanceParquetCache.load(engine, table_name, columns, cache_dir, compact, stage="dashboard.load_data")
+
+        if chunk_size:
+            table = FinanceTransaction.__table__ if table_name == FinanceTransaction.__tablename__ else None
+            print(f"Streaming data from '{table_name}' table in batches of {chunk_size} rows.")
+            batches = StreamingReader.iter_batches(engine, table_name, columns, chunk_size, table)
+            if compact:
+                batches = FinanceFrameSchema.iter_compact(batches)
+            return METRICS.track_batches("dashboard.load_data", batches)
+
         try:
-            query = f"SELECT * FROM {table_name};"
-            df = pd.read_sql_query(query, con=engine)
+            with METRICS.stage("dashboard.load_data") as stage:
+                column_list = ", ".join(_identifier(column) for column in columns) if columns else "*"
+                query = f"SELECT {column_list} FROM {table_name};"
+                df = pd.read_sql_query(query, con=engine)
+                if compact:
+                    df = FinanceFrameSchema.compact(df)
+                stage.add_frame(df)
             print(f"Data loaded successfully from '{table_name}' table.")
             return df
         except Exception as e:
@@ -43,108 +76,207 @@ class FinanceDashboard:
             return None
 
     @staticmethod
-    def generate_charts(df):
+    def chart_settings(chart, decimation=None):
         """
-        Generate charts to visualize trends and KPIs.
+        Return the decimation settings for a chart, with per-call overrides applied.
+        :param chart: Chart name (key of CHART_DECIMATION).
+        :param decimation: Optional dictionary of chart name to settings overriding the defaults.
+        :return: Keyword arguments for decimate().
+        """
+        settings = dict(CHART_DECIMATION.get(chart, {}))
+        settings.update((decimation or {}).get(chart, {}))
+        return settings
+
+    @staticmethod
+    def chart_specs(df, decimation=None, prefix=""):
+        """
+        Build the chart specs (aggregated data plus labels) for the bar, trend and heatmap charts.
         :param df: Pandas DataFrame containing transaction data.
+        :param decimation: Optional per-chart overrides of CHART_DECIMATION.
+        :param prefix: Optional file name prefix (e.g. for per-segment chart sets).
+        :return: List of chart spec dictionaries for ChartRenderer.
+        """
+        # Parse the dates without modifying the caller's frame (a no-op for datetime64 columns)
+        dates = pd.to_datetime(df['date'])
+
+        # Transaction Type Distribution (Bar Chart)
+        transaction_type_counts = df['transaction_type'].value_counts()
+
+        # Trend Analysis (Line Chart)
+        trend_data = decimate(decimal_sum(df['amount'], FinanceFrameSchema.scale('amount'), by=dates),
+                              **FinanceDashboard.chart_settings("trend_analysis", decimation))
+
+        # Heatmap for Correlation Analysis
+        correlation_data = df[['transaction_id', 'account_id', 'amount']].corr()
+
+        return FinanceDashboard.layout_specs(transaction_type_counts, trend_data, correlation_data, prefix)
+
+    @staticmethod
+    def aggregate_chart_specs(aggregates, decimation=None):
+        """
+        Build the bar and trend chart specs from running aggregates, without reading the table.
+        The correlation heatmap needs the individual rows and is left out.
+        :param aggregates: RunningAggregates kept up to date from the change feed.
+        :param decimation: Optional per-chart overrides of CHART_DECIMATION.
+        :return: List of chart spec dictionaries for ChartRenderer.
+        """
+        trend_data = decimate(aggregates.trend(), **FinanceDashboard.chart_settings("trend_analysis", decimation))
+        return FinanceDashboard.layout_specs(aggregates.transaction_type_counts(), trend_data)
+
+    @staticmethod
+    def layout_specs(transaction_type_counts, trend_data, correlation_data=None, prefix=""):
+        """
+        Attach the titles, labels and file names to the aggregated chart data.
+        :param transaction_type_counts: Series of counts per transaction type.
+        :param trend_data: Series of amounts per date (already decimated).
+        :param correlation_data: Optional correlation matrix; the heatmap is skipped without it.
+        :param prefix: Optional file name prefix.
+        :return: List of chart spec dictionaries for ChartRenderer.
+        """
+        specs = [
+            {"kind": "bar", "data": transaction_type_counts, "file": f"{prefix}transaction_type_distribution.png",
+             "title": "Transaction Type Distribution", "xlabel": "Transaction Type", "ylabel": "Count",
+             "color": ['blue', 'orange'], "figsize": (8, 5)},
+            {"kind": "line", "data": trend_data, "file": f"{prefix}trend_analysis.png",
+             "title": "Transaction Amount Trend Over Time", "xlabel": "Date", "ylabel": "Total Amount ($)",
+             "color": "green", "figsize": (10, 6)},
+        ]
+        if correlation_data is not None:
+            specs.append({"kind": "heatmap", "data": correlation_data, "file": f"{prefix}correlation_heatmap.png",
+                          "title": "Correlation Heatmap", "figsize": (8, 6)})
+        return specs
+
+    @staticmethod
+    def generate_charts(df=None, decimation=None, output_dir=".", workers=None, show=False, aggregates=None):
+        """
+        Generate charts to visualize trends and KPIs.
+        Charts are rendered headless (Agg, no blocking show), and charts whose data is unchanged since the last
+        run are skipped.
+        :param df: Pandas DataFrame containing transaction data (not needed when aggregates are given).
+        :param decimation: Optional per-chart overrides of CHART_DECIMATION, e.g. {"trend_analysis": {"max_points": 500}}.
+        :param output_dir: Directory for the images.
+        :param workers: Rendering processes (default: in-process, as three charts do not pay for a process pool).
+        :param show: Display the figures interactively instead of batch rendering.
+        :param aggregates: Optional RunningAggregates; the bar and trend charts are then drawn from them.
         """
         try:
-            # Convert 'date' column to datetime format
-            df['date'] = pd.to_datetime(df['date'])
-
-            # Transaction Type Distribution (Bar Chart)
-            transaction_type_counts = df['transaction_type'].value_counts()
-            plt.figure(figsize=(8, 5))
-            transaction_type_counts.plot(kind='bar', color=['blue', 'orange'])
-            plt.title("Transaction Type Distribution")
-            plt.xlabel("Transaction Type")
-            plt.ylabel("Count")
-            plt.xticks(rotation=0)
-            plt.tight_layout()
-            plt.savefig("transaction_type_distribution.png")
-            plt.show()
-
-            # Trend Analysis (Line Chart)
-            trend_data = df.groupby('date')['amount'].sum()
-            plt.figure(figsize=(10, 6))
-            trend_data.plot(kind='line', color='green')
-            plt.title("Transaction Amount Trend Over Time")
-            plt.xlabel("Date")
-            plt.ylabel("Total Amount ($)")
-            plt.tight_layout()
-            plt.savefig("trend_analysis.png")
-            plt.show()
-
-            # Heatmap for Correlation Analysis
-            correlation_data = df[['transaction_id', 'account_id', 'amount']].corr()
-            plt.figure(figsize=(8, 6))
-            sns.heatmap(correlation_data, annot=True, cmap="coolwarm", fmt=".2f")
-            plt.title("Correlation Heatmap")
-            plt.tight_layout()
-            plt.savefig("correlation_heatmap.png")
-            plt.show()
+            with METRICS.stage("dashboard.charts") as stage:
+                if aggregates is not None:
+                    stage.add(len(aggregates.cells))
+                    specs = FinanceDashboard.aggregate_chart_specs(aggregates, decimation)
+                else:
+                    stage.add_frame(df)
+                    specs = FinanceDashboard.chart_specs(df, decimation)
+                ChartRenderer(output_dir, workers).render(specs, show=show)
 
         except Exception as e:
             print(f"Error generating charts: {str(e)}")
 
     @staticmethod
-    def generate_dashboard(df):
+    def generate_segment_charts(df, segment_by="month", decimation=None, output_dir="charts", workers=None):
         """
-        Generate an interactive dashboard using Plotly.
+        Render a chart set per segment (e.g. one per month or per account), all segments in parallel.
         :param df: Pandas DataFrame containing transaction data.
+        :param segment_by: 'month' or the name of a column such as 'account_id'.
+        :param decimation: Optional per-chart overrides of CHART_DECIMATION.
+        :param output_dir: Directory for the images.
+        :param workers: Rendering processes (default: one per CPU).
+        :return: Dictionary of file path to 'rendered' or 'skipped', or None on error.
         """
         try:
-            # Calculate KPIs
-            total_transactions = len(df)
-            total_credit = df[df['transaction_type'] == 'credit']['amount'].sum()
-            total_debit = df[df['transaction_type'] == 'debit']['amount'].sum()
-
-            # Create a Plotly dashboard
-            fig = go.Figure()
-
-            # Add KPI cards
-            fig.add_trace(go.Indicator(
-                mode="number",
-                value=total_transactions,
-                title={"text": "Total Transactions"},
-                domain={'x': [0, 0.3], 'y': [0.5, 1]}
-            ))
-
-            fig.add_trace(go.Indicator(
-                mode="number",
-                value=total_credit,
-                title={"text": "Total Credit ($)"},
-                domain={'x': [0.35, 0.65], 'y': [0.5, 1]}
-            ))
-
-            fig.add_trace(go.Indicator(
-                mode="number",
-                value=total_debit,
-                title={"text": "Total Debit ($)"},
-                domain={'x': [0.7, 1], 'y': [0.5, 1]}
-            ))
-
-            # Add a line chart for trends over time
-            trend_data = df.groupby('date')['amount'].sum().reset_index()
-            
-            fig.add_trace(go.Scatter(
-                x=trend_data['date'],
-                y=trend_data['amount'],
-                mode='lines',
-                name='Transaction Trends'
-            ))
-
-            # Update layout and save dashboard as HTML
-            fig.update_layout(
-                title="Finance Dashboard",
-                template="plotly_dark",
-                height=600,
-                width=1000
-            )
-            
-            fig.write_html("finance_dashboard.html")
-            
-            print("Dashboard saved as finance_dashboard.html")
+            with METRICS.stage("dashboard.segment_charts") as stage:
+                stage.add_frame(df)
+                if segment_by == "month":
+                    keys = pd.to_datetime(df['date']).dt.strftime("%Y-%m")
+                else:
+                    keys = df[segment_by]
+
+                specs = []
+                for key, segment in df.groupby(keys, sort=True):
+                    specs.extend(FinanceDashboard.chart_specs(segment, decimation, f"{segment_by}_{key}_"))
+                return ChartRenderer(output_dir, workers).render(specs)
+
+        except Exception as e:
+            print(f"Error generating segment charts: {str(e)}")
+            return None
+
+    @staticmethod
+    def generate_dashboard(df=None, engine=None, table_name="finance_transactions", rollup=None, decimation=None,
+                           aggregates=None):
+        """
+        Generate an interactive dashboard using Plotly.
+        With running aggregates (see RunningAggregates.open_if_installed), the KPIs and the trend come from them. Otherwise, with an
+        engine, they are aggregated by the database and only the results are transferred; the DataFrame is
+        then just a fallback for anything that cannot be pushed down.
+        :param df: Pandas DataFrame containing transaction data (optional when an engine is given).
+        :param engine: Optional SQLAlchemy engine object to push the aggregations down to.
+        :param table_name: Name of the transactions table.
+        :param rollup: Optional daily rollup created with FinanceQueryPlanner.create_rollup().
+        :param decimation: Optional per-chart overrides of CHART_DECIMATION for the trend line.
+        :param aggregates: Optional RunningAggregates kept up to date from the change feed.
+        """
+        try:
+            import plotly.graph_objects as go
+
+            with METRICS.stage("dashboard.render") as stage:
+                if df is not None:
+                    stage.add_frame(df)
+                planner = FinanceQueryPlanner(engine, table_name, rollup)
+
+                # Calculate KPIs
+                kpis = aggregates.kpis(DASHBOARD_KPIS) if aggregates is not None else planner.kpis(DASHBOARD_KPIS, df)
+                total_transactions = kpis['total_transactions']
+                total_credit = kpis['total_credit']
+                total_debit = kpis['total_debit']
+
+                # Create a Plotly dashboard
+                fig = go.Figure()
+
+                # Add KPI cards
+                fig.add_trace(go.Indicator(
+                    mode="number",
+                    value=total_transactions,
+                    title={"text": "Total Transactions"},
+                    domain={'x': [0, 0.3], 'y': [0.5, 1]}
+                ))
+
+                fig.add_trace(go.Indicator(
+                    mode="number",
+                    value=total_credit,
+                    title={"text": "Total Credit ($)"},
+                    domain={'x': [0.35, 0.65], 'y': [0.5, 1]}
+                ))
+
+                fig.add_trace(go.Indicator(
+                    mode="number",
+                    value=total_debit,
+                    title={"text": "Total Debit ($)"},
+                    domain={'x': [0.7, 1], 'y': [0.5, 1]}
+                ))
+
+                # Add a line chart for trends over time
+                trend = aggregates.trend() if aggregates is not None else planner.trend(DASHBOARD_TREND, df)
+                trend_data = decimate(trend,
+                                      **FinanceDashboard.chart_settings("dashboard_trend", decimation)).reset_index()
+
+                fig.add_trace(go.Scatter(
+                    x=trend_data['date'],
+                    y=trend_data['amount'],
+                    mode='lines',
+                    name='Transaction Trends'
+                ))
+
+                # Update layout and save dashboard as HTML
+                fig.update_layout(
+                    title="Finance Dashboard",
+                    template="plotly_dark",
+                    height=600,
+                    width=1000
+                )
+
+                fig.write_html("finance_dashboard.html")
+
+                print("Dashboard saved as finance_dashboard.html")
 
         except Exception as e:
             print(f"Error generating dashboard: {str(e)}")
@@ -157,12 +289,20 @@ if __name__ == "__main__":
     engine = FinanceDashboard.connect_to_database()
     
     if engine is not None:
-        # Step 2: Load data from the table
-        data = FinanceDashboard.load_data(engine, table_name)
-        
-        if data is not None:
-            # Step 3: Generate charts
-            FinanceDashboard.generate_charts(data)
-
-            # Step 4: Generate interactive dashboard
-            FinanceDashboard.generate_dashboard(data)
+        # Step 2: Refresh the running aggregates from the change feed when change capture is installed
+        aggregates = RunningAggregates.open_if_installed(engine, table_name)
+
+        if aggregates is not None:
+            # Step 3: Charts and dashboard straight from the aggregates, without reading the table
+            FinanceDashboard.generate_charts(aggregates=aggregates)
+            FinanceDashboard.generate_dashboard(engine=engine, table_name=table_name, aggregates=aggregates)
+        else:
+            # Step 3: Load the columns the charts need
+            data = FinanceDashboard.load_data(engine, table_name, columns=CHART_COLUMNS)
+
+            if data is not None:
+                # Step 4: Generate charts
+                FinanceDashboard.generate_charts(data)
+
+            # Step 5: Generate interactive dashboard (aggregated in the database, so it does not need the loaded rows)
+            FinanceDashboard.generate_dashboard(engine=engine, table_name=table_name)
@@ -0,0 +1,224 @@
+# Description: This module loads only new or changed rows instead of replacing whole tables.
+# A persisted high-water mark per source decides which rows are new, and rows are upserted with
+# INSERT ... ON CONFLICT on the table key (PostgreSQL, or SQLite as a local stand-in).
+import json
+import numbers
+import os
+import pandas as pd
+from sqlalchemy import MetaData, Table, inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+from bulk_loader import BulkLoader
+
+DEFAULT_WATERMARK_FILE = "etl_watermarks.json"
+
+
+class WatermarkStore:
+    """High-water marks per source, persisted as a small JSON file."""
+
+    def __init__(self, file_path=DEFAULT_WATERMARK_FILE):
+        self.file_path = file_path
+
+    def _read(self):
+        if not os.path.exists(self.file_path):
+            return {}
+        with open(self.file_path) as file:
+            return json.load(file)
+
+    def get(self, source):
+        """
+        Return the stored high-water mark for a source.
+        :param source: Source name (e.g. table or endpoint).
+        :return: Stored value, or None if the source has never been loaded.
+        """
+        return self._read().get(source)
+
+    def set(self, source, value):
+        """
+        Persist a new high-water mark for a source (atomic replace of the JSON file).
+        :param source: Source name.
+        :param value: New high-water mark (numbers are kept as numbers, anything else as a string).
+        """
+        marks = self._read()
+        if isinstance(value, numbers.Integral):
+            marks[source] = int(value)
+        elif isinstance(value, numbers.Real):
+            marks[source] = float(value)
+        else:
+            marks[source] = str(value)
+        temp_path = f"{self.file_path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(marks, file, indent=2)
+        os.replace(temp_path, self.file_path)
+
+
+class IncrementalLoader:
+    @staticmethod
+    def newer_rows(df, column, watermark):
+        """
+        Keep only the rows whose watermark column is above the stored high-water mark.
+        :param df: Pandas DataFrame.
+        :param column: Watermark column (e.g. 'transaction_id' or 'date').
+        :param watermark: Stored high-water mark, or None to keep every row.
+        :return: Filtered DataFrame.
+        """
+        if watermark is None:
+            return df
+        values = df[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            watermark = pd.Timestamp(watermark)
+        elif pd.api.types.is_numeric_dtype(values):
+            watermark = float(watermark)
+        return df[(values > watermark).fillna(False)]
+
+    @staticmethod
+    def ensure_table(connection, table_name, sample, key_columns, table=None):
+        """
+        Create the target table if needed, with a unique index on the key columns so ON CONFLICT can target it.
+        :param connection: SQLAlchemy connection (inside a transaction).
+        :param table_name: Name of the target table.
+        :param sample: DataFrame used to infer the schema when no table is given.
+        :param key_columns: Columns identifying a row.
+        :param table: Optional SQLAlchemy Table object to create instead of inferring one.
+        :return: Reflected SQLAlchemy Table object.
+        """
+        if table is not None:
+            table.create(connection, checkfirst=True)
+            return table
+
+        index_name = f"uq_{table_name}_{'_'.join(key_columns)}"
+        if not inspect(connection).has_table(table_name):
+            sample.head(0).to_sql(table_name, con=connection, index=False)
+        elif index_name not in {index["name"] for index in inspect(connection).get_indexes(table_name)}:
+            # A table loaded before (e.g. by a full replace) may hold duplicate keys the unique index would reject
+            removed = IncrementalLoader.dedupe(connection, table_name, key_columns)
+            if removed:
+                print(f"Removed {removed} duplicate rows from '{table_name}' (keeping the last row per "
+                      f"{', '.join(key_columns)}) before indexing the key.")
+        connection.execute(text(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {table_name} ({', '.join(key_columns)})"))
+        return Table(table_name, MetaData(), autoload_with=connection)
+
+    @staticmethod
+    def dedupe(connection, table_name, key_columns):
+        """
+        Delete rows sharing a key with a later row (last row wins, like upsert); rows with NULL keys are kept.
+        :param connection: SQLAlchemy connection (inside a transaction).
+        :param table_name: Name of the table.
+        :param key_columns: Columns identifying a row.
+        :return: Number of deleted rows.
+        """
+        row_id = "ctid" if connection.dialect.name == "postgresql" else "rowid"
+        matches = " AND ".join(f"later.{column} = {table_name}.{column}" for column in key_columns)
+        result = connection.execute(text(
+            f"DELETE FROM {table_name} WHERE EXISTS (SELECT 1 FROM {table_name} AS later "
+            f"WHERE later.{row_id} > {table_name}.{row_id} AND {matches})"))
+        return result.rowcount
+
+    @staticmethod
+    def upsert(connection, table, df, key_columns, batch_size=5000):
+        """
+        Upsert a DataFrame with INSERT ... ON CONFLICT (key) DO UPDATE.
+        :param connection: SQLAlchemy connection (inside a transaction).
+        :param table: SQLAlchemy Table object.
+        :param df: Pandas DataFrame of rows to write.
+        :param key_columns: Conflict target columns.
+        :param batch_size: Rows per statement.
+        :return: Number of rows written.
+        """
+        dialect = connection.dialect.name
+        if dialect == "postgresql":
+            insert = postgresql.insert
+        elif dialect == "sqlite":
+            insert = sqlite.insert
+        else:
+            raise ValueError(f"Upsert is not supported for '{dialect}'")
+
+        # A statement may touch each key only once (PostgreSQL rejects the second update): the last row wins
+        df = df.drop_duplicates(subset=key_columns, keep="last")
+        columns = [c for c in df.columns if c in table.columns]
+        update_columns = [c for c in columns if c not in key_columns]
+        df = df[columns].astype(object).where(df[columns].notna(), None)
+
+        for start in range(0, len(df), batch_size):
+            records = df.iloc[start:start + batch_size].to_dict("records")
+            statement = insert(table).values(records)
+            if update_columns:
+                statement = statement.on_conflict_do_update(
+                    index_elements=key_columns,
+                    set_={c: statement.excluded[c] for c in update_columns})
+            else:
+                statement = statement.on_conflict_do_nothing(index_elements=key_columns)
+            connection.execute(statement)
+        return len(df)
+
+    @staticmethod
+    def load_frames(engine, frames, table_name, key_columns, source=None, watermark_column=None,
+                    store=None, table=None):
+        """
+        Incrementally load DataFrame chunks: skip rows at or below the watermark, upsert the rest,
+        and advance the watermark only after the transaction commits.
+        :param engine: SQLAlchemy engine object.
+        :param frames: Iterable of DataFrames (or a single DataFrame).
+        :param table_name: Name of the target table.
+        :param key_columns: Columns identifying a row.
+        :param source: Watermark key (default: table name).
+        :param watermark_column: Monotonic column used as the high-water mark, or None to upsert every row.
+        :param store: WatermarkStore (default: etl_watermarks.json).
+        :param table: Optional SQLAlchemy Table object.
+        :return: Number of rows written.
+        """
+        if isinstance(frames, pd.DataFrame):
+            frames = [frames]
+        store = store or WatermarkStore()
+        source = source or table_name
+        watermark = store.get(source) if watermark_column else None
+        new_watermark = watermark
+        target = None
+        rows = 0
+
+        with engine.begin() as connection:
+            for frame in frames:
+                if watermark_column:
+                    frame = IncrementalLoader.newer_rows(frame, watermark_column, watermark)
+                if frame.empty:
+                    continue
+                if target is None:
+                    target = IncrementalLoader.ensure_table(connection, table_name, frame, key_columns, table)
+                rows += IncrementalLoader.upsert(connection, target, frame, key_columns)
+                if watermark_column:
+                    chunk_max = frame[watermark_column].max()
+                    if new_watermark is None or chunk_max > IncrementalLoader._coerce(new_watermark, chunk_max):
+                        new_watermark = chunk_max
+
+        if watermark_column and new_watermark is not None and new_watermark != watermark:
+            store.set(source, new_watermark)
+        return rows
+
+    @staticmethod
+    def load_csv(engine, file_path, table_name, key_columns, watermark_column=None, source=None,
+                 store=None, table=None, chunk_size=100000):
+        """
+        Incrementally load a CSV file in chunks.
+        :param engine: SQLAlchemy engine object.
+        :param file_path: Path to the CSV file.
+        :param table_name: Name of the target table.
+        :param key_columns: Columns identifying a row.
+        :param watermark_column: Monotonic column used as the high-water mark.
+        :param source: Watermark key (default: table name).
+        :param store: WatermarkStore.
+        :param table: Optional SQLAlchemy Table object defining column types.
+        :param chunk_size: Rows per chunk.
+        :return: Number of rows written.
+        """
+        chunks = BulkLoader.iter_csv_chunks(file_path, chunk_size, table)
+        return IncrementalLoader.load_frames(engine, chunks, table_name, key_columns, source,
+                                             watermark_column, store, table)
+
+    @staticmethod
+    def _coerce(watermark, like):
+        """Convert a stored watermark to the type of a column value for comparison."""
+        if isinstance(like, pd.Timestamp):
+            return pd.Timestamp(watermark)
+        if isinstance(watermark, str):
+            return type(like)(watermark)
+        return watermark
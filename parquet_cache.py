@@ -0,0 +1,222 @@
+# Description: This module keeps a local, month-partitioned Parquet copy of finance_transactions.
+# Only partitions touched by rows above the transaction_id watermark are refreshed from the database,
+# and readers get just the requested columns and date range, at local-disk speed. A checksum of the rows
+# at or below the watermark (row count plus the sum of a hash of every cached column of each row, computed by
+# the database) detects updates, including moves between months and swapped values, and deletes, which trigger
+# a full rebuild.
+import hashlib
+import json
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import text
+from streaming_reader import StreamingReader
+from etlPipeline_with_PostgreSQL_01 import FinanceTransaction
+from finance_schema import FinanceFrameSchema
+from pipeline_metrics import METRICS
+
+DEFAULT_CACHE_DIR = "finance_cache"
+STATE_FILE = "_cache_state.json"
+# Every cached column goes into the per-row hash of the checksum
+CHECKSUM_COLUMNS = tuple(column.name for column in FinanceTransaction.__table__.columns)
+# Hex digits of each row's MD5 summed into the checksum (SQLite sums in 64-bit integers: 7 digits keep
+# billions of rows from overflowing)
+POSTGRESQL_HASH_DIGITS = 15
+SQLITE_HASH_DIGITS = 7
+
+
+def _row_hash(*values):
+    # SQLite stand-in for the md5-based row hash computed by PostgreSQL
+    digest = hashlib.md5("|".join("\\N" if value is None else str(value) for value in values).encode())
+    return int(digest.hexdigest()[:SQLITE_HASH_DIGITS], 16)
+
+
+class FinanceParquetCache:
+    """Month-partitioned Parquet cache (month=YYYY-MM/) of the finance_transactions table."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, table_name=FinanceTransaction.__tablename__, batch_size=100000):
+        self.cache_dir = cache_dir
+        self.table_name = table_name
+        self.batch_size = batch_size
+        self.state_path = os.path.join(cache_dir, STATE_FILE)
+
+    def _read_state(self):
+        if not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path) as file:
+            return json.load(file)
+
+    def _write_state(self, state):
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(state, file, indent=2)
+        os.replace(temp_path, self.state_path)
+
+    @staticmethod
+    def month_bounds(month):
+        """
+        Return the first day of a month and of the following month.
+        :param month: Month as 'YYYY-MM'.
+        :return: Tuple of ISO date strings (start inclusive, end exclusive).
+        """
+        start = pd.Period(month, freq="M")
+        return start.start_time.strftime("%Y-%m-%d"), (start + 1).start_time.strftime("%Y-%m-%d")
+
+    def _write(self, engine, where=None, params=None):
+        # Stream rows from the database and rewrite each month partition they fall into.
+        # Files are written under a temporary name and swapped in once complete.
+        writers = {}
+        try:
+            for batch in StreamingReader.iter_batches(engine, self.table_name, batch_size=self.batch_size,
+                                                      table=FinanceTransaction.__table__, where=where, params=params):
+                months = batch["date"].dt.strftime("%Y-%m")
+                for month, part in batch.groupby(months, sort=False):
+                    table = pa.Table.from_pandas(part, preserve_index=False)
+                    if month not in writers:
+                        partition_dir = os.path.join(self.cache_dir, f"month={month}")
+                        os.makedirs(partition_dir, exist_ok=True)
+                        temp_path = os.path.join(partition_dir, "_part-0.parquet.tmp")
+                        writers[month] = (pq.ParquetWriter(temp_path, table.schema), temp_path, partition_dir)
+                    writers[month][0].write_table(table.cast(writers[month][0].schema))
+        finally:
+            for writer, _, _ in writers.values():
+                writer.close()
+
+        for writer, temp_path, partition_dir in writers.values():
+            os.replace(temp_path, os.path.join(partition_dir, "part-0.parquet"))
+
+    def checksum(self, connection, watermark):
+        """
+        Checksum the rows at or below a transaction_id watermark: row count and the sum of a hash of each row
+        over all cached columns, as strings. Any change to a cached value changes the row's hash.
+        :param connection: SQLAlchemy connection.
+        :param watermark: Highest cached transaction_id (None for an empty table).
+        :return: List of strings.
+        """
+        dialect = connection.dialect.name
+        if dialect == "postgresql":
+            row = ", ".join(f"COALESCE(CAST({column} AS TEXT), '\\N')" for column in CHECKSUM_COLUMNS)
+            row_hash = (f"SUM(CAST(CAST('x' || SUBSTR(MD5(CONCAT_WS('|', {row})), 1, {POSTGRESQL_HASH_DIGITS}) "
+                        f"AS BIT({POSTGRESQL_HASH_DIGITS * 4})) AS BIGINT))")
+        elif dialect == "sqlite":
+            connection.connection.driver_connection.create_function("etl_row_hash", len(CHECKSUM_COLUMNS), _row_hash,
+                                                                    deterministic=True)
+            row_hash = f"SUM(etl_row_hash({', '.join(CHECKSUM_COLUMNS)}))"
+        else:
+            raise ValueError(f"The cache checksum is not supported on '{dialect}'")
+        query = f"SELECT COUNT(*), {row_hash} FROM {self.table_name} WHERE transaction_id <= :watermark"
+        values = connection.execute(text(query), {"watermark": watermark if watermark is not None else -1}).one()
+        return [None if value is None else str(value) for value in values]
+
+    def rebuild(self, engine):
+        """
+        Rebuild the whole cache from the table.
+        :param engine: SQLAlchemy engine object.
+        :return: ['*'].
+        """
+        with engine.connect() as connection:
+            max_id = connection.execute(text(f"SELECT MAX(transaction_id) FROM {self.table_name}")).scalar()
+            checksum = self.checksum(connection, max_id)
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+        os.makedirs(self.cache_dir)
+        self._write(engine, where="transaction_id <= :watermark",
+                    params={"watermark": max_id if max_id is not None else -1})
+        self._write_state({"max_transaction_id": max_id, "checksum": checksum})
+        print(f"Cache built at '{self.cache_dir}'.")
+        return ["*"]
+
+    def refresh(self, engine, rebuild=False):
+        """
+        Bring the cache up to date: a full build the first time, after `rebuild=True`, or when rows at or below
+        the watermark were updated or deleted (their checksum changed); otherwise only the months that contain
+        rows above the stored transaction_id watermark are re-extracted and rewritten.
+        :param engine: SQLAlchemy engine object.
+        :param rebuild: Force a full rebuild.
+        :return: List of refreshed months (or ['*'] after a full build).
+        """
+        state = self._read_state()
+        if rebuild or state is None or "checksum" not in state:
+            return self.rebuild(engine)
+
+        watermark = state["max_transaction_id"]
+        with engine.connect() as connection:
+            max_id = connection.execute(text(f"SELECT MAX(transaction_id) FROM {self.table_name}")).scalar()
+            checksum = self.checksum(connection, watermark)
+        if checksum != state["checksum"]:
+            print("Cached rows were updated or deleted in the table; rebuilding the cache.")
+            return self.rebuild(engine)
+
+        if max_id is None or (watermark is not None and max_id <= watermark):
+            print("Cache is up to date.")
+            return []
+
+        with engine.connect() as connection:
+            changed_dates = connection.execute(
+                text(f"SELECT DISTINCT date FROM {self.table_name} WHERE transaction_id > :watermark"),
+                {"watermark": watermark if watermark is not None else -1}).scalars().all()
+        months = sorted({pd.Timestamp(value).strftime("%Y-%m") for value in changed_dates})
+
+        for month in months:
+            start, end = self.month_bounds(month)
+            self._write(engine, where="date >= :start AND date < :end AND transaction_id <= :max_id",
+                        params={"start": start, "end": end, "max_id": max_id})
+
+        with engine.connect() as connection:
+            checksum = self.checksum(connection, max_id)
+        self._write_state({"max_transaction_id": max_id, "checksum": checksum})
+        print(f"Cache refreshed for {len(months)} month partition(s): {', '.join(months)}")
+        return months
+
+    def read(self, columns=None, start_date=None, end_date=None):
+        """
+        Read cached rows, pruning month partitions outside the date range.
+        :param columns: Optional list of columns to return.
+        :param start_date: Optional first date (inclusive), e.g. '2023-01-01'.
+        :param end_date: Optional last date (inclusive).
+        :return: Pandas DataFrame.
+        """
+        dataset = ds.dataset(self.cache_dir, format="parquet", partitioning="hive",
+                             exclude_invalid_files=True, ignore_prefixes=["_", "."])
+        condition = None
+        if start_date is not None:
+            start = pd.Timestamp(start_date)
+            condition = (ds.field("month") >= start.strftime("%Y-%m")) & (ds.field("date") >= start)
+        if end_date is not None:
+            end = pd.Timestamp(end_date)
+            upper = (ds.field("month") <= end.strftime("%Y-%m")) & (ds.field("date") <= end)
+            condition = upper if condition is None else condition & upper
+
+        columns = list(columns) if columns else [name for name in dataset.schema.names if name != "month"]
+        return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+    @staticmethod
+    def load(engine, table_name=FinanceTransaction.__tablename__, columns=None, cache_dir=DEFAULT_CACHE_DIR,
+             compact=True, stage="analysis.load_data", rebuild=False):
+        """
+        Refresh the cache of a table and read it, as the cached path of the scripts' load_data.
+        :param engine: SQLAlchemy engine object.
+        :param table_name: Name of the cached table.
+        :param columns: Optional list of columns to return.
+        :param cache_dir: Cache directory.
+        :param compact: Convert the frame to the compact dtypes of FinanceFrameSchema.
+        :param stage: Metrics stage the load is recorded under.
+        :param rebuild: Force a full rebuild of the cache.
+        :return: Pandas DataFrame, or None on error.
+        """
+        try:
+            with METRICS.stage(stage) as run:
+                cache = FinanceParquetCache(cache_dir, table_name)
+                cache.refresh(engine, rebuild)
+                df = cache.read(columns)
+                if compact:
+                    df = FinanceFrameSchema.compact(df)
+                run.add_frame(df)
+            print(f"Data loaded successfully from the '{table_name}' cache.")
+            return df
+        except Exception as e:
+            print(f"Error loading cached data: {str(e)}")
+            return None
@@ -0,0 +1,268 @@
+# Description: Lightweight per-stage instrumentation for the ETL scripts.
+# Stages are timed with `with METRICS.stage("name") as stage:` and count rows and bytes as they go;
+# errors are recorded even when the caller goes on to catch and print them. The collected metrics can be
+# exported as JSON or Prometheus text. Profiling is opt-in per stage through environment variables,
+# so a production run can be profiled without changing code:
+#     ETL_PROFILE=etl.load,analysis.aggregate   cProfile the listed stages ('*' for all)
+#     ETL_TRACEMALLOC=etl.load                   record the peak traced memory of the listed stages
+#     ETL_PROFILE_DIR=profiles                   where the .prof files are written
+#     ETL_METRICS_FILE=metrics.prom              write all metrics at exit (.prom for Prometheus, else JSON)
+import atexit
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+def _stage_set(value):
+    return {name.strip() for name in (value or "").split(",") if name.strip()}
+
+
+class StageMetrics:
+    """Counters for one named stage, accumulated over all of its runs."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.last_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.peak_memory_bytes = None
+        self.last_error = None
+        self.profile = None
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "seconds": self.seconds,
+            "last_seconds": self.last_seconds,
+            "max_seconds": self.max_seconds,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "rows_per_second": self.rows / self.seconds if self.seconds else None,
+            "peak_memory_bytes": self.peak_memory_bytes,
+            "last_error": self.last_error,
+            "profile": self.profile,
+        }
+
+
+class StageRun:
+    """Handle yielded by MetricsRegistry.stage() to count the work done in one run."""
+
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+        self.discarded = False
+
+    def discard(self):
+        """Do not record this run, e.g. when it only found that an iterator was exhausted."""
+        self.discarded = True
+
+    def add(self, rows=0, nbytes=0):
+        """
+        Count processed rows and bytes.
+        :param rows: Number of rows.
+        :param nbytes: Number of bytes.
+        """
+        self.rows += rows
+        self.bytes += nbytes
+
+    def add_frame(self, df):
+        """
+        Count the rows and (shallow) memory size of a DataFrame.
+        :param df: Pandas DataFrame.
+        """
+        self.add(len(df), int(df.memory_usage(index=False).sum()))
+
+
+class MetricsRegistry:
+    def __init__(self, profile=None, trace_memory=None, profile_dir=None):
+        """
+        :param profile: Stage names to cProfile ('*' for all; default: $ETL_PROFILE).
+        :param trace_memory: Stage names to trace with tracemalloc (default: $ETL_TRACEMALLOC).
+        :param profile_dir: Directory for .prof files (default: $ETL_PROFILE_DIR or 'profiles').
+        """
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.stages = {}
+        self.profile = _stage_set(os.environ.get("ETL_PROFILE")) if profile is None else set(profile)
+        self.trace_memory = (_stage_set(os.environ.get("ETL_TRACEMALLOC"))
+                             if trace_memory is None else set(trace_memory))
+        self.profile_dir = profile_dir or os.environ.get("ETL_PROFILE_DIR", "profiles")
+
+    @staticmethod
+    def _selected(names, stage):
+        return "*" in names or stage in names
+
+    def _get(self, name):
+        with self.lock:
+            if name not in self.stages:
+                self.stages[name] = StageMetrics(name)
+            return self.stages[name]
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time one run of a stage and record its counters, errors and optional profile.
+        :param name: Stage name, e.g. 'etl.load'.
+        :return: Context manager yielding a StageRun.
+        """
+        run = StageRun()
+        # Only one cProfile profiler can be active per thread: nested stages are timed but not profiled
+        profiler = None
+        if self._selected(self.profile, name) and not getattr(self.local, "profiling", False):
+            profiler = cProfile.Profile()
+            self.local.profiling = True
+        # Traced stages nest: before an inner stage resets the peak, the outer stage's peak so far is carried
+        # on a per-thread stack, and the inner stage's peak is folded back into it when it ends
+        traced = self._selected(self.trace_memory, name)
+        started_tracing = False
+        if traced:
+            peaks = self._memory_peaks()
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            else:
+                if peaks:
+                    peaks[-1] = max(peaks[-1], tracemalloc.get_traced_memory()[1])
+                tracemalloc.reset_peak()
+            peaks.append(0)
+
+        error = None
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield run
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self.local.profiling = False
+            elapsed = time.perf_counter() - start
+            peak = None
+            if traced:
+                peaks = self._memory_peaks()
+                peak = max(peaks.pop(), tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0)
+                if peaks:
+                    peaks[-1] = max(peaks[-1], peak)
+                if started_tracing:
+                    tracemalloc.stop()
+            profile = self._save_profile(name, profiler) if profiler is not None else None
+            if not run.discarded or error is not None:
+                metrics = self._get(name)
+                with self.lock:
+                    metrics.calls += 1
+                    metrics.seconds += elapsed
+                    metrics.last_seconds = elapsed
+                    metrics.max_seconds = max(metrics.max_seconds, elapsed)
+                    metrics.rows += run.rows
+                    metrics.bytes += run.bytes
+                    if peak is not None:
+                        metrics.peak_memory_bytes = max(metrics.peak_memory_bytes or 0, peak)
+                    if profile is not None:
+                        metrics.profile = profile
+                    if error is not None:
+                        metrics.errors += 1
+                        metrics.last_error = f"{type(error).__name__}: {error}"
+
+    def track_batches(self, name, batches):
+        """
+        Wrap an iterator of DataFrame batches so the time spent producing them and their rows/bytes are
+        recorded under `name` (the consumer's own work is not included).
+        :param name: Stage name.
+        :param batches: Iterable of DataFrames.
+        :return: Generator yielding the same batches.
+        """
+        iterator = iter(batches)
+        while True:
+            with self.stage(name) as run:
+                try:
+                    batch = next(iterator)
+                except StopIteration:
+                    run.discard()
+                    return
+                run.add_frame(batch)
+            yield batch
+
+    def _memory_peaks(self):
+        if not hasattr(self.local, "memory_peaks"):
+            self.local.memory_peaks = []
+        return self.local.memory_peaks
+
+    def _save_profile(self, name, profiler):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{name}.{os.getpid()}.prof")
+        profiler.dump_stats(path)
+        print(f"Profile for stage '{name}' written to {path} (inspect with python -m pstats)")
+        return path
+
+    def to_dict(self):
+        """
+        Snapshot of all stage metrics.
+        :return: Dictionary of stage name to metrics dictionary.
+        """
+        with self.lock:
+            return {name: metrics.to_dict() for name, metrics in sorted(self.stages.items())}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self, prefix="etl_stage"):
+        """
+        Render the metrics in the Prometheus text exposition format.
+        :param prefix: Metric name prefix.
+        :return: String.
+        """
+        series = [
+            ("calls_total", "counter", "Number of stage runs.", "calls"),
+            ("errors_total", "counter", "Number of stage runs that raised an error.", "errors"),
+            ("seconds_total", "counter", "Wall-clock seconds spent in the stage.", "seconds"),
+            ("last_seconds", "gauge", "Duration of the latest stage run in seconds.", "last_seconds"),
+            ("max_seconds", "gauge", "Longest stage run in seconds.", "max_seconds"),
+            ("rows_total", "counter", "Rows processed by the stage.", "rows"),
+            ("bytes_total", "counter", "Bytes processed by the stage.", "bytes"),
+            ("peak_memory_bytes", "gauge", "Peak traced memory of the stage (tracemalloc).", "peak_memory_bytes"),
+        ]
+        snapshot = self.to_dict()
+        lines = []
+        for suffix, kind, help_text, key in series:
+            values = [(name, data[key]) for name, data in snapshot.items() if data[key] is not None]
+            if not values:
+                continue
+            lines.append(f"# HELP {prefix}_{suffix} {help_text}")
+            lines.append(f"# TYPE {prefix}_{suffix} {kind}")
+            for name, value in values:
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{prefix}_{suffix}{{stage="{label}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, file_path):
+        """
+        Write the metrics to a file: Prometheus text for '.prom'/'.txt', JSON otherwise.
+        :param file_path: Output path.
+        """
+        content = self.to_prometheus() if file_path.endswith((".prom", ".txt")) else self.to_json()
+        with open(file_path, "w") as file:
+            file.write(content)
+        print(f"Pipeline metrics written to {file_path}")
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+
+
+# Shared registry used by the pipeline scripts
+METRICS = MetricsRegistry()
+
+if os.environ.get("ETL_METRICS_FILE"):
+    atexit.register(METRICS.write, os.environ["ETL_METRICS_FILE"])
@@ -0,0 +1,89 @@
+# Description: This module streams a SQL table in fixed-size, typed batches through a server-side cursor,
+# so peak memory is bounded by the batch size instead of the table size.
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, Integer, Numeric, Float, Date, DateTime
+
+DEFAULT_BATCH_SIZE = 50000
+
+
+class StreamingReader:
+    @staticmethod
+    def numpy_dtypes(table):
+        """
+        Map the columns of an SQLAlchemy table to NumPy dtypes for the batch buffers.
+        :param table: SQLAlchemy Table object (e.g. FinanceTransaction.__table__).
+        :return: Dictionary of column name to NumPy dtype.
+        """
+        dtypes = {}
+        for column in table.columns:
+            if isinstance(column.type, (Date, DateTime)):
+                dtypes[column.name] = np.dtype("datetime64[ns]")
+            elif isinstance(column.type, Integer):
+                dtypes[column.name] = np.dtype("int64")
+            elif isinstance(column.type, (Numeric, Float)):
+                dtypes[column.name] = np.dtype("float64")
+            else:
+                dtypes[column.name] = np.dtype(object)
+        return dtypes
+
+    @staticmethod
+    def build_query(table_name, columns=None, where=None):
+        """
+        Build a SELECT statement for only the requested columns.
+        :param table_name: Name of the table to query.
+        :param columns: Optional list of column names (default: all columns).
+        :param where: Optional SQL condition with :named bind parameters.
+        :return: SQL query string.
+        """
+        column_list = ", ".join(columns) if columns else "*"
+        query = f"SELECT {column_list} FROM {table_name}"
+        return f"{query} WHERE {where}" if where else query
+
+    @staticmethod
+    def iter_batches(engine, table_name, columns=None, batch_size=DEFAULT_BATCH_SIZE, table=None, as_arrow=False,
+                     where=None, params=None):
+        """
+        Stream a table in fixed-size batches using a server-side cursor.
+        Each batch is a view over buffers that are reused for the next batch, so callers that
+        need to keep a batch after advancing the iterator must copy it.
+        :param engine: SQLAlchemy engine object.
+        :param table_name: Name of the table to query.
+        :param columns: Optional list of column names to fetch.
+        :param batch_size: Number of rows per batch.
+        :param table: Optional SQLAlchemy Table object used to type the batch buffers.
+        :param as_arrow: Yield pyarrow RecordBatches instead of Pandas DataFrames.
+        :param where: Optional SQL condition with :named bind parameters.
+        :param params: Bind parameter values for the condition.
+        :return: Iterator of DataFrames (or RecordBatches).
+        """
+        query = StreamingReader.build_query(table_name, columns, where)
+        dtypes = StreamingReader.numpy_dtypes(table) if table is not None else {}
+
+        with engine.connect() as connection:
+            result = connection.execution_options(stream_results=True, max_row_buffer=batch_size).execute(
+                text(query), params or {})
+            names = list(result.keys())
+            buffers = {name: np.empty(batch_size, dtype=dtypes.get(name, object)) for name in names}
+
+            for rows in result.partitions(batch_size):
+                size = len(rows)
+                data = {}
+                for name, values in zip(names, zip(*rows)):
+                    buffer = buffers[name]
+                    try:
+                        buffer[:size] = values
+                        data[name] = buffer[:size]
+                    except (TypeError, ValueError):
+                        # NULLs in a non-nullable NumPy dtype: fall back to a fresh, inferred column
+                        data[name] = pd.Series(values).infer_objects().to_numpy()
+
+                batch = pd.DataFrame(data, columns=names, copy=False)
+                if not dtypes:
+                    batch = batch.infer_objects()
+
+                if as_arrow:
+                    import pyarrow as pa
+                    yield pa.RecordBatch.from_pandas(batch, preserve_index=False)
+                else:
+                    yield batch
@@ -0,0 +1,222 @@
+# Description: A declarative transform engine for the ETL scripts.
+# Transforms are declared as a list of column operations, e.g.
+#     [{"op": "parse_date", "column": "date", "format": "%Y-%m-%d"},
+#      {"op": "multiply", "column": "value", "by": 1000},
+#      {"op": "aggregate", "by": ["artist"], "agg": "sum"}]
+# and compiled once. Each column's chain of operations is fused into a single in-place pass over that
+# column (one read, one write back), and the same plan runs on Pandas DataFrames or pyarrow Tables.
+# Arithmetic keeps the column's dtype where Pandas would (integer columns times integer factors stay
+# integers), and the caller's chunk is never modified: results are written to a copy.
+# Group aggregates are computed per chunk and merged, so chunked input gives the same result.
+# pyarrow is imported only when Arrow data is transformed, so Pandas-only pipelines do not load it.
+import numpy as np
+import pandas as pd
+
+COLUMN_OPS = {"cast", "multiply", "add", "round", "fillna", "parse_date"}
+MERGEABLE_AGGS = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+
+
+def _is_arrow(value):
+    # Recognizes pyarrow Tables and RecordBatches without importing pyarrow
+    return type(value).__module__.split(".")[0] == "pyarrow"
+
+
+class CompiledTransform:
+    def __init__(self, column_plans, aggregate=None):
+        """
+        :param column_plans: List of (column, [operations]) in first-use order.
+        :param aggregate: Optional terminal aggregate operation.
+        """
+        self.column_plans = column_plans
+        self.aggregate = aggregate
+
+    # ----- Pandas -----
+
+    @staticmethod
+    def _pandas_column(values, operations):
+        array = None
+        for operation in operations:
+            op = operation["op"]
+            if op in ("multiply", "add", "round"):
+                if array is None and not (isinstance(values.dtype, np.dtype) and values.dtype.kind in "iuf"):
+                    # Nullable, boolean or object columns: plain Pandas arithmetic
+                    if op == "multiply":
+                        values = values * operation["by"]
+                    elif op == "add":
+                        values = values + operation["value"]
+                    else:
+                        values = values.round(operation.get("decimals", 0))
+                    continue
+                if array is None:
+                    # The only copy of the column: every following arithmetic step runs in place
+                    array = values.to_numpy(copy=True)
+                if op == "round":
+                    np.round(array, operation.get("decimals", 0), out=array)
+                    continue
+                operand = operation["by"] if op == "multiply" else operation["value"]
+                # Upcast only where Pandas would (e.g. an integer column times a float factor)
+                dtype = np.result_type(array.dtype, operand)
+                if dtype != array.dtype:
+                    array = array.astype(dtype)
+                (np.multiply if op == "multiply" else np.add)(array, operand, out=array)
+                continue
+
+            if array is not None:
+                values = pd.Series(array, index=values.index, name=values.name)
+                array = None
+            if op == "fillna":
+                values = values.fillna(operation["value"])
+            elif op == "cast":
+                values = values.astype(operation["dtype"])
+            elif op == "parse_date":
+                values = pd.to_datetime(values, format=operation.get("format") or "ISO8601")
+
+        if array is not None:
+            return array
+        return values
+
+    @staticmethod
+    def _pandas_aggregate(df, aggregate):
+        agg = aggregate["agg"]
+        grouped = df.groupby(aggregate["by"], sort=True)
+        return grouped.agg(agg)
+
+    # ----- Arrow -----
+
+    @staticmethod
+    def _arrow_arithmetic(values, operand, function):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        # Integer columns keep their type for integer operands (overflow raises); otherwise compute in float64
+        if pa.types.is_integer(values.type) and isinstance(operand, int) and not isinstance(operand, bool):
+            return function(values, pa.scalar(operand, type=values.type))
+        if not pa.types.is_floating(values.type):
+            values = pc.cast(values, pa.float64())
+        return function(values, operand)
+
+    @staticmethod
+    def _arrow_column(values, operations):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        for operation in operations:
+            op = operation["op"]
+            if op == "multiply":
+                values = CompiledTransform._arrow_arithmetic(values, operation["by"], pc.multiply_checked)
+            elif op == "add":
+                values = CompiledTransform._arrow_arithmetic(values, operation["value"], pc.add_checked)
+            elif op == "round":
+                values = pc.round(values, ndigits=operation.get("decimals", 0), round_mode="half_to_even")
+            elif op == "fillna":
+                values = pc.fill_null(values, operation["value"])
+            elif op == "cast":
+                values = pc.cast(values, pa.from_numpy_dtype(np.dtype(operation["dtype"])))
+            elif op == "parse_date":
+                if operation.get("format"):
+                    values = pc.strptime(values, format=operation["format"], unit="ns")
+                else:
+                    values = pc.cast(values, pa.timestamp("ns"))
+        return values
+
+    @staticmethod
+    def _arrow_aggregate(table, aggregate):
+        import pyarrow as pa
+
+        agg = aggregate["agg"]
+        by = aggregate["by"]
+        if isinstance(agg, str):
+            agg = {name: agg for name in table.column_names
+                   if name not in by and (pa.types.is_integer(table.schema.field(name).type)
+                                          or pa.types.is_floating(table.schema.field(name).type))}
+        result = table.group_by(by).aggregate([(column, function) for column, function in agg.items()])
+        renamed = {f"{column}_{function}": column for column, function in agg.items()}
+        return result.rename_columns([renamed.get(name, name) for name in result.column_names])
+
+    # ----- Public API -----
+
+    def apply(self, chunk):
+        """
+        Run the compiled plan on one chunk.
+        :param chunk: Pandas DataFrame, pyarrow Table or RecordBatch.
+        :return: Transformed chunk of the same kind (aggregated if the plan ends with an aggregate).
+        """
+        if _is_arrow(chunk):
+            import pyarrow as pa
+            table = pa.Table.from_batches([chunk]) if isinstance(chunk, pa.RecordBatch) else chunk
+            for column, operations in self.column_plans:
+                index = table.schema.get_field_index(column)
+                table = table.set_column(index, column, self._arrow_column(table.column(column), operations))
+            return self._arrow_aggregate(table, self.aggregate) if self.aggregate else table
+
+        # Transformed columns replace those of a shallow copy; the caller's frame is left as it was
+        chunk = chunk.copy(deep=False)
+        for column, operations in self.column_plans:
+            chunk[column] = self._pandas_column(chunk[column], operations)
+        return self._pandas_aggregate(chunk, self.aggregate) if self.aggregate else chunk
+
+    def merge(self, partials):
+        """
+        Combine per-chunk results: concatenate row transforms, re-aggregate partial group aggregates.
+        :param partials: List of results returned by apply().
+        :return: Combined Pandas DataFrame or pyarrow Table.
+        """
+        if not partials:
+            return None
+        if _is_arrow(partials[0]):
+            import pyarrow as pa
+            combined = pa.concat_tables(partials)
+            if not self.aggregate:
+                return combined
+            agg = self.aggregate["agg"]
+            names = [n for n in combined.column_names if n not in self.aggregate["by"]]
+            merge_agg = {n: MERGEABLE_AGGS[agg if isinstance(agg, str) else agg[n]] for n in names}
+            return self._arrow_aggregate(combined, dict(self.aggregate, agg=merge_agg))
+
+        if not self.aggregate:
+            return pd.concat(partials, ignore_index=True)
+        combined = pd.concat(partials)
+        agg = self.aggregate["agg"]
+        if isinstance(agg, str):
+            return combined.groupby(level=self.aggregate["by"]).agg(MERGEABLE_AGGS[agg])
+        return combined.groupby(level=self.aggregate["by"]).agg({n: MERGEABLE_AGGS[f] for n, f in agg.items()})
+
+    def run(self, chunks):
+        """
+        Apply the plan to every chunk and merge the results.
+        :param chunks: Iterable of DataFrames or Arrow tables (or a single one).
+        :return: Combined result.
+        """
+        if isinstance(chunks, pd.DataFrame) or _is_arrow(chunks):
+            chunks = [chunks]
+        return self.merge([self.apply(chunk) for chunk in chunks])
+
+
+class TransformEngine:
+    @staticmethod
+    def compile(operations):
+        """
+        Validate a list of declared operations and fuse them into per-column plans.
+        :param operations: List of operation dicts (see module docstring).
+        :return: CompiledTransform.
+        """
+        column_plans = {}
+        aggregate = None
+        for position, operation in enumerate(operations):
+            op = operation.get("op")
+            if op == "aggregate":
+                if position != len(operations) - 1:
+                    raise ValueError("'aggregate' must be the last operation")
+                agg = operation.get("agg", "sum")
+                functions = [agg] if isinstance(agg, str) else list(agg.values())
+                unsupported = [f for f in functions if f not in MERGEABLE_AGGS]
+                if unsupported:
+                    raise ValueError(f"Unsupported aggregate functions: {unsupported}")
+                aggregate = {"by": list(operation["by"]), "agg": agg}
+            elif op in COLUMN_OPS:
+                if "column" not in operation:
+                    raise ValueError(f"Operation '{op}' needs a 'column'")
+                column_plans.setdefault(operation["column"], []).append(operation)
+            else:
+                raise ValueError(f"Unknown transform operation: '{op}'")
+        return CompiledTransform(list(column_plans.items()), aggregate)